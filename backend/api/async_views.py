@@ -0,0 +1,503 @@
+import asyncio
+import contextvars
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import close_old_connections
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+from django_filters.utils import translate_validation
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAuthenticated, NotFound, Throttled)
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.facets import facet_names, recipe_facets
+from api.fast_serializers import (build_recipes, recipe_batch, recipe_columns,
+                                  recipe_fieldset, recipe_queries)
+from api.filters import RecipeFilter, parse_ids
+from api.paginators import LimitPaginator
+from api.recipe_cache import (get_list, get_rows, list_cache_key,
+                              row_cache_applies, set_list)
+from api.renderers import ORJSONRenderer
+from api.serializers import IngredientSerializer, TagSerializer
+from backend import hot_keys
+from followers.models import Follow
+from recipes.events import OVERFLOW, hub
+from recipes.models import (Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCard, Tag)
+
+User = get_user_model()
+
+EVENTS_TOKEN_SALT = 'api.events'
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_CONCURRENCY,
+    thread_name_prefix='async-db'
+)
+
+
+def _run_in_thread(func):
+    close_old_connections()
+    return func()
+
+
+async def gather_queries(*funcs):
+    """
+    Выполняет независимые запросы к базе данных одновременно.
+    Асинхронный ORM Django выполняет запросы в одном потоке по очереди,
+    поэтому для параллельных запросов используется отдельный пул потоков
+    со своими соединениями. Контекст запроса (например, выбор реплики)
+    передается в каждый поток.
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_executor, partial(
+            contextvars.copy_context().run, _run_in_thread, func
+        ))
+        for func in funcs
+    ))
+
+
+def render(data, status=200):
+    response = HttpResponse(
+        ORJSONRenderer().render(data), content_type='application/json',
+        status=status
+    )
+    response['Vary'] = 'Accept'
+    return response
+
+
+def async_read_view(sync_view):
+    """
+    Асинхронное представление для GET запросов.
+    Остальные методы и запросы к Browsable API
+    передаются синхронному представлению DRF.
+    """
+    view_class = sync_view.cls
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if (
+                request.method != 'GET'
+                or 'format' in request.GET
+                or 'text/html' in request.headers.get('Accept', '')
+            ):
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs
+                )
+            try:
+                request.user = await sync_to_async(authenticate)(
+                    request, view_class
+                )
+                # throttle_scope, заданный в классе, а не по действию.
+                if isinstance(getattr(view_class, 'throttle_scope', None),
+                              str):
+                    await sync_to_async(check_throttles)(request, view_class)
+                return await handler(request, *args, **kwargs)
+            except APIException as exc:
+                response = render(
+                    exc.detail if isinstance(exc.detail, (list, dict))
+                    else {'detail': exc.detail},
+                    status=exc.status_code
+                )
+                if exc.status_code == 401:
+                    response['WWW-Authenticate'] = 'Token'
+                if getattr(exc, 'wait', None):
+                    response['Retry-After'] = str(math.ceil(exc.wait))
+                return response
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+def check_throttles(request, view_class):
+    """Ограничения частоты синхронного представления DRF."""
+    view = view_class()
+    for throttle in view.get_throttles():
+        if not throttle.allow_request(request, view):
+            raise Throttled(throttle.wait())
+
+
+def authenticate(request, view_class):
+    """
+    Пользователь запроса по классам аутентификации синхронного
+    представления DRF; при ошибке вызывает AuthenticationFailed.
+    """
+    return Request(
+        request, authenticators=view_class().get_authenticators()
+    ).user
+
+
+def filter_recipes(request):
+    filterset = RecipeFilter(
+        request.GET, queryset=Recipe.objects.all(), request=request
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+def filter_ingredients(request):
+    queryset = Ingredient.objects.all()
+    terms = request.GET.get('name', '').replace('\x00', '')
+    for term in terms.replace(',', ' ').split():
+        queryset = queryset.filter(name__istartswith=term)
+    return queryset
+
+
+async def represent_recipes(request, rows, fieldset, use_thumbnails=False):
+    """
+    Асинхронный вариант fast_serializers.represent_recipes.
+    Теги, ингредиенты, авторы и отметки пользователя
+    загружаются одновременно.
+    """
+    queries = recipe_queries(request.user, rows, fieldset)
+    results = dict(zip(queries, await gather_queries(*queries.values())))
+    return build_recipes(request, rows, results, fieldset, use_thumbnails)
+
+
+def recipe_list_view(sync_view):
+    @async_read_view(sync_view)
+    async def recipe_list(request):
+        cache_key = await sync_to_async(list_cache_key)(request)
+        data = None
+        if cache_key is not None:
+            data = await sync_to_async(get_list)(cache_key)
+        if data is None:
+            data = await list_recipes(request)
+            if cache_key is not None:
+                await sync_to_async(set_list)(cache_key, data)
+        return render(data)
+    return recipe_list
+
+
+async def list_recipes(request):
+    fieldset = recipe_fieldset(request)
+    queryset = await sync_to_async(filter_recipes)(request)
+    if 'ids' in request.GET:
+        rows, missing = await sync_to_async(recipe_batch)(
+            queryset, parse_ids(request.GET['ids']), fieldset
+        )
+        return {
+            'results': await represent_recipes(
+                request, rows, fieldset, use_thumbnails=True
+            ),
+            'missing': missing,
+        }
+    facets = facet_names(request.GET)
+    paginator = LimitPaginator()
+    page_size = paginator.get_page_size(
+        SimpleNamespace(query_params=request.GET)
+    )
+    count = await queryset.acount()
+    num_pages = max(1, -(-count // page_size))
+    page_number = request.GET.get(paginator.page_query_param) or 1
+    if page_number in paginator.last_page_strings:
+        page_number = num_pages
+    try:
+        page_number = int(page_number)
+    except (TypeError, ValueError):
+        page_number = 0
+    if not 1 <= page_number <= num_pages:
+        raise NotFound(_('Invalid page.'))
+    offset = (page_number - 1) * page_size
+    rows = [
+        row async for row in queryset.values(*recipe_columns(fieldset))[
+            offset:offset + page_size
+        ]
+    ]
+    url = request.build_absolute_uri()
+    previous = None
+    if page_number > 1:
+        previous = (
+            remove_query_param(url, paginator.page_query_param)
+            if page_number == 2 else
+            replace_query_param(
+                url, paginator.page_query_param, page_number - 1
+            )
+        )
+    data = {
+        'count': count,
+        'next': replace_query_param(
+            url, paginator.page_query_param, page_number + 1
+        ) if page_number < num_pages else None,
+        'previous': previous,
+        'results': await represent_recipes(
+            request, rows, fieldset, use_thumbnails=True
+        ),
+    }
+    if facets:
+        data['facets'] = (await gather_queries(
+            partial(recipe_facets, queryset, facets)
+        ))[0]
+    return data
+
+
+def recipe_detail_view(sync_view):
+    @async_read_view(sync_view)
+    async def recipe_detail(request, pk):
+        fieldset = recipe_fieldset(request)
+        row = await get_recipe_row(request, pk, fieldset)
+        hot_keys.record(hot_keys.RECIPES, row['id'])
+        return render((await represent_recipes(request, [row], fieldset))[0])
+    return recipe_detail
+
+
+async def get_recipe_row(request, pk, fieldset):
+    """Строка рецепта из кэша рецептов или из отфильтрованного queryset."""
+    if row_cache_applies(request.GET):
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise NotFound()
+        row = (await sync_to_async(get_rows)([pk])).get(pk)
+        if row is None:
+            raise NotFound()
+        return row
+    queryset = await sync_to_async(filter_recipes)(request)
+    try:
+        return await queryset.values(*recipe_columns(fieldset)).aget(pk=pk)
+    except (Recipe.DoesNotExist, ValueError, TypeError):
+        raise NotFound()
+
+
+def tag_list_view(sync_view):
+    @async_read_view(sync_view)
+    async def tag_list(request):
+        return render([
+            tag async for tag in Tag.objects.values(
+                *TagSerializer.Meta.fields
+            ).aiterator()
+        ])
+    return tag_list
+
+
+def tag_detail_view(sync_view):
+    @async_read_view(sync_view)
+    async def tag_detail(request, pk):
+        try:
+            return render(await Tag.objects.values(
+                *TagSerializer.Meta.fields
+            ).aget(pk=pk))
+        except (Tag.DoesNotExist, ValueError, TypeError):
+            raise NotFound()
+    return tag_detail
+
+
+def ingredient_list_view(sync_view):
+    @async_read_view(sync_view)
+    async def ingredient_list(request):
+        return render([
+            ingredient async for ingredient in filter_ingredients(
+                request
+            ).values(*IngredientSerializer.Meta.fields).aiterator()
+        ])
+    return ingredient_list
+
+
+def ingredient_detail_view(sync_view):
+    @async_read_view(sync_view)
+    async def ingredient_detail(request, pk):
+        try:
+            return render(await filter_ingredients(request).values(
+                *IngredientSerializer.Meta.fields
+            ).aget(pk=pk))
+        except (Ingredient.DoesNotExist, ValueError, TypeError):
+            raise NotFound()
+    return ingredient_detail
+
+
+def download_shopping_cart_view(sync_view):
+    @async_read_view(sync_view)
+    async def download_shopping_cart(request):
+        if not request.user.is_authenticated:
+            raise NotAuthenticated()
+        txt_content = ''
+        if await ShoppingCard.objects.filter(user=request.user).aexists():
+            ingredients = (
+                RecipeIngredients.objects
+                .filter(recipe__shoping_cart_recipes__user=request.user)
+                .values('ingredient_id', 'ingredient__name',
+                        'ingredient__measurement_unit')
+                .annotate(total=Sum('amount'))
+                .order_by('ingredient__name')
+            )
+            async for ingredient in ingredients.aiterator():
+                txt_content += (
+                    f"{ingredient['ingredient__name']} - "
+                    f"{ingredient['total']} "
+                    f"{ingredient['ingredient__measurement_unit']}\n"
+                )
+        response = HttpResponse(txt_content, content_type='text/plain')
+        response[
+            'Content-Disposition'
+        ] = 'attachment; filename="shopping_cart.txt"'
+        return response
+    return download_shopping_cart
+
+
+def make_events_token(user):
+    """
+    Токен для подключения к потоку событий в параметре token: EventSource
+    в браузере не передает заголовок Authorization.
+    """
+    return signing.TimestampSigner(salt=EVENTS_TOKEN_SALT).sign(str(user.pk))
+
+
+def check_events_token(value):
+    """Идентификатор пользователя из действующего токена или None."""
+    try:
+        return int(signing.TimestampSigner(salt=EVENTS_TOKEN_SALT).unsign(
+            value, max_age=settings.RECIPE_EVENTS['TOKEN_MAX_AGE']
+        ))
+    except signing.BadSignature:
+        return None
+
+
+def load_subscriber(request, token=None):
+    if token is None:
+        user_auth = TokenAuthentication().authenticate(request)
+        if user_auth is None:
+            raise NotAuthenticated()
+        user = user_auth[0]
+    else:
+        user_id = check_events_token(token)
+        user = user_id and User.objects.filter(
+            id=user_id, is_active=True
+        ).first()
+        if not user:
+            raise AuthenticationFailed(
+                'Недействительный или просроченный токен.'
+            )
+    return user.id, list(Follow.objects.filter(
+        user=user
+    ).order_by().values_list('following_id', flat=True))
+
+
+def format_event(event):
+    data = dict(event)
+    return (
+        f'event: {data.pop("type")}\n'
+        f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+    ).encode()
+
+
+async def stream_events(subscription, send, receive):
+    """
+    Отправляет события подписки, пока клиент не отключится.
+    Если событий нет, отправляется комментарий heartbeat: по ошибке
+    записи сервер обнаруживает оборванные соединения.
+    """
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def send_body(body):
+        await send({
+            'type': 'http.response.body', 'body': body, 'more_body': True
+        })
+
+    options = settings.RECIPE_EVENTS
+    disconnect = asyncio.ensure_future(wait_disconnect())
+    get_event = None
+    try:
+        await send_body(
+            f'retry: {options["RECONNECT_DELAY"] * 1000}\n\n'.encode()
+        )
+        while True:
+            if get_event is None:
+                get_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                (get_event, disconnect), timeout=options['HEARTBEAT_INTERVAL'],
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnect in done:
+                return
+            if get_event not in done:
+                await send_body(b': heartbeat\n\n')
+                continue
+            event = get_event.result()
+            get_event = None
+            await send_body(format_event(event))
+            if event is OVERFLOW:
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+    finally:
+        disconnect.cancel()
+        if get_event:
+            get_event.cancel()
+        hub.unsubscribe(subscription)
+
+
+def recipe_events_app(application, path='/api/events/'):
+    """
+    ASGI приложение с потоком событий о новых и измененных рецептах
+    авторов, на которых подписан пользователь (Server-Sent Events).
+    Остальные запросы передаются приложению Django. Поток обслуживается
+    без обработчика Django и middleware: открытое соединение не занимает
+    поток и соединение с базой данных. Пользователь определяется
+    по заголовку Authorization или по токену make_events_token
+    в параметре token.
+    """
+    async def app(scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != path:
+            return await application(scope, receive, send)
+        if scope['method'] != 'GET':
+            return await send_json(
+                send, {'detail': _('Method "%s" not allowed.') % (
+                    scope['method']
+                )}, 405, [(b'allow', b'GET')]
+            )
+        request = SimpleNamespace(META={
+            'HTTP_' + name.decode('latin1').upper().replace('-', '_'):
+            value.decode('latin1')
+            for name, value in scope['headers']
+        })
+        token = parse_qs(scope['query_string'].decode('latin1')).get('token')
+        try:
+            user_id, author_ids = (
+                await gather_queries(partial(
+                    load_subscriber, request, token and token[-1]
+                ))
+            )[0]
+        except APIException as exc:
+            return await send_json(
+                send, {'detail': exc.detail}, exc.status_code,
+                [(b'www-authenticate', b'Token')]
+                if exc.status_code == 401 else []
+            )
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await stream_events(
+            hub.subscribe(user_id, author_ids), send, receive
+        )
+    return app
+
+
+async def send_json(send, data, status, headers=()):
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': ORJSONRenderer().render(data),
+    })
@@ -0,0 +1,137 @@
+"""
+Выгрузка данных в формате NDJSON: одна запись JSON с полем type
+в строке. Записи читаются серверным курсором PostgreSQL
+(QuerySet.iterator) пачками по chunk_size, документы рецептов,
+которых нет в Recipe.document, собираются одним запросом на пачку,
+поэтому память процесса не зависит от объема выгрузки.
+
+Выгрузка выполняется в одной транзакции: курсор внутри транзакции
+объявляется без WITH HOLD и отдает строки по мере чтения, а не
+сохраняет весь результат запроса на сервере при открытии.
+"""
+import zlib
+from itertools import islice
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from api.fast_serializers import USER_COLUMNS, image_url
+from followers.models import Follow
+from recipes.documents import build_documents, represent_document
+from recipes.models import Favorite, Recipe, ShoppingCard
+
+User = get_user_model()
+
+RECIPE_COLUMNS = (
+    'id', 'name', 'text', 'cooking_time', 'pub_date', 'image', 'document'
+)
+USER_EXPORT_COLUMNS = USER_COLUMNS + ('date_joined', 'last_login')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def recipe_records(recipes, using, chunk_size):
+    """Рецепты queryset с автором, тегами и ингредиентами."""
+    rows = (
+        recipes.using(using).order_by('id').values(*RECIPE_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for batch in batched(rows, chunk_size):
+        documents = build_documents(
+            [row['id'] for row in batch if row['document'] == {}], using
+        )
+        for row in batch:
+            document = row.pop('document') or documents.get(row['id'])
+            # Рецепт удален после чтения пачки.
+            if document is None:
+                continue
+            row['image'] = image_url(None, row['image'])
+            yield {'type': 'recipe', **row, **represent_document(document)}
+
+
+def user_records(user_id, using, chunk_size):
+    """
+    Данные пользователя: профиль, рецепты, избранное, список покупок
+    и подписки.
+    """
+    user = User.objects.using(using).filter(id=user_id).values(
+        *USER_EXPORT_COLUMNS
+    ).first()
+    if user is None:
+        return
+    yield {'type': 'user', **user}
+    yield from recipe_records(
+        Recipe.objects.filter(author_id=user_id), using, chunk_size
+    )
+    for record_type, model in (
+        ('favorite', Favorite), ('shopping_cart', ShoppingCard)
+    ):
+        rows = (
+            model.objects.using(using).filter(user_id=user_id)
+            .order_by('id').values_list('recipe_id', 'recipe__name')
+            .iterator(chunk_size=chunk_size)
+        )
+        for recipe_id, name in rows:
+            yield {
+                'type': record_type,
+                'recipe': {'id': recipe_id, 'name': name},
+            }
+    follows = (
+        Follow.objects.using(using).filter(user_id=user_id).order_by('id')
+        .values_list('following_id', 'following__username')
+        .iterator(chunk_size=chunk_size)
+    )
+    for author_id, username in follows:
+        yield {'type': 'follow', 'author': {'id': author_id,
+                                            'username': username}}
+
+
+def encode(records, chunk_size):
+    """Строки NDJSON, объединенные по chunk_size записей."""
+    for batch in batched(records, chunk_size):
+        yield b''.join(orjson.dumps(record) + b'\n' for record in batch)
+
+
+def compress(chunks):
+    """Сжимает поток в формат gzip по мере поступления данных."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(records, using, chunk_size, gzip=False):
+    """
+    Байты NDJSON записей records (генератора, читающего базу using)
+    в одной транзакции. Транзакция завершается после чтения всех
+    записей или закрытия генератора.
+    """
+    with transaction.atomic(using=using):
+        chunks = encode(records, chunk_size)
+        yield from compress(chunks) if gzip else chunks
+
+
+async def iterate_async(iterator):
+    """
+    Асинхронный итератор для StreamingHttpResponse под ASGI: Django
+    не передает синхронный итератор по частям, а читает его целиком.
+    Все шаги выполняются в потоке запроса, в котором открыты
+    соединение и курсор.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await step(iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(iterator.close, thread_sensitive=True)()
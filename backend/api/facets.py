@@ -0,0 +1,86 @@
+"""
+Количество рецептов по тегам, времени приготовления и авторам
+для текущих фильтров списка рецептов (?facets=tags,cooking_time,author).
+Все счетчики вычисляются одним запросом UNION ALL из группировок
+по отфильтрованным рецептам.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Count, F, Value, When
+
+from api.fast_serializers import Fieldset
+from recipes.models import Recipe
+
+FACETS = ('tags', 'cooking_time', 'author')
+
+
+def facet_names(params):
+    return Fieldset.parse(params, 'facets', FACETS)
+
+
+def cooking_time_buckets():
+    """Границы интервалов времени приготовления: [(min, max), ...]."""
+    bounds = (0, *settings.RECIPE_FACETS['COOKING_TIME_BUCKETS'], None)
+    return list(zip(bounds, bounds[1:]))
+
+
+def grouped(queryset, kind, key, label):
+    return queryset.order_by().annotate(
+        kind=Value(kind), key=key, label=label
+    ).values('kind', 'key', 'label').annotate(
+        count=Count('*')
+    ).values_list('kind', 'key', 'label', 'count')
+
+
+def recipe_facets(queryset, names):
+    """Счетчики выбранных фасетов для отфильтрованных рецептов."""
+    recipe_ids = queryset.order_by().values('id')
+    recipes = Recipe.objects.filter(id__in=recipe_ids)
+    top_authors = settings.RECIPE_FACETS['TOP_AUTHORS']
+    buckets = cooking_time_buckets()
+    parts = []
+    if 'tags' in names:
+        parts.append(grouped(
+            Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids),
+            'tags', F('tag_id'), F('tag__slug')
+        ))
+    if 'cooking_time' in names:
+        parts.append(grouped(recipes, 'cooking_time', Case(
+            *(When(cooking_time__lt=maximum, then=Value(number))
+              for number, (_, maximum) in enumerate(buckets[:-1])),
+            default=Value(len(buckets) - 1)
+        ), Value('')))
+    if 'author' in names:
+        authors = grouped(
+            recipes, 'author', F('author_id'), F('author__username')
+        )
+        if connections[
+            recipes.db
+        ].features.supports_slicing_ordering_in_compound:
+            authors = authors.order_by('-count', 'key')[:top_authors]
+        parts.append(authors)
+    counts = {name: {} for name in names}
+    if parts:
+        for kind, key, label, count in parts[0].union(*parts[1:], all=True):
+            counts[kind][key] = (label, count)
+    facets = {}
+    if 'tags' in names:
+        facets['tags'] = [
+            {'id': pk, 'slug': slug, 'count': count}
+            for pk, (slug, count) in sorted(counts['tags'].items())
+        ]
+    if 'cooking_time' in names:
+        facets['cooking_time'] = [
+            {'min': minimum, 'max': maximum,
+             'count': counts['cooking_time'].get(number, ('', 0))[1]}
+            for number, (minimum, maximum) in enumerate(buckets)
+        ]
+    if 'author' in names:
+        facets['author'] = [
+            {'id': pk, 'username': username, 'count': count}
+            for pk, (username, count) in sorted(
+                counts['author'].items(),
+                key=lambda item: (-item[1][1], item[0])
+            )[:top_authors]
+        ]
+    return facets
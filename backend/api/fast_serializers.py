@@ -0,0 +1,383 @@
+"""
+Формирование ответов с рецептами, пользователями и подписками.
+Данные собираются в словари напрямую из строк values() без вызова
+to_representation для каждого поля. Пользователи в ответах совпадают
+с данными CustomUserSerializer.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import (Count, Exists, F, OuterRef, Subquery, Value,
+                              Window)
+from django.db.models.functions import Coalesce, RowNumber
+from rest_framework.exceptions import ValidationError
+
+from followers.models import Follow
+from recipes.documents import (AUTHOR_FIELDS, INGREDIENT_FIELDS, TAG_FIELDS,
+                               build_documents)
+from recipes.models import Favorite, Recipe, ShoppingCard
+
+User = get_user_model()
+
+RECIPE_FIELDS = (
+    'id', 'tags', 'author', 'ingredients', 'is_favorited',
+    'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+    'cooking_time'
+)
+USER_COLUMNS = ('id', 'email', 'username', 'first_name', 'last_name')
+USER_FIELDS = USER_COLUMNS + ('is_subscribed',)
+# Поля пользователя, которые возвращаются только по ?fields=.
+USER_COUNTS = ('recipes_count', 'followers_count')
+SUBSCRIPTION_FIELDS = USER_FIELDS + ('recipes', 'recipes_count')
+SHORT_RECIPE_FIELDS = ('id', 'name', 'image', 'image_variants',
+                       'cooking_time')
+
+
+class Fieldset:
+    """
+    Поля ответа, выбранные параметрами запроса.
+    fields — какие поля вернуть, omit — какие исключить,
+    expand — какие связанные объекты вернуть целиком. Если expand
+    не передан, раскрываются все связи, иначе остальные связи
+    возвращаются идентификаторами. Поля optional возвращаются, только
+    если перечислены в fields.
+    """
+    def __init__(self, fields, expandable=(), params=None, optional=()):
+        params = params or {}
+        selected = self.parse(params, 'fields', fields + optional) or fields
+        omitted = self.parse(params, 'omit', fields + optional)
+        self.fields = tuple(
+            field for field in fields + optional
+            if field in selected and field not in omitted
+        )
+        self.expanded = set(
+            self.parse(params, 'expand', expandable)
+            if 'expand' in params else expandable
+        )
+        self.is_full = self.fields == fields and self.expanded == set(
+            expandable
+        )
+
+    @staticmethod
+    def parse(params, name, allowed):
+        names = [
+            value.strip()
+            for value in params.get(name, '').split(',') if value.strip()
+        ]
+        unknown = [value for value in names if value not in allowed]
+        if unknown:
+            raise ValidationError(
+                {name: f'Неизвестные поля: {", ".join(unknown)}.'}
+            )
+        return names
+
+    @classmethod
+    def from_request(cls, request, fields, expandable=(), optional=()):
+        return cls(fields, expandable, request.GET, optional)
+
+    def __contains__(self, field):
+        return field in self.fields
+
+    def is_expanded(self, field):
+        return field in self.fields and field in self.expanded
+
+    def trim(self, data):
+        if self.is_full:
+            return data
+        return [
+            {field: item[field] for field in self.fields} for item in data
+        ]
+
+
+def recipe_fieldset(request):
+    return Fieldset.from_request(
+        request, RECIPE_FIELDS, ('tags', 'author', 'ingredients')
+    )
+
+
+def user_fieldset(request):
+    return Fieldset.from_request(request, USER_FIELDS, optional=USER_COUNTS)
+
+
+def subscription_fieldset(request):
+    return Fieldset.from_request(request, SUBSCRIPTION_FIELDS, ('recipes',))
+
+
+def recipe_columns(fieldset):
+    """Столбцы рецепта, необходимые для выбранных полей."""
+    columns = ['id']
+    if 'author' in fieldset:
+        columns.append('author_id')
+    if (
+        'tags' in fieldset or 'ingredients' in fieldset
+        or fieldset.is_expanded('author')
+    ):
+        columns.append('document')
+    if 'image' in fieldset or 'image_variants' in fieldset:
+        columns += ['image', 'image_variants']
+    columns += [
+        field for field in ('name', 'text', 'cooking_time')
+        if field in fieldset
+    ]
+    return columns
+
+
+def recipe_batch(queryset, ids, fieldset):
+    """
+    Строки рецептов в порядке ids и идентификаторы,
+    которых нет в queryset.
+    """
+    rows = {
+        row['id']: row for row in queryset.filter(id__in=ids).order_by()
+        .values(*recipe_columns(fieldset))
+    }
+    return (
+        [rows[pk] for pk in ids if pk in rows],
+        [pk for pk in ids if pk not in rows]
+    )
+
+
+def user_columns(fieldset):
+    return [
+        field for field in USER_COLUMNS if field == 'id' or field in fieldset
+    ]
+
+
+def count_related(model, field):
+    """Подзапрос количества строк model, ссылающихся на пользователя."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def user_annotations(user, fieldset):
+    """
+    Вычисляемые поля пользователей для queryset.annotate(): подписка
+    текущего пользователя и количества одним запросом со списком.
+    """
+    annotations = {}
+    if 'is_subscribed' in fieldset:
+        annotations['is_subscribed'] = Exists(Follow.objects.filter(
+            user_id=user.id, following=OuterRef('pk')
+        )) if user.is_authenticated else Value(False)
+    if 'recipes_count' in fieldset:
+        annotations['recipes_count'] = count_related(Recipe, 'author')
+    if 'followers_count' in fieldset:
+        annotations['followers_count'] = count_related(Follow, 'following')
+    return annotations
+
+
+def image_url(request, name):
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def represent_image(request, row, use_thumbnails):
+    """Ссылки на изображение и его уменьшенные копии."""
+    if 'image' not in row:
+        return None, None
+    image = image_url(request, row['image'])
+    variants = {
+        size_name: {
+            fmt: image_url(request, name) for fmt, name in formats.items()
+        }
+        for size_name, formats in row['image_variants'].items()
+    }
+    if use_thumbnails:
+        size_name, fmt = settings.RECIPE_IMAGE_LIST_VARIANT
+        image = variants.get(size_name, {}).get(fmt, image)
+    return image, variants
+
+
+def short_recipe(request, row, use_thumbnails=True):
+    """Рецепт в сокращенном виде: в подписках, избранном, списке покупок."""
+    image, variants = represent_image(request, row, use_thumbnails)
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'image': image,
+        'image_variants': variants,
+        'cooking_time': row['cooking_time'],
+    }
+
+
+def recipe_row(recipe):
+    """Строка в формате values(*recipe_columns()) для рецепта."""
+    return {
+        'id': recipe.id,
+        'author_id': recipe.author_id,
+        'name': recipe.name,
+        'image': recipe.image.name,
+        'image_variants': recipe.image_variants,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'document': recipe.document,
+    }
+
+
+def user_rows(user_ids, columns=USER_COLUMNS):
+    """Строки values(*columns) пользователей в порядке user_ids."""
+    users = {
+        row['id']: row for row in
+        User.objects.filter(id__in=user_ids).values(*columns)
+    }
+    return [users[pk] for pk in user_ids if pk in users]
+
+
+def following_ids(user, author_ids):
+    if not user.is_authenticated:
+        return set()
+    return set(Follow.objects.filter(
+        user=user, following_id__in=author_ids
+    ).order_by().values_list('following_id', flat=True))
+
+
+def recipe_queries(user, rows, fieldset):
+    """
+    Запросы данных рецептов, которых нет в строках values().
+    Запросы независимы и могут выполняться одновременно,
+    запросы для невыбранных полей не выполняются.
+    """
+    ids = [row['id'] for row in rows]
+    queries = {}
+    missing = [row['id'] for row in rows if row.get('document') == {}]
+    if missing:
+        queries['documents'] = lambda: build_documents(missing)
+    if fieldset.is_expanded('author'):
+        author_ids = {row['author_id'] for row in rows}
+        queries['following'] = lambda: following_ids(user, author_ids)
+    if user.is_authenticated and 'is_favorited' in fieldset:
+        queries['favorited'] = lambda: set(Favorite.objects.filter(
+            user=user, recipe_id__in=ids
+        ).order_by().values_list('recipe_id', flat=True))
+    if user.is_authenticated and 'is_in_shopping_cart' in fieldset:
+        queries['in_cart'] = lambda: set(ShoppingCard.objects.filter(
+            user=user, recipe_id__in=ids
+        ).order_by().values_list('recipe_id', flat=True))
+    return queries
+
+
+def build_recipes(request, rows, results, fieldset, use_thumbnails=False):
+    """
+    Формирует данные рецептов из документов рецептов
+    и результатов recipe_queries.
+    """
+    documents = results.get('documents', {})
+    following = results.get('following', set())
+    favorited = results.get('favorited', set())
+    in_cart = results.get('in_cart', set())
+
+    data = []
+    for row in rows:
+        document = row.get('document') or documents.get(row['id'])
+        tags = ingredients = author = None
+        if 'tags' in fieldset:
+            tags = [
+                dict(zip(TAG_FIELDS, tag)) if fieldset.is_expanded('tags')
+                else tag[0]
+                for tag in document['tags']
+            ]
+        if fieldset.is_expanded('ingredients'):
+            ingredients = [
+                dict(zip(INGREDIENT_FIELDS, ingredient))
+                for ingredient in document['ingredients']
+            ]
+        elif 'ingredients' in fieldset:
+            ingredients = [
+                {'id': ingredient[0], 'amount': ingredient[-1]}
+                for ingredient in document['ingredients']
+            ]
+        if fieldset.is_expanded('author'):
+            author = dict(zip(AUTHOR_FIELDS, document['author']))
+            author['is_subscribed'] = author['id'] in following
+        else:
+            author = row.get('author_id')
+        image, variants = represent_image(request, row, use_thumbnails)
+        data.append({
+            'id': row['id'],
+            'tags': tags,
+            'author': author,
+            'ingredients': ingredients,
+            'is_favorited': row['id'] in favorited,
+            'is_in_shopping_cart': row['id'] in in_cart,
+            'name': row.get('name'),
+            'image': image,
+            'image_variants': variants,
+            'text': row.get('text'),
+            'cooking_time': row.get('cooking_time'),
+        })
+    return fieldset.trim(data)
+
+
+def represent_recipes(request, rows, fieldset, use_thumbnails=False):
+    """Данные рецептов с полями, выбранными в fieldset."""
+    results = {
+        name: query()
+        for name, query in recipe_queries(request.user, rows, fieldset).items()
+    }
+    return build_recipes(request, rows, results, fieldset, use_thumbnails)
+
+
+def represent_users(request, rows, fieldset):
+    """
+    Данные пользователей в формате CustomUserSerializer.
+    Если в строках нет is_subscribed из user_annotations(),
+    подписки загружаются одним запросом.
+    """
+    if 'is_subscribed' in fieldset and rows and (
+        'is_subscribed' not in rows[0]
+    ):
+        following = following_ids(request.user, [row['id'] for row in rows])
+        rows = [
+            {**row, 'is_subscribed': row['id'] in following} for row in rows
+        ]
+    return [{field: row[field] for field in fieldset.fields} for row in rows]
+
+
+def represent_subscriptions(request, rows, fieldset):
+    """
+    Данные подписок: автор и его рецепты в сокращенном виде.
+    Принимает строки авторов values(*user_columns()).
+    """
+    author_ids = [row['id'] for row in rows]
+    author_recipes = {pk: [] for pk in author_ids}
+    if 'recipes' in fieldset:
+        recipes = Recipe.objects.filter(author_id__in=author_ids)
+        limit = request.GET.get('recipes_limit')
+        if limit:
+            recipes = recipes.annotate(position=Window(
+                RowNumber(), partition_by=F('author_id'),
+                order_by=Recipe._meta.ordering
+            )).filter(position__lte=int(limit))
+        if not fieldset.is_expanded('recipes'):
+            for author_id, pk in recipes.values_list('author_id', 'id'):
+                author_recipes[author_id].append(pk)
+        else:
+            for recipe in recipes.values('author_id', *SHORT_RECIPE_FIELDS):
+                author_recipes[recipe['author_id']].append(
+                    short_recipe(request, recipe)
+                )
+    counts = dict(
+        Recipe.objects.filter(author_id__in=author_ids)
+        .order_by().values('author_id').annotate(count=Count('id'))
+        .values_list('author_id', 'count')
+    ) if 'recipes_count' in fieldset else {}
+    following = (
+        following_ids(request.user, author_ids)
+        if 'is_subscribed' in fieldset else set()
+    )
+    return fieldset.trim([
+        {
+            'id': row['id'],
+            'email': row.get('email'),
+            'username': row.get('username'),
+            'first_name': row.get('first_name'),
+            'last_name': row.get('last_name'),
+            'is_subscribed': row['id'] in following,
+            'recipes': author_recipes[row['id']],
+            'recipes_count': counts.get(row['id'], 0),
+        }
+        for row in rows
+    ])
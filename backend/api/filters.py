@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import FilterSet, filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
 
 from recipes.models import Recipe
@@ -7,6 +9,27 @@ from recipes.models import Recipe
 User = get_user_model()
 
 
+def parse_ids(value):
+    """
+    Идентификаторы рецептов из параметра ids=1,2,3.
+    Повторы отбрасываются, порядок сохраняется.
+    """
+    try:
+        ids = list(dict.fromkeys(
+            int(pk) for pk in value.split(',') if pk.strip()
+        ))
+    except ValueError:
+        raise ValidationError(
+            {'ids': 'Передайте целые идентификаторы через запятую.'}
+        )
+    if len(ids) > settings.RECIPE_BATCH_MAX_SIZE:
+        raise ValidationError({'ids': (
+            f'Можно запросить не более {settings.RECIPE_BATCH_MAX_SIZE} '
+            f'рецептов.'
+        )})
+    return ids
+
+
 class IngredientSearchFilter(SearchFilter):
     """
     Фильтр для поиска по ингредиентам при добавлении рецепта.
@@ -0,0 +1,72 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from api.exports import export, recipe_records, user_records
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает все рецепты или данные пользователя в формате NDJSON '
+        'в файл или стандартный вывод. Память не зависит от количества '
+        'записей: строки читаются серверным курсором пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=('recipes', 'user'))
+        parser.add_argument(
+            'user_id', nargs='?', type=int,
+            help='Идентификатор пользователя для kind=user.'
+        )
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Файл выгрузки, по умолчанию стандартный вывод. '
+                 'Файл с расширением .gz сжимается.'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжать выгрузку gzip.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.EXPORTS['CHUNK_SIZE'],
+            help='Количество строк, читаемых из курсора за раз.'
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='База данных, например реплика из DATABASE_REPLICAS.'
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        chunk_size = options['chunk_size']
+        if options['kind'] == 'recipes':
+            records = recipe_records(Recipe.objects.all(), using, chunk_size)
+        else:
+            user_id = options['user_id']
+            if user_id is None:
+                raise CommandError('Укажите идентификатор пользователя.')
+            if not User.objects.using(using).filter(id=user_id).exists():
+                raise CommandError(f'Пользователь {user_id} не найден.')
+            records = user_records(user_id, using, chunk_size)
+        output = options['output']
+        gzip = options['gzip'] or output.endswith('.gz')
+        chunks = export(records, using, chunk_size, gzip)
+        if output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        size = 0
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано {size} байт в {output}.'
+        ))
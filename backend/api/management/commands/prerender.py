@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.prerender import clear, publish_feed, publish_recipes, remove_stale
+from recipes.models import Recipe
+
+CHUNK_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново формирует файлы ответов для анонимных клиентов, '
+        'которые отдает nginx (PRERENDER в настройках): рецепты '
+        'и первые страницы списка рецептов. Рецепты распределяются '
+        'между несколькими процессами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int,
+            default=settings.PRERENDER['PROCESSES'],
+            help='Количество процессов, формирующих файлы рецептов.'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help=(
+                'Удалить все файлы, например после отключения PRERENDER: '
+                'иначе nginx продолжит отдавать устаревшие ответы.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear()
+            self.stdout.write(self.style.SUCCESS('Файлы удалены.'))
+            return
+        recipe_ids = list(
+            Recipe.objects.order_by('id').values_list('id', flat=True)
+        )
+        chunks = [
+            recipe_ids[start:start + CHUNK_SIZE]
+            for start in range(0, len(recipe_ids), CHUNK_SIZE)
+        ]
+        if options['processes'] > 1 and len(chunks) > 1:
+            # Процессы открывают собственные соединения с базой данных.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options['processes'], initializer=django.setup
+            ) as executor:
+                published = sum(executor.map(publish_recipes, chunks))
+        else:
+            published = sum(map(publish_recipes, chunks))
+        remove_stale(recipe_ids)
+        pages = publish_feed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов: {published}, страниц списка рецептов: {pages}.'
+        ))
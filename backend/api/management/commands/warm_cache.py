@@ -0,0 +1,52 @@
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.prerender import render
+from api.recipe_cache import get_rows
+from backend import hot_keys
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет кэш рецептов самыми популярными рецептами и ответами '
+        'на запросы списка рецептов по счетчикам всех процессов '
+        '(HOT_KEYS в настройках). Запускается до приема запросов, '
+        'например из gunicorn.conf.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int,
+            default=settings.RECIPE_CACHE['WARM_RECIPES'],
+            help='Количество рецептов.'
+        )
+        parser.add_argument(
+            '--lists', type=int,
+            default=settings.RECIPE_CACHE['WARM_LISTS'],
+            help='Количество запросов списка рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.RECIPE_CACHE['ENABLED']:
+            self.stdout.write('Кэш рецептов выключен (RECIPE_CACHE).')
+            return
+        popular = hot_keys.top(hot_keys.RECIPES, options['recipes'])
+        recipe_ids = [int(pk) for pk in popular if pk.isdigit()]
+        recipes = 0
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            recipes += len(get_rows(recipe_ids[start:start + BATCH_SIZE]))
+        lists = 0
+        for url in hot_keys.top(hot_keys.RECIPE_LISTS, options['lists']):
+            parts = urlsplit(url)
+            # Ответ сохраняется в кэше представлением списка рецептов.
+            if render(
+                parts.path, parts.query, f'{parts.scheme}://{parts.netloc}'
+            ) is not None:
+                lists += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'В кэше рецептов: {recipes}, ответов списка рецептов: {lists}.'
+        ))
@@ -1,4 +1,5 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 
 
 class LimitPaginator(PageNumberPagination):
@@ -7,3 +8,36 @@ class LimitPaginator(PageNumberPagination):
     """
     page_size = 6
     page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class UserCursorPaginator(CursorPagination):
+    """
+    Курсорная пагинация пользователей: следующая страница выбирается
+    условием по индексу date_joined, а не OFFSET. Ссылки next и previous
+    содержат параметр cursor. Запросы с параметром page (нумерация
+    страниц фронтенда) обслуживает LimitPaginator в том же порядке.
+    """
+    ordering = ('-date_joined', '-id')
+    page_size = LimitPaginator.page_size
+    page_size_query_param = 'limit'
+    max_page_size = LimitPaginator.max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = queryset.order_by(*self.ordering)
+        self.numbered = None
+        if LimitPaginator.page_query_param in request.query_params:
+            self.numbered = LimitPaginator()
+            return self.numbered.paginate_queryset(queryset, request, view)
+        self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.numbered is not None:
+            return self.numbered.get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
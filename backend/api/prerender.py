@@ -0,0 +1,197 @@
+"""
+Предварительно сформированные ответы для анонимных клиентов.
+Ответы на GET /api/recipes/<id>/ и первые страницы /api/recipes/
+записываются в PRERENDER['ROOT'] по пути запроса, и nginx отдает их
+анонимным GET запросам без обращения к backend, а при отсутствии файла
+передает запрос backend:
+
+* api/recipes/5/index.json — /api/recipes/5/;
+* api/recipes/index.json — /api/recipes/;
+* api/recipes/index.page=1&limit=6.json — /api/recipes/?page=1&limit=6;
+* recipes/5/index.html — страница рецепта для поисковых роботов.
+
+Ответы формируются теми же представлениями, что и обычные запросы,
+поэтому совпадают с ответами backend. Файл записывается во временный
+файл в том же каталоге и переименовывается, поэтому nginx не отдает
+файл частично.
+"""
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import resolve
+
+from api.paginators import LimitPaginator
+from backend import hot_keys
+from backend.on_commit import CommitBatch
+from jobs.queue import enqueue
+from recipes.models import Tag
+
+RECIPES_PATH = '/api/recipes/'
+
+
+def root():
+    return Path(settings.PRERENDER['ROOT'])
+
+
+def file_path(path, query=''):
+    """Файл ответа на запрос path?query, как его ищет nginx."""
+    name = f'index.{query}.json' if query else 'index.json'
+    return root() / path.strip('/') / name
+
+
+def html_path(recipe_id):
+    return root() / 'recipes' / str(recipe_id) / 'index.html'
+
+
+def feed_queries():
+    """
+    Запросы первых страниц списка рецептов в том виде, в котором их
+    отправляет фронтенд: без тегов и со всеми тегами.
+    """
+    limit = LimitPaginator.page_size
+    tags = ''.join(
+        f'&tags={slug}' for slug in Tag.objects.values_list('slug', flat=True)
+    )
+    queries = ['']
+    for page in range(1, settings.PRERENDER['FEED_PAGES'] + 1):
+        queries.append(f'page={page}&limit={limit}')
+        if tags:
+            queries.append(f'page={page}&limit={limit}{tags}')
+    return queries
+
+
+def render(path, query='', base_url=None):
+    """
+    Ответ backend анонимному клиенту или None, если он не 200.
+    Запрос не учитывается среди популярных.
+    """
+    base_url = urlsplit(base_url or settings.PRERENDER['BASE_URL'])
+    request = RequestFactory().get(
+        path, QUERY_STRING=query, secure=base_url.scheme == 'https',
+        headers={'host': base_url.netloc, 'accept': 'application/json'}
+    )
+    match = resolve(path)
+    view = match.func
+    if iscoroutinefunction(view):
+        view = async_to_sync(view)
+    with hot_keys.paused():
+        response = view(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def write(path, content):
+    """Записывает файл атомарно: nginx видит старый или новый файл."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=path.parent, prefix='.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
+
+
+def remove(path):
+    path.unlink(missing_ok=True)
+    try:
+        path.parent.rmdir()
+    except OSError:
+        pass
+
+
+def render_html(recipe_id, content):
+    """Страница рецепта для поисковых роботов и превью ссылок."""
+    url = f'{settings.PRERENDER["BASE_URL"]}/recipes/{recipe_id}'
+    return render_to_string('api/recipe_snapshot.html', {
+        'recipe': json.loads(content), 'url': url,
+    }).encode()
+
+
+def publish_recipes(recipe_ids):
+    """
+    Обновляет файлы рецептов; файлы удаленных и недоступных рецептов
+    удаляются. Возвращает количество записанных рецептов.
+    """
+    published = 0
+    for recipe_id in recipe_ids:
+        path = f'{RECIPES_PATH}{recipe_id}/'
+        content = render(path)
+        if content is None:
+            remove(file_path(path))
+            remove(html_path(recipe_id))
+            continue
+        write(file_path(path), content)
+        if settings.PRERENDER['HTML']:
+            write(html_path(recipe_id), render_html(recipe_id, content))
+        published += 1
+    return published
+
+
+def publish_feed():
+    """
+    Обновляет первые страницы списка рецептов. Страницы запросов,
+    которых больше нет (например, со списком удаленного тега),
+    удаляются, чтобы nginx не отдавал устаревшие данные.
+    """
+    paths = set()
+    for query in feed_queries():
+        path = file_path(RECIPES_PATH, query)
+        content = render(RECIPES_PATH, query)
+        if content is not None:
+            write(path, content)
+            paths.add(path)
+    for path in file_path(RECIPES_PATH).parent.glob('index*.json'):
+        if path not in paths:
+            path.unlink(missing_ok=True)
+    return len(paths)
+
+
+def remove_stale(recipe_ids):
+    """Удаляет каталоги рецептов, которых нет в recipe_ids."""
+    recipe_ids = {str(recipe_id) for recipe_id in recipe_ids}
+    for directory in (file_path(RECIPES_PATH).parent, root() / 'recipes'):
+        if not directory.is_dir():
+            continue
+        for child in directory.iterdir():
+            if child.is_dir() and child.name not in recipe_ids:
+                shutil.rmtree(child)
+
+
+def clear():
+    """Удаляет все файлы: после отключения PRERENDER они устаревают."""
+    for name in ('api', 'recipes'):
+        shutil.rmtree(root() / name, ignore_errors=True)
+
+
+def _flush(recipe_ids):
+    enqueue('api.publish_recipes', recipe_ids=sorted(recipe_ids))
+
+
+_batch = CommitBatch(_flush)
+
+
+def schedule_publish(recipe_ids=()):
+    """
+    Отмечает рецепты для обновления файлов после транзакции.
+    Все изменения одной транзакции обновляются одной задачей, вместе
+    с ними обновляются первые страницы списка рецептов.
+    """
+    if not settings.PRERENDER['ENABLED']:
+        return
+    _batch.add(recipe_ids)
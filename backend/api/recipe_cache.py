@@ -0,0 +1,126 @@
+"""
+Кэш популярных рецептов в кэше default.
+* Строки рецептов со всеми столбцами и документом — общие для всех
+  пользователей; по ним формируется ответ GET /api/recipes/<id>/,
+  отметки пользователя загружаются отдельно.
+* Ответы анонимным клиентам на GET /api/recipes/?... — по адресу
+  запроса и версии списка рецептов.
+Изменения рецептов и тегов после транзакции удаляют строки рецептов
+и меняют версию списка. С LocMemCache другие процессы не узнают
+об изменениях, поэтому по умолчанию кэш включен, только если кэш
+default общий для процессов (Redis, Memcached).
+"""
+import hashlib
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.fast_serializers import RECIPE_FIELDS, Fieldset, recipe_columns
+from api.filters import RecipeFilter
+from backend import hot_keys
+from backend.metrics import record_cache
+from recipes.documents import build_documents
+from recipes.models import Recipe
+
+ROW_CACHE_KEY = 'recipes:row:{}'
+VERSION_CACHE_KEY = 'recipes:version'
+LIST_CACHE_KEY = 'recipes:list:{}:{}'
+ROW_COLUMNS = recipe_columns(Fieldset(RECIPE_FIELDS))
+
+
+def is_enabled():
+    return settings.RECIPE_CACHE['ENABLED']
+
+
+def row_cache_applies(params):
+    """
+    Можно ли взять рецепт из кэша: фильтры RecipeFilter в запросе
+    рецепта по id могут вернуть 404, поэтому с ними рецепт читается
+    из отфильтрованного queryset.
+    """
+    return is_enabled() and not set(RecipeFilter.base_filters) & set(params)
+
+
+def get_rows(recipe_ids):
+    """
+    Строки рецептов values(*ROW_COLUMNS) по id. Недостающие строки
+    загружаются одним запросом и сохраняются в кэше.
+    """
+    keys = {ROW_CACHE_KEY.format(pk): pk for pk in recipe_ids}
+    cached = cache.get_many(keys)
+    rows = {keys[key]: row for key, row in cached.items()}
+    missing = [pk for pk in recipe_ids if pk not in rows]
+    record_cache('recipe_rows', len(rows), len(missing))
+    if missing:
+        loaded = {
+            row['id']: row for row in Recipe.objects.filter(id__in=missing)
+            .order_by().values(*ROW_COLUMNS)
+        }
+        documents = build_documents(
+            [pk for pk, row in loaded.items() if row['document'] == {}]
+        )
+        for pk, document in documents.items():
+            loaded[pk]['document'] = document
+        cache.set_many(
+            {ROW_CACHE_KEY.format(pk): row for pk, row in loaded.items()},
+            settings.RECIPE_CACHE['TIMEOUT']
+        )
+        rows.update(loaded)
+    return rows
+
+
+def list_version():
+    """
+    Версия списка рецептов: случайная строка, а не счетчик, чтобы после
+    вытеснения ключа из кэша не совпасть с прежней версией.
+    """
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_CACHE_KEY, version, None):
+            version = cache.get(VERSION_CACHE_KEY, version)
+    return version
+
+
+def list_cache_key(request):
+    """
+    Отмечает запрос списка рецептов анонимного клиента среди популярных
+    и возвращает ключ кэша для его ответа. Для остальных запросов
+    и при выключенном кэше возвращает None.
+    """
+    if request.user.is_authenticated:
+        return None
+    url = request.build_absolute_uri()
+    hot_keys.record(hot_keys.RECIPE_LISTS, url)
+    if not is_enabled():
+        return None
+    return LIST_CACHE_KEY.format(
+        list_version(), hashlib.md5(url.encode()).hexdigest()
+    )
+
+
+def get_list(key):
+    if key is None:
+        return None
+    data = cache.get(key)
+    record_cache('recipe_lists', data is not None, data is None)
+    return data
+
+
+def set_list(key, data):
+    if key is not None:
+        cache.set(key, data, settings.RECIPE_CACHE['TIMEOUT'])
+
+
+def _invalidate(recipe_ids):
+    cache.delete_many([ROW_CACHE_KEY.format(pk) for pk in recipe_ids])
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate(recipe_ids=()):
+    """Сбрасывает строки рецептов и ответы списка после транзакции."""
+    if is_enabled():
+        transaction.on_commit(partial(_invalidate, list(recipe_ids)))
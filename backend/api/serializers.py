@@ -1,29 +1,114 @@
-import base64
+import binascii
+import uuid
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.core.files import File
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from PIL import Image
 from rest_framework import serializers
 
+from api.fast_serializers import recipe_fieldset, recipe_row, represent_recipes
 from followers.models import Follow
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
-                            ShoppingCard, Tag)
+from recipes.models import (ImageUpload, Ingredient, Recipe, RecipeIngredients,
+                            Tag)
 
 User = get_user_model()
 
+BASE64_WHITESPACE = ' \t\r\n'
+STRIP_WHITESPACE = str.maketrans('', '', BASE64_WHITESPACE)
+
+
+class UploadedImageFile(File):
+    """
+    Файл, загруженный через /api/uploads/.
+    Хранилище перемещает его на место, не читая в память.
+    """
+    def __init__(self, upload):
+        try:
+            with Image.open(upload.file.path) as image:
+                name = f'upload.{image.format.lower()}'
+        except (OSError, Image.DecompressionBombError):
+            name = 'upload'
+        super().__init__(open(upload.file.path, 'rb'), name=name)
+        self.upload = upload
+
+    def temporary_file_path(self):
+        return self.upload.file.path
+
 
 class Base64ImageField(serializers.ImageField):
     """
     Сериализатор для обработки картинок.
+    Принимает изображение в виде data URL (base64)
+    или токен завершенной загрузки из /api/uploads/.
     """
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'invalid_base64': 'Некорректные данные изображения.',
+        'invalid_upload': 'Загрузка не найдена или не завершена.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode_base64(data)
+        elif isinstance(data, str):
+            data = self.get_upload(data)
         return super().to_internal_value(data)
 
+    def decode_base64(self, data):
+        try:
+            format, imgstr = data.split(';base64,')
+        except ValueError:
+            self.fail('invalid_base64')
+        ext = format.split('/')[-1]
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        whitespace = sum(imgstr.count(char) for char in BASE64_WHITESPACE)
+        if (len(imgstr) - whitespace) // 4 * 3 > max_size + 2:
+            self.fail('too_large', max_size=max_size)
+        file = TemporaryUploadedFile(
+            'temp.' + ext, format.split(':')[-1], 0, None
+        )
+        step = settings.IMAGE_UPLOAD_CHUNK_SIZE // 3 * 4
+        # Данные MIME разбиты на строки: пробельные символы удаляются,
+        # а неполная четверка символов переносится в следующую часть.
+        pending = ''
+        try:
+            for start in range(0, len(imgstr), step):
+                chunk = pending + imgstr[start:start + step].translate(
+                    STRIP_WHITESPACE
+                )
+                end = len(chunk) // 4 * 4
+                pending = chunk[end:]
+                file.write(binascii.a2b_base64(chunk[:end]))
+            # Неполная четверка в конце данных вызывает ошибку.
+            file.write(binascii.a2b_base64(pending))
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        file.size = file.tell()
+        if file.size > max_size:
+            file.close()
+            self.fail('too_large', max_size=max_size)
+        file.seek(0)
+        return file
+
+    def get_upload(self, token):
+        request = self.context.get('request')
+        try:
+            upload = ImageUpload.objects.get(
+                token=uuid.UUID(token), user=request.user
+            )
+        except (ValueError, TypeError, ImageUpload.DoesNotExist):
+            self.fail('invalid_upload')
+        if not upload.is_complete:
+            self.fail('invalid_upload')
+        return UploadedImageFile(upload)
+
 
 class CustomUserSerializer(UserSerializer):
     """
@@ -40,6 +125,9 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        # Аннотация из user_annotations() в запросе пользователей.
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request_user = (
             self.context['request'].user
             if 'request' in self.context else None
@@ -97,70 +185,10 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class IngredientAmountSerializer(serializers.ModelSerializer):
-    """
-    Сериализатор для обработки данных ингредиентов и их количества.
-    Используется для сериализации рецептов при GET запросах.
-    """
-    id = serializers.ReadOnlyField(source='ingredient.id')
-    name = serializers.ReadOnlyField(source='ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit'
-    )
-
-    class Meta:
-        model = RecipeIngredients
-        fields = ('id', 'name', 'measurement_unit', 'amount')
-
-
-class RecipeShortSerializer(serializers.ModelSerializer):
-    """
-    Сериализатор для обработки данных рецептов в сокращенном виде.
-    Используется для отображения данных при подписке.
-    """
-    class Meta:
-        model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
-
-
-class RecipeSerializer(serializers.ModelSerializer):
-    """
-    Сериализатор для отображения данных рецептов.
-    """
-    tags = TagSerializer(many=True)
-    author = CustomUserSerializer()
-    ingredients = IngredientAmountSerializer(
-        many=True, source='recipe', required=True
-    )
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Recipe
-        fields = (
-            'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
-        )
-
-    def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        return user.is_authenticated and Favorite.objects.filter(
-            user=user, recipe=obj
-        ).exists()
-
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        return user.is_authenticated and ShoppingCard.objects.filter(
-            user=user, recipe=obj
-        ).exists()
-
-
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """
     Сериализатор для обработки данных рецептов при их добавлении.
     """
-    author = CustomUserSerializer(read_only=True)
     ingredients = RecipeIngredientsSerializer(many=True, required=True)
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True, required=True
@@ -170,8 +198,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'ingredients', 'tags', 'image', 'name', 'text', 'cooking_time',
-            'author'
+            'ingredients', 'tags', 'image', 'name', 'text', 'cooking_time'
         )
         required_fields = ('tags', 'ingredients')
 
@@ -231,14 +258,26 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 ]
             )
 
+    def release_upload(self, validated_data):
+        image = validated_data.get('image')
+        if image is None:
+            return
+        image.close()
+        if isinstance(image, UploadedImageFile):
+            image.upload.file.delete(save=False)
+            image.upload.delete()
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self.create_ingredients(ingredients_data, recipe)
+        self.release_upload(validated_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' in validated_data:
             ingredients = validated_data.pop('ingredients')
@@ -246,34 +285,64 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             self.create_ingredients(ingredients, instance)
         if 'tags' in validated_data:
             instance.tags.set(validated_data.pop('tags'))
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        self.release_upload(validated_data)
+        return instance
 
     def to_representation(self, instance):
-        return RecipeSerializer(
-            instance, context={'request': self.context.get('request')}
-        ).data
+        # Документ рецепта пересобирается после транзакции,
+        # поэтому связанные данные читаются из таблиц.
+        request = self.context.get('request')
+        row = {**recipe_row(instance), 'document': {}}
+        return represent_recipes(request, [row], recipe_fieldset(request))[0]
 
 
-class FollowSerializer(serializers.Serializer):
+class ImageUploadSerializer(serializers.ModelSerializer):
     """
-    Сериализатор для обработки данных подписок.
+    Сериализатор для загрузки изображений рецептов.
+    Принимает файл целиком (multipart) либо размер файла,
+    который затем загружается частями.
     """
-    id = serializers.ReadOnlyField(source='following.id')
-    email = serializers.ReadOnlyField(source='following.email')
-    username = serializers.ReadOnlyField(source='following.username')
-    first_name = serializers.ReadOnlyField(source='following.first_name')
-    last_name = serializers.ReadOnlyField(source='following.last_name')
-    is_subscribed = serializers.SerializerMethodField()
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    image = serializers.ImageField(write_only=True, required=False)
+    size = serializers.IntegerField(
+        required=False, min_value=1,
+        max_value=settings.RECIPE_IMAGE_MAX_SIZE
+    )
 
     class Meta:
-        model = Follow
-        fields = (
-            'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'recipes', 'recipes_count'
-        )
+        model = ImageUpload
+        fields = ('token', 'size', 'offset', 'image')
+        read_only_fields = ('token', 'offset')
+
+    def validate(self, data):
+        image = data.get('image')
+        if image is None and 'size' not in data:
+            raise serializers.ValidationError(
+                {'detail': 'Передайте изображение или его размер.'}
+            )
+        if image is not None:
+            if image.size > settings.RECIPE_IMAGE_MAX_SIZE:
+                raise serializers.ValidationError({
+                    'detail': 'Размер изображения не должен превышать '
+                              f'{settings.RECIPE_IMAGE_MAX_SIZE} байт.'
+                })
+            data['size'] = data['offset'] = image.size
+        return data
+
+    def create(self, validated_data):
+        image = validated_data.pop('image', None)
+        upload = ImageUpload(**validated_data)
+        if image is None:
+            image = ContentFile(b'')
+        upload.file.save(f'{upload.token}.part', image, save=False)
+        upload.save()
+        return upload
+
 
+class FollowSerializer(serializers.Serializer):
+    """
+    Сериализатор для проверки и создания подписок.
+    """
     def validate(self, data):
         request = self.context.get('request')
         current_user_id = request.user.id
@@ -292,23 +361,3 @@ class FollowSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         return Follow.objects.create(**validated_data)
-
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.following)
-        if limit:
-            queryset = queryset[:int(limit)]
-        return RecipeShortSerializer(queryset, many=True,
-                                     context={'request': request}).data
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.following).count()
-
-    def get_is_subscribed(self, obj):
-        request_user = self.context.get('request').user
-        if request_user and not isinstance(request_user, AnonymousUser):
-            return Follow.objects.filter(
-                user=request_user, following=obj.following
-            ).exists()
-        return False
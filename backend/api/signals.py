@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.prerender import schedule_publish
+from api.recipe_cache import invalidate
+from recipes.documents import documents_rebuilt
+from recipes.images import image_processed
+from recipes.models import Recipe, Tag
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def publish_recipe(sender, instance, **kwargs):
+    schedule_publish([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate([instance.pk])
+
+
+@receiver(documents_rebuilt)
+def publish_rebuilt_recipes(sender, recipe_ids, **kwargs):
+    """Теги, ингредиенты или автор рецептов изменились."""
+    schedule_publish(recipe_ids)
+
+
+@receiver(documents_rebuilt)
+def invalidate_rebuilt_recipes(sender, recipe_ids, **kwargs):
+    invalidate(recipe_ids)
+
+
+@receiver(image_processed)
+def publish_processed_images(sender, recipe_ids, **kwargs):
+    """Изображение рецепта заменено обработанным."""
+    schedule_publish(recipe_ids)
+
+
+@receiver(image_processed)
+def invalidate_processed_images(sender, recipe_ids, **kwargs):
+    invalidate(recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def publish_feed_queries(sender, instance, **kwargs):
+    """Список тегов входит в запросы первых страниц списка рецептов."""
+    schedule_publish()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_recipe_lists(sender, instance, **kwargs):
+    """Теги используются в фильтрах списка рецептов."""
+    invalidate()
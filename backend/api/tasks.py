@@ -0,0 +1,9 @@
+from api.prerender import publish_feed, publish_recipes
+from jobs.queue import job
+
+
+@job('api.publish_recipes')
+def publish_recipes_task(recipe_ids):
+    """Обновление предварительно сформированных ответов в фоновом режиме."""
+    publish_recipes(recipe_ids)
+    publish_feed()
@@ -0,0 +1,95 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.test import APIClient
+
+from api.async_views import (load_subscriber, make_events_token,
+                             recipe_events_app)
+from followers.models import Follow
+
+User = get_user_model()
+
+
+def create_user(username, **extra):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name='Имя', last_name='Фамилия', password='password', **extra
+    )
+
+
+class EventsTokenTests(TestCase):
+    def setUp(self):
+        self.user = create_user('reader')
+        self.author = create_user('author')
+        Follow.objects.create(user=self.user, following=self.author)
+
+    def test_token_requires_authentication(self):
+        response = APIClient().post('/api/events/token/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_identifies_subscriber(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/events/token/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            load_subscriber(None, response.data['token']),
+            (self.user.id, [self.author.id])
+        )
+
+    def test_authorization_header(self):
+        token = Token.objects.create(user=self.user)
+        request = APIClient().get(
+            '/', HTTP_AUTHORIZATION=f'Token {token.key}'
+        ).wsgi_request
+        self.assertEqual(load_subscriber(request)[0], self.user.id)
+
+    def test_missing_credentials(self):
+        request = APIClient().get('/').wsgi_request
+        with self.assertRaises(NotAuthenticated):
+            load_subscriber(request)
+
+    def test_invalid_tokens(self):
+        inactive = create_user('inactive', is_active=False)
+        for token in (
+            'invalid', make_events_token(self.user) + 'x',
+            make_events_token(inactive),
+        ):
+            with self.subTest(token=token), \
+                    self.assertRaises(AuthenticationFailed):
+                load_subscriber(None, token)
+
+    @override_settings(RECIPE_EVENTS={'TOKEN_MAX_AGE': -1})
+    def test_expired_token(self):
+        with self.assertRaises(AuthenticationFailed):
+            load_subscriber(None, make_events_token(self.user))
+
+
+class EventsAppTests(SimpleTestCase):
+    async def request(self, query_string):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        await recipe_events_app(None)({
+            'type': 'http', 'method': 'GET', 'path': '/api/events/',
+            'headers': [], 'query_string': query_string,
+        }, receive, send)
+        return messages
+
+    async def test_invalid_query_token(self):
+        start, body = await self.request(b'token=invalid')
+        self.assertEqual(start['status'], 401)
+        self.assertIn('detail', json.loads(body['body']))
+
+    async def test_missing_credentials(self):
+        start, _ = await self.request(b'')
+        self.assertEqual(start['status'], 401)
+        self.assertIn((b'www-authenticate', b'Token'), start['headers'])
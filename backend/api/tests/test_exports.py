@@ -0,0 +1,157 @@
+import gzip
+
+import orjson
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from api.exports import export, iterate_async, recipe_records
+from followers.models import Follow
+from recipes.documents import rebuild_documents
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCard, Tag)
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.author, cls.reader = (
+            User.objects.create_user(
+                email=f'{username}@example.com', username=username,
+                first_name='Имя', last_name='Фамилия', password='password',
+                is_staff=username == 'admin'
+            )
+            for username in ('admin', 'author', 'reader')
+        )
+        tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        cls.recipes = []
+        for author in (cls.author, cls.reader):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {author.username}',
+                text='Описание', cooking_time=10,
+                image='recipes/images/image.png'
+            )
+            recipe.tags.add(tag)
+            RecipeIngredients.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=5
+            )
+            cls.recipes.append(recipe)
+        rebuild_documents([recipe.id for recipe in cls.recipes])
+        Favorite.objects.create(user=cls.author, recipe=cls.recipes[1])
+        ShoppingCard.objects.create(user=cls.author, recipe=cls.recipes[1])
+        Follow.objects.create(user=cls.author, following=cls.reader)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, path, **headers):
+        response = self.client.get(path, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return response, b''.join(response.streaming_content)
+
+    def records(self, path):
+        _, content = self.export(path)
+        return [orjson.loads(line) for line in content.splitlines()]
+
+    def test_recipes(self):
+        records = self.records('/api/export/recipes/')
+        self.assertEqual(
+            [record['id'] for record in records],
+            [recipe.id for recipe in self.recipes]
+        )
+        record = records[0]
+        self.assertEqual(record['type'], 'recipe')
+        self.assertEqual(record['author']['username'], 'author')
+        self.assertEqual(
+            [tag['slug'] for tag in record['tags']], ['breakfast']
+        )
+        self.assertEqual(record['ingredients'][0]['amount'], 5)
+        self.assertTrue(record['image'].endswith('recipes/images/image.png'))
+        self.assertNotIn('document', record)
+
+    def test_user(self):
+        records = self.records(f'/api/export/users/{self.author.id}/')
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['user', 'recipe', 'favorite', 'shopping_cart', 'follow']
+        )
+        user, recipe, favorite, shopping_cart, follow = records
+        self.assertEqual(user['username'], 'author')
+        self.assertNotIn('password', user)
+        self.assertEqual(recipe['id'], self.recipes[0].id)
+        self.assertEqual(
+            favorite['recipe'],
+            {'id': self.recipes[1].id, 'name': 'Рецепт reader'}
+        )
+        self.assertEqual(shopping_cart['recipe'], favorite['recipe'])
+        self.assertEqual(
+            follow['author'], {'id': self.reader.id, 'username': 'reader'}
+        )
+
+    def test_unknown_user(self):
+        response = self.client.get('/api/export/users/0/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        for path in (
+            '/api/export/recipes/', f'/api/export/users/{self.author.id}/'
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(client.get(path).status_code, 403)
+                self.assertEqual(APIClient().get(path).status_code, 401)
+
+    def test_gzip(self):
+        _, content = self.export('/api/export/recipes/')
+        response, compressed = self.export(
+            '/api/export/recipes/', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(compressed), content)
+
+    def test_rebuilds_missing_documents(self):
+        expected = self.records('/api/export/recipes/')
+        Recipe.objects.filter(id=self.recipes[0].id).update(document={})
+        self.assertEqual(self.records('/api/export/recipes/'), expected)
+
+    def test_closed_export_ends_transaction(self):
+        savepoints = len(connection.savepoint_ids)
+        chunks = export(
+            recipe_records(Recipe.objects.all(), DEFAULT_DB_ALIAS, 1),
+            DEFAULT_DB_ALIAS, 1
+        )
+        self.assertEqual(orjson.loads(next(chunks))['id'], self.recipes[0].id)
+        # Выгрузка читает базу в транзакции, пока передается ответ.
+        self.assertEqual(len(connection.savepoint_ids), savepoints + 1)
+        # StreamingHttpResponse.close при отключении клиента.
+        chunks.close()
+        self.assertEqual(len(connection.savepoint_ids), savepoints)
+
+
+class IterateAsyncTests(SimpleTestCase):
+    async def test_closes_iterator(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield b'first'
+                yield b'second'
+            finally:
+                closed.append(True)
+
+        iterator = iterate_async(chunks())
+        self.assertEqual(await anext(iterator), b'first')
+        await iterator.aclose()
+        self.assertEqual(closed, [True])
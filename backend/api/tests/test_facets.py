@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.documents import rebuild_documents
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+
+class RecipeFacetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                email=f'{username}@example.com', username=username,
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for username in ('first', 'second', 'third')
+        ]
+        cls.breakfast, cls.dinner = (
+            Tag.objects.create(name=name, color='#E26C2D', slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Ужин', 'dinner'))
+        )
+        recipes = []
+        for author, cooking_time, tags in (
+            (0, 5, [cls.breakfast]),
+            (0, 20, [cls.breakfast, cls.dinner]),
+            (0, 120, [cls.dinner]),
+            (1, 45, [cls.breakfast]),
+            (1, 200, []),
+            (2, 14, [cls.breakfast]),
+        ):
+            recipe = Recipe.objects.create(
+                author=cls.authors[author], name='Рецепт', text='Описание',
+                cooking_time=cooking_time, image='recipes/images/image.png'
+            )
+            recipe.tags.set(tags)
+            recipes.append(recipe)
+        rebuild_documents([recipe.id for recipe in recipes])
+
+    def facets(self, query):
+        response = APIClient().get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['facets']
+
+    def test_tags_with_filter(self):
+        self.assertEqual(
+            self.facets('tags=breakfast&facets=tags')['tags'],
+            [
+                {'id': self.breakfast.id, 'slug': 'breakfast', 'count': 4},
+                {'id': self.dinner.id, 'slug': 'dinner', 'count': 1},
+            ]
+        )
+
+    def test_cooking_time_buckets(self):
+        self.assertEqual(
+            self.facets('facets=cooking_time')['cooking_time'],
+            [
+                {'min': 0, 'max': 15, 'count': 2},
+                {'min': 15, 'max': 30, 'count': 1},
+                {'min': 30, 'max': 60, 'count': 1},
+                {'min': 60, 'max': 120, 'count': 0},
+                {'min': 120, 'max': None, 'count': 2},
+            ]
+        )
+        self.assertEqual(
+            [bucket['count'] for bucket in self.facets(
+                'tags=breakfast&facets=cooking_time'
+            )['cooking_time']],
+            [2, 1, 1, 0, 0]
+        )
+
+    @override_settings(
+        RECIPE_FACETS={**settings.RECIPE_FACETS, 'TOP_AUTHORS': 2}
+    )
+    def test_top_authors(self):
+        expected = [
+            {'id': self.authors[0].id, 'username': 'first', 'count': 3},
+            {'id': self.authors[1].id, 'username': 'second', 'count': 2},
+        ]
+        self.assertEqual(self.facets('facets=author')['author'], expected)
+        # Базы без LIMIT в частях UNION ограничивают авторов в Python.
+        with mock.patch.object(
+            connection.features, 'supports_slicing_ordering_in_compound',
+            False
+        ):
+            self.assertEqual(
+                self.facets('facets=author')['author'], expected
+            )
+
+    def test_unknown_facet(self):
+        response = APIClient().get('/api/recipes/?facets=tags,unknown')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('facets', response.data)
+
+    def test_one_extra_query(self):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/recipes/?tags=breakfast')
+        with self.assertNumQueries(len(queries) + 1):
+            client.get(
+                '/api/recipes/?tags=breakfast'
+                '&facets=tags,cooking_time,author'
+            )
@@ -0,0 +1,90 @@
+import base64
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.prerender import file_path
+from jobs.models import Job
+from jobs.queue import claim, run
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class PrerenderTests(TestCase):
+    def setUp(self):
+        for name in ('MEDIA_ROOT', 'PRERENDER_ROOT'):
+            directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, directory)
+            setattr(self, name.lower(), directory)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            PRERENDER={
+                **settings.PRERENDER, 'ENABLED': True,
+                'ROOT': self.prerender_root, 'HTML': False,
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(User.objects.create_user(
+                email='author@example.com', username='author',
+                first_name='Имя', last_name='Фамилия', password='password'
+            ))
+            self.tag = Tag.objects.create(
+                name='Завтрак', color='#E26C2D', slug='breakfast'
+            )
+            self.ingredient = Ingredient.objects.create(
+                name='Соль', measurement_unit='г'
+            )
+
+    def run_jobs(self):
+        while True:
+            with self.captureOnCommitCallbacks(execute=True):
+                job_obj = claim(60)
+                if job_obj is None:
+                    return
+                run(job_obj)
+
+    def test_published_recipe_uses_processed_image(self):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 40), (200, 30, 30)).save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'ingredients': [{'id': self.ingredient.id, 'amount': 5}],
+                'tags': [self.tag.id],
+                'image': 'data:image/png;base64,'
+                         + base64.b64encode(buffer.getvalue()).decode(),
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        # Файлы публикуются до окончания обработки изображения.
+        Job.objects.filter(name='api.publish_recipes').update(
+            run_after=timezone.now() - timedelta(minutes=1)
+        )
+        self.run_jobs()
+        recipe = Recipe.objects.get(id=response.data['id'])
+        self.assertTrue(recipe.image_variants)
+        published = json.loads(
+            file_path(f'/api/recipes/{recipe.id}/').read_bytes()
+        )
+        self.assertTrue(published['image'].endswith(recipe.image.url))
+        self.assertEqual(
+            published['image_variants'].keys(), recipe.image_variants.keys()
+        )
+        page = json.loads(file_path('/api/recipes/').read_bytes())
+        self.assertEqual(
+            page['results'][0]['image_variants'], published['image_variants']
+        )
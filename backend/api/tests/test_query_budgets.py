@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from backend.queries import QueryDetector
+from followers.models import Follow
+from recipes.documents import rebuild_documents
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCard, Tag)
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@example.com', username=f'user{number}',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for number in range(6)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color='#E26C2D', slug=f'tag{number}'
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        recipes = []
+        for author in cls.users[1:]:
+            for number in range(3):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}', text='Описание',
+                    cooking_time=10, image='recipes/images/image.png'
+                )
+                recipe.tags.set(tags)
+                RecipeIngredients.objects.bulk_create(
+                    RecipeIngredients(
+                        recipe=recipe, ingredient=ingredient, amount=5
+                    )
+                    for ingredient in ingredients
+                )
+                recipes.append(recipe)
+        rebuild_documents([recipe.id for recipe in recipes])
+        cls.reader = cls.users[0]
+        for author in cls.users[1:]:
+            Follow.objects.create(user=cls.reader, following=author)
+        for recipe in recipes[::2]:
+            Favorite.objects.create(user=cls.reader, recipe=recipe)
+            ShoppingCard.objects.create(user=cls.reader, recipe=recipe)
+        cls.recipe = recipes[0]
+
+    def setUp(self):
+        token = Token.objects.create(user=self.reader)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.anonymous = APIClient()
+
+    def assertBudget(self, client, path, budget):
+        # Запросы одного вида не повторяются, а их количество не зависит
+        # от количества объектов на странице.
+        with QueryDetector(threshold=1, budget=budget, strict=True):
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_list(self):
+        for path in (
+            '/api/recipes/', '/api/recipes/?limit=12',
+            '/api/recipes/?is_favorited=1&is_in_shopping_cart=1',
+        ):
+            with self.subTest(path=path):
+                self.assertBudget(self.client, path, 7)
+                self.assertBudget(self.anonymous, path, 3)
+
+    def test_recipe_detail(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        self.assertBudget(self.client, path, 7)
+        self.assertBudget(self.anonymous, path, 3)
+
+    def test_user_list(self):
+        for path in ('/api/users/', '/api/users/?limit=3'):
+            with self.subTest(path=path):
+                self.assertBudget(self.client, path, 3)
+                self.assertBudget(self.anonymous, path, 2)
+
+    def test_subscriptions(self):
+        for path in (
+            '/api/users/subscriptions/',
+            '/api/users/subscriptions/?limit=2&recipes_limit=1',
+        ):
+            with self.subTest(path=path):
+                self.assertBudget(self.client, path, 7)
+        response = self.anonymous.get('/api/users/subscriptions/')
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.documents import rebuild_documents
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+
+class RecipeBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/image.png'
+            )
+            for number in range(3)
+        ]
+        cls.recipes[0].tags.add(cls.tag)
+        rebuild_documents([recipe.id for recipe in cls.recipes])
+
+    def get(self, query):
+        return APIClient().get(f'/api/recipes/?{query}')
+
+    def test_order_and_missing(self):
+        first, second, third = (recipe.id for recipe in self.recipes)
+        missing = third + 100
+        response = self.get(f'ids={third},{missing},{first},{third}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.keys(), {'results', 'missing'})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [third, first]
+        )
+        self.assertEqual(response.data['missing'], [missing])
+
+    def test_filtered_out(self):
+        first, second, _ = (recipe.id for recipe in self.recipes)
+        response = self.get(f'ids={second},{first}&tags=breakfast')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']], [first]
+        )
+        self.assertEqual(response.data['missing'], [second])
+
+    def test_invalid_ids(self):
+        response = self.get('ids=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ids', response.data)
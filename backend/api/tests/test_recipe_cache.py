@@ -0,0 +1,82 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from jobs.queue import claim, run
+from recipes.models import Ingredient, Tag
+
+User = get_user_model()
+
+
+class RecipeCacheTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            RECIPE_CACHE={**settings.RECIPE_CACHE, 'ENABLED': True}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.anonymous = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(User.objects.create_user(
+                email='author@example.com', username='author',
+                first_name='Имя', last_name='Фамилия', password='password'
+            ))
+            self.tag = Tag.objects.create(
+                name='Завтрак', color='#E26C2D', slug='breakfast'
+            )
+            self.ingredient = Ingredient.objects.create(
+                name='Соль', measurement_unit='г'
+            )
+
+    def run_jobs(self):
+        while True:
+            with self.captureOnCommitCallbacks(execute=True):
+                job_obj = claim(60)
+                if job_obj is None:
+                    return
+                run(job_obj)
+
+    def test_processed_image_invalidates_cache(self):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 40), (200, 30, 30)).save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'ingredients': [{'id': self.ingredient.id, 'amount': 5}],
+                'tags': [self.tag.id],
+                'image': 'data:image/png;base64,'
+                         + base64.b64encode(buffer.getvalue()).decode(),
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        path = f'/api/recipes/{response.data["id"]}/'
+        # Строка рецепта и ответ списка попадают в кэш до обработки.
+        self.assertEqual(self.anonymous.get(path).data['image_variants'], {})
+        self.assertEqual(
+            self.anonymous.get('/api/recipes/').data['results'][0]
+            ['image_variants'],
+            {}
+        )
+        self.run_jobs()
+        variants = self.anonymous.get(path).data['image_variants']
+        self.assertEqual(variants.keys(), settings.RECIPE_IMAGE_SIZES.keys())
+        self.assertEqual(
+            self.anonymous.get('/api/recipes/').data['results'][0]
+            ['image_variants'],
+            variants
+        )
@@ -0,0 +1,52 @@
+import base64
+from io import BytesIO
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import Base64ImageField
+
+
+def png_bytes():
+    buffer = BytesIO()
+    Image.new('RGB', (40, 40), (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_UPLOAD_CHUNK_SIZE=30)
+class Base64ImageFieldTests(SimpleTestCase):
+    def decode(self, data):
+        file = Base64ImageField().decode_base64(data)
+        try:
+            return file.read()
+        finally:
+            file.close()
+
+    def test_decodes_in_chunks(self):
+        content = png_bytes()
+        data = base64.b64encode(content).decode()
+        self.assertEqual(self.decode(f'data:image/png;base64,{data}'),
+                         content)
+
+    def test_decodes_line_wrapped_base64(self):
+        content = png_bytes()
+        for encoded in (
+            base64.encodebytes(content).decode(),
+            base64.encodebytes(content).decode().replace('\n', '\r\n'),
+        ):
+            with self.subTest(encoded=encoded[:10]):
+                self.assertEqual(
+                    self.decode(f'data:image/png;base64,{encoded}'), content
+                )
+
+    def test_rejects_truncated_data(self):
+        data = base64.b64encode(png_bytes()).decode()[:-1]
+        with self.assertRaises(ValidationError):
+            self.decode(f'data:image/png;base64,{data}')
+
+    def test_rejects_malformed_data_url(self):
+        for data in ('data:image/png,abc', 'data:image/png;base64,a;base64,b'):
+            with self.subTest(data=data):
+                with self.assertRaises(ValidationError):
+                    self.decode(data)
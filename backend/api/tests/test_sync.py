@@ -0,0 +1,110 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from jobs.queue import claim, run
+from recipes.models import Favorite, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (40, 40), (200, 30, 30)).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+@override_settings(CHANGELOG={
+    'PAGE_SIZE': 500, 'MAX_PAGE_SIZE': 2000, 'SETTLE_SECONDS': 0
+})
+class SyncTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag = Tag.objects.create(
+                name='Завтрак', color='#E26C2D', slug='breakfast'
+            )
+            self.ingredient = Ingredient.objects.create(
+                name='Соль', measurement_unit='г'
+            )
+
+    def create_recipe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'ingredients': [{'id': self.ingredient.id, 'amount': 5}],
+                'tags': [self.tag.id],
+                'image': image_data(),
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(id=response.data['id'])
+
+    def run_jobs(self):
+        while True:
+            with self.captureOnCommitCallbacks(execute=True):
+                job_obj = claim(60)
+                if job_obj is None:
+                    return
+                run(job_obj)
+
+    def sync(self, since=0):
+        response = self.client.get('/api/sync/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_created_and_deleted_recipes(self):
+        recipe = self.create_recipe()
+        data = self.sync()
+        self.assertEqual(
+            [item['id'] for item in data['recipes']['updated']], [recipe.id]
+        )
+        recipe_id = recipe.id
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        data = self.sync(data['next'])
+        self.assertEqual(data['recipes']['updated'], [])
+        self.assertEqual(data['recipes']['deleted'], [recipe_id])
+
+    def test_favorites_are_visible_to_their_user(self):
+        recipe = self.create_recipe()
+        since = self.sync()['next']
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.user, recipe=recipe)
+        self.assertEqual(self.sync(since)['favorites']['added'], [recipe.id])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.sync(since)['favorites']['added'], [])
+
+    def test_processed_image_is_synced(self):
+        recipe = self.create_recipe()
+        since = self.sync()['next']
+        self.run_jobs()
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image_variants)
+        updated = self.sync(since)['recipes']['updated']
+        self.assertEqual([item['id'] for item in updated], [recipe.id])
+        self.assertTrue(updated[0]['image'].endswith(recipe.image.url))
+        self.assertEqual(
+            updated[0]['image_variants'].keys(),
+            recipe.image_variants.keys()
+        )
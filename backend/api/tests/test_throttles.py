@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.throttles import TokenBucketThrottle
+
+USER = SimpleNamespace(is_authenticated=True, pk=1)
+VIEW = SimpleNamespace(throttle_scope='test')
+
+
+class ThrottleTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+
+    def allow(self):
+        throttle = TokenBucketThrottle()
+        throttle.THROTTLE_RATES = {'test': '3/min'}
+        throttle.timer = lambda: self.now
+        allowed = throttle.allow_request(SimpleNamespace(user=USER), VIEW)
+        return allowed, throttle
+
+    def test_token_bucket(self):
+        self.assertEqual([self.allow()[0] for _ in range(3)], [True] * 3)
+        allowed, throttle = self.allow()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 20)
+        self.now += 20
+        self.assertEqual([self.allow()[0] for _ in range(2)], [True, False])
+
+    def test_shared_cache_window(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}):
+            self.now = 960.0
+            self.assertEqual(
+                [self.allow()[0] for _ in range(4)], [True] * 3 + [False]
+            )
+            # Предыдущее окно учитывается с весом оставшейся доли: 2/3
+            # от трех запросов.
+            self.now = 1020.0 + 20
+            self.assertTrue(self.allow()[0])
+            allowed, throttle = self.allow()
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(throttle.wait(), 20)
+            self.now += 20
+            self.assertEqual(
+                [self.allow()[0] for _ in range(2)], [True, False]
+            )
@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.views import ImageUploadViewSet
+from recipes.models import ImageUpload
+
+User = get_user_model()
+
+
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='password'
+        ))
+        response = self.client.post('/api/uploads/', {'size': 6})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.token = response.data['token']
+
+    def patch(self, body, offset):
+        return self.client.generic(
+            'PATCH', f'/api/uploads/{self.token}/', body,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunks(self):
+        self.assertEqual(self.patch(b'abc', 0).data['offset'], 3)
+        self.assertEqual(self.patch(b'def', 3).data['offset'], 6)
+        upload = ImageUpload.objects.get(token=self.token)
+        self.assertTrue(upload.is_complete)
+        with open(upload.file.path, 'rb') as file:
+            self.assertEqual(file.read(), b'abcdef')
+
+    def test_wrong_offset(self):
+        response = self.patch(b'abc', 3)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 0)
+
+    def test_too_large(self):
+        self.assertEqual(self.patch(b'abcdefg', 0).status_code, 400)
+        upload = ImageUpload.objects.get(token=self.token)
+        self.assertEqual(upload.offset, 0)
+        self.assertEqual(upload.file.size, 0)
+
+    def test_concurrent_chunk(self):
+        read_chunk = ImageUploadViewSet.read_chunk
+
+        def concurrent(view, stream, file, remaining):
+            # Параллельный запрос дописывает часть, пока читается эта.
+            written = read_chunk(view, stream, file, remaining)
+            ImageUpload.objects.filter(token=self.token).update(offset=2)
+            with open(
+                ImageUpload.objects.get(token=self.token).file.path, 'wb'
+            ) as upload_file:
+                upload_file.write(b'xy')
+            return written
+
+        with mock.patch.object(ImageUploadViewSet, 'read_chunk', concurrent):
+            response = self.patch(b'abc', 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 2)
+        upload = ImageUpload.objects.get(token=self.token)
+        with open(upload.file.path, 'rb') as file:
+            self.assertEqual(file.read(), b'xy')
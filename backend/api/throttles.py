@@ -0,0 +1,89 @@
+import threading
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class TokenBucketThrottle(ScopedRateThrottle):
+    """
+    Ограничение частоты запросов к представлениям с throttle_scope
+    по частотам DEFAULT_THROTTLE_RATES ('10/min'): допускается всплеск
+    до 10 запросов, затем 10 запросов в минуту. Лимит ведется для
+    пользователя или IP адреса анонимного клиента в кэше default.
+
+    LocMemCache ограничивает каждый процесс отдельно ведром токенов,
+    которое изменяется под блокировкой процесса. Общий кэш (Redis,
+    Memcached) ограничивает все процессы скользящим окном на атомарных
+    операциях add и incr, без блокировок и ожидания кэша под ними.
+    """
+    lock = threading.Lock()
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            return self.take_token()
+        return self.count_request()
+
+    def take_token(self):
+        with self.lock:
+            tokens, updated = self.cache.get(
+                self.key, (self.num_requests, self.now)
+            )
+            tokens = min(
+                self.num_requests,
+                tokens + (self.now - updated) * self.refill_rate
+            )
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(self.key, (tokens, self.now), self.duration)
+        self.retry_after = (1 - tokens) / self.refill_rate
+        return allowed
+
+    def count_request(self):
+        """
+        Запросы текущего окна длиной duration считаются счетчиком,
+        запросы предыдущего — с весом оставшейся в окне доли времени.
+        Отклоненный запрос не учитывается.
+        """
+        window, offset = divmod(self.now, self.duration)
+        key = f'{self.key}:{int(window)}'
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Счетчик вытеснен из кэша между add и incr.
+            return True
+        previous = self.cache.get(f'{self.key}:{int(window) - 1}', 0)
+        excess = (
+            previous * (1 - offset / self.duration) + count
+            - self.num_requests
+        )
+        if excess <= 0:
+            return True
+        self.cache.decr(key)
+        self.retry_after = self.duration - offset
+        if previous:
+            self.retry_after = min(
+                self.retry_after, excess * self.duration / previous
+            )
+        return False
+
+    @property
+    def refill_rate(self):
+        """Токенов в секунду."""
+        return self.num_requests / self.duration
+
+    def wait(self):
+        return self.retry_after
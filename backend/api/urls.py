@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
-from api.views import (IngredientViewSet, RecipeViewSet, ShoppingCartView,
-                       SubscribeViewSet, TagViewSet)
+from api import async_views
+from api.views import (EventsTokenView, ExportView, ImageUploadViewSet,
+                       IngredientViewSet, JobStatsView, RecipeViewSet,
+                       ShoppingCartView, SubscribeViewSet, SyncView,
+                       TagViewSet)
 
 app_name = 'api'
 
@@ -11,13 +15,71 @@ router_v1.register('users', SubscribeViewSet, basename='subscribe')
 router_v1.register('recipes', RecipeViewSet, basename='recipe')
 router_v1.register('tags', TagViewSet, basename='tag')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredient')
+router_v1.register('uploads', ImageUploadViewSet, basename='upload')
 
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_READ_VIEWS:
+    recipe_list = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+    recipe_detail = RecipeViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+        'delete': 'destroy'
+    })
+    urlpatterns += [
+        path(
+            'recipes/download_shopping_cart/',
+            async_views.download_shopping_cart_view(
+                ShoppingCartView.as_view()
+            ),
+            name='download_shopping_cart'
+        ),
+        path(
+            'recipes/', async_views.recipe_list_view(recipe_list),
+            name='recipe-list'
+        ),
+        path(
+            'recipes/<str:pk>/', async_views.recipe_detail_view(recipe_detail),
+            name='recipe-detail'
+        ),
+        path(
+            'tags/', async_views.tag_list_view(
+                TagViewSet.as_view({'get': 'list'})
+            ),
+            name='tag-list'
+        ),
+        path(
+            'tags/<str:pk>/', async_views.tag_detail_view(
+                TagViewSet.as_view({'get': 'retrieve'})
+            ),
+            name='tag-detail'
+        ),
+        path(
+            'ingredients/', async_views.ingredient_list_view(
+                IngredientViewSet.as_view({'get': 'list'})
+            ),
+            name='ingredient-list'
+        ),
+        path(
+            'ingredients/<str:pk>/', async_views.ingredient_detail_view(
+                IngredientViewSet.as_view({'get': 'retrieve'})
+            ),
+            name='ingredient-detail'
+        ),
+    ]
+
+urlpatterns += [
     path(
         'recipes/download_shopping_cart/', ShoppingCartView.as_view(),
         name='download_shopping_cart'
     ),
+    path('jobs/stats/', JobStatsView.as_view(), name='job_stats'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('events/token/', EventsTokenView.as_view(), name='events_token'),
+    path('export/recipes/', ExportView.as_view(), name='export_recipes'),
+    path(
+        'export/users/<int:pk>/', ExportView.as_view(), name='export_user'
+    ),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
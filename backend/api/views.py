@@ -1,24 +1,49 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import Http404, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import router
+from django.db.models import F, Q, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from djoser.views import UserViewSet
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (SAFE_METHODS, IsAuthenticated,
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.filters import IngredientSearchFilter, RecipeFilter
-from api.paginators import LimitPaginator
+from api.async_views import make_events_token
+from api.exports import export, iterate_async, recipe_records, user_records
+from api.facets import facet_names, recipe_facets
+from api.fast_serializers import (USER_COLUMNS, USER_COUNTS, recipe_batch,
+                                  recipe_columns, recipe_fieldset, recipe_row,
+                                  represent_recipes, represent_subscriptions,
+                                  represent_users, short_recipe,
+                                  subscription_fieldset, user_annotations,
+                                  user_columns, user_fieldset, user_rows)
+from api.filters import IngredientSearchFilter, RecipeFilter, parse_ids
+from api.paginators import LimitPaginator, UserCursorPaginator
 from api.permissions import AuthorOrReadOnly
-from api.serializers import (FollowSerializer, IngredientSerializer,
-                             RecipeCreateSerializer, RecipeSerializer,
-                             RecipeShortSerializer, TagSerializer)
+from api.recipe_cache import (get_list, get_rows, list_cache_key,
+                              row_cache_applies, set_list)
+from api.serializers import (FollowSerializer, ImageUploadSerializer,
+                             IngredientSerializer, RecipeCreateSerializer,
+                             TagSerializer)
+from backend import hot_keys
+from changelog.models import Change
 from followers.models import Follow
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
-                            ShoppingCard, Tag)
+from followers.suggestions import get_suggestions
+from jobs.queue import queue_stats
+from recipes.models import (Favorite, ImageUpload, Ingredient, Recipe,
+                            RecipeIngredients, ShoppingCard, Tag)
 
 User = get_user_model()
 
@@ -39,14 +64,79 @@ class RecipeViewSet(viewsets.ModelViewSet):
     Так же используется для работы с избранными рецептами и списком покупок.
     """
     queryset = Recipe.objects.all()
+    serializer_class = RecipeCreateSerializer
     pagination_class = LimitPaginator
     permission_classes = (IsAuthenticatedOrReadOnly, AuthorOrReadOnly)
     filterset_class = RecipeFilter
 
-    def get_serializer_class(self):
-        if self.request.method in SAFE_METHODS:
-            return RecipeSerializer
-        return RecipeCreateSerializer
+    @property
+    def throttle_scope(self):
+        # Создание и изменение принимают изображение в base64.
+        if self.action in ('create', 'update', 'partial_update'):
+            return 'uploads'
+        return None
+
+    def list(self, request, *args, **kwargs):
+        cache_key = list_cache_key(request)
+        data = get_list(cache_key)
+        if data is None:
+            data = self.list_data(request)
+            set_list(cache_key, data)
+        return Response(data)
+
+    def list_data(self, request):
+        fieldset = recipe_fieldset(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'ids' in request.query_params:
+            return self.list_by_ids(request, queryset, fieldset)
+        facets = facet_names(request.query_params)
+        rows = self.paginate_queryset(
+            queryset.values(*recipe_columns(fieldset))
+        )
+        data = self.get_paginated_response(represent_recipes(
+            request, rows, fieldset, use_thumbnails=True
+        )).data
+        if facets:
+            data['facets'] = recipe_facets(queryset, facets)
+        return data
+
+    def list_by_ids(self, request, queryset, fieldset):
+        """
+        Рецепты по списку ids=1,2,3 в переданном порядке без пагинации.
+        Идентификаторы, которых нет или которые не прошли остальные
+        фильтры, возвращаются в поле missing.
+        """
+        rows, missing = recipe_batch(
+            queryset, parse_ids(request.query_params['ids']), fieldset
+        )
+        return {
+            'results': represent_recipes(
+                request, rows, fieldset, use_thumbnails=True
+            ),
+            'missing': missing,
+        }
+
+    def retrieve(self, request, *args, **kwargs):
+        fieldset = recipe_fieldset(request)
+        row = self.get_row()
+        hot_keys.record(hot_keys.RECIPES, row['id'])
+        return Response(represent_recipes(request, [row], fieldset)[0])
+
+    def get_row(self):
+        """
+        Строка рецепта из кэша рецептов, если он включен и в запросе
+        нет фильтров RecipeFilter, иначе из отфильтрованного queryset.
+        """
+        if not row_cache_applies(self.request.query_params):
+            return recipe_row(self.get_object())
+        try:
+            pk = int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+        row = get_rows([pk]).get(pk)
+        if row is None:
+            raise Http404
+        return row
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -68,9 +158,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         model.objects.create(user=request.user, recipe=recipe)
-        updated_recipe = Recipe.objects.get(pk=recipe.pk)
-        serialized_recipe = RecipeShortSerializer(updated_recipe).data
-        return Response(serialized_recipe, status=status.HTTP_201_CREATED)
+        return Response(
+            short_recipe(None, recipe_row(recipe), use_thumbnails=False),
+            status=status.HTTP_201_CREATED
+        )
 
     def perform_delete(self, request, model):
         recipe = self.get_object()
@@ -122,18 +213,66 @@ class SubscribeViewSet(UserViewSet):
             self.permission_classes = (IsAuthenticated,)
         return super().get_permissions()
 
+    def get_queryset(self):
+        return super().get_queryset().annotate(**user_annotations(
+            self.request.user, user_fieldset(self.request)
+        ))
+
+    def list(self, request, *args, **kwargs):
+        fieldset = user_fieldset(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = UserCursorPaginator()
+        rows = paginator.paginate_queryset(
+            queryset.values(
+                *user_columns(fieldset),
+                *user_annotations(request.user, fieldset),
+                'date_joined'
+            ),
+            request, view=self
+        )
+        return paginator.get_paginated_response(
+            represent_users(request, rows, fieldset)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        fieldset = user_fieldset(request)
+        if self.action == 'me':
+            # Пользователь уже загружен при аутентификации,
+            # подписаться на себя нельзя.
+            row = {field: getattr(request.user, field)
+                   for field in USER_COLUMNS}
+            row['is_subscribed'] = False
+            counts = [field for field in USER_COUNTS if field in fieldset]
+            if counts:
+                row.update(self.get_queryset().filter(
+                    pk=request.user.pk
+                ).values(*counts).get())
+        else:
+            user = self.get_object()
+            row = {
+                field: getattr(user, field)
+                for field in (
+                    *user_columns(fieldset),
+                    *user_annotations(request.user, fieldset)
+                )
+            }
+        return Response(represent_users(request, [row], fieldset)[0])
+
     @action(detail=True, methods=['POST'])
     def subscribe(self, request, id=None):
         serializer = FollowSerializer(
             data={'following': id}, context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save(
-            user=self.request.user,
-            following=get_object_or_404(User, id=id)
-        )
+        following = get_object_or_404(User, id=id)
+        serializer.save(user=self.request.user, following=following)
+        fieldset = subscription_fieldset(request)
         return Response(
-            serializer.data, status=status.HTTP_201_CREATED
+            represent_subscriptions(
+                request, user_rows([following.id], user_columns(fieldset)),
+                fieldset
+            )[0],
+            status=status.HTTP_201_CREATED
         )
 
     @subscribe.mapping.delete
@@ -153,14 +292,24 @@ class SubscribeViewSet(UserViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    @action(detail=False)
+    @action(detail=False, permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
-        queryset = Follow.objects.filter(user=request.user)
-        pages = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(
-            pages, many=True, context={'request': request}
+        fieldset = subscription_fieldset(request)
+        author_ids = self.paginate_queryset(
+            Follow.objects.filter(user=request.user).order_by('id')
+            .values_list('following_id', flat=True)
         )
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(represent_subscriptions(
+            request, user_rows(author_ids, user_columns(fieldset)), fieldset
+        ))
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def suggestions(self, request):
+        fieldset = user_fieldset(request)
+        author_ids = self.paginate_queryset(get_suggestions(request.user.id))
+        return self.get_paginated_response(represent_users(
+            request, user_rows(author_ids, user_columns(fieldset)), fieldset
+        ))
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -175,11 +324,103 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
+class ImageUploadViewSet(mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    Представление для загрузки изображений рецептов.
+    POST принимает файл целиком (multipart) или размер файла,
+    PATCH дописывает очередную часть файла с позиции Upload-Offset,
+    GET возвращает текущую позицию для возобновления загрузки.
+    Полученный токен передается в поле image при создании рецепта.
+    """
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'uploads'
+    serializer_class = ImageUploadSerializer
+    lookup_field = 'token'
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def partial_update(self, request, token=None):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Не передан заголовок Upload-Offset.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        upload = get_object_or_404(self.get_queryset(), token=token)
+        if offset != upload.offset:
+            return self.offset_conflict(upload.offset)
+        # Часть файла читается во временный файл вне транзакции
+        # и записывается в загрузку только после сдвига позиции:
+        # параллельный запрос с той же позицией не перезапишет ее.
+        with tempfile.TemporaryFile() as chunk:
+            written = self.read_chunk(
+                request.stream, chunk, upload.size - offset
+            )
+            if written is None:
+                return Response(
+                    {'detail': 'Размер файла превышает заявленный.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not ImageUpload.objects.filter(
+                pk=upload.pk, offset=offset
+            ).update(offset=F('offset') + written):
+                return self.offset_conflict(
+                    ImageUpload.objects.filter(pk=upload.pk).values_list(
+                        'offset', flat=True
+                    ).first()
+                )
+            try:
+                chunk.seek(0)
+                with open(upload.file.path, 'r+b') as file:
+                    file.seek(offset)
+                    shutil.copyfileobj(
+                        chunk, file, settings.IMAGE_UPLOAD_CHUNK_SIZE
+                    )
+            except BaseException:
+                ImageUpload.objects.filter(
+                    pk=upload.pk, offset=offset + written
+                ).update(offset=offset)
+                raise
+        upload.offset = offset + written
+        return Response(self.get_serializer(upload).data)
+
+    def offset_conflict(self, offset):
+        return Response(
+            {'detail': 'Неверная позиция загрузки.', 'offset': offset},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    def read_chunk(self, stream, file, remaining):
+        """
+        Записывает тело запроса в file и возвращает число байт
+        или None, если их больше remaining.
+        """
+        chunk_size = settings.IMAGE_UPLOAD_CHUNK_SIZE
+        written = 0
+        while stream is not None:
+            chunk = stream.read(min(chunk_size, remaining - written + 1))
+            if not chunk:
+                break
+            if written + len(chunk) > remaining:
+                return None
+            file.write(chunk)
+            written += len(chunk)
+        return written
+
+
 class ShoppingCartView(APIView):
     """
     Представление для скачивания файла TXT со списком покупок.
     """
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    throttle_scope = 'shopping_cart'
 
     def get(self, request, *args, **kwargs):
         shopping_carts = ShoppingCard.objects.filter(
@@ -223,3 +464,161 @@ class ShoppingCartView(APIView):
                 f"{ingredient['measurement_unit']}\n"
             )
         return txt_content
+
+
+class JobStatsView(APIView):
+    """
+    Представление для мониторинга очереди фоновых задач.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(queue_stats())
+
+
+class EventsTokenView(APIView):
+    """
+    Выдает токен для подключения к потоку событий /api/events/?token=...
+    из браузера. Токен действует RECIPE_EVENTS['TOKEN_MAX_AGE'] секунд
+    и проверяется только при подключении.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        return Response({
+            'token': make_events_token(request.user),
+            'expires_in': settings.RECIPE_EVENTS['TOKEN_MAX_AGE'],
+        })
+
+
+class ExportView(APIView):
+    """
+    Выгрузка всех рецептов (export/recipes/) или данных пользователя
+    (export/users/<id>/) в формате NDJSON для администраторов.
+    Ответ передается по частям по мере чтения базы; с заголовком
+    Accept-Encoding: gzip он сжимается.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, pk=None, *args, **kwargs):
+        # Маршрутизация чтения действует до возврата ответа, поэтому
+        # база выбирается заранее и используется при передаче.
+        using = router.db_for_read(Recipe)
+        chunk_size = settings.EXPORTS['CHUNK_SIZE']
+        if pk is None:
+            filename = 'recipes.ndjson'
+            records = recipe_records(Recipe.objects.all(), using, chunk_size)
+        else:
+            get_object_or_404(User.objects.using(using), pk=pk)
+            filename = f'user-{pk}.ndjson'
+            records = user_records(pk, using, chunk_size)
+        gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        content = export(records, using, chunk_size, gzip)
+        if isinstance(request._request, ASGIRequest):
+            content = iterate_async(content)
+        response = StreamingHttpResponse(
+            content, content_type='application/x-ndjson'
+        )
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        # nginx передает ответ клиенту сразу, без буферизации на диске.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class SyncView(APIView):
+    """
+    Представление для синхронизации клиентов по журналу изменений.
+    Возвращает рецепты, теги и ингредиенты, измененные после токена
+    since, их удаления, а также изменения избранного и списка покупок
+    пользователя. Токен next передается в следующем запросе.
+    """
+    permission_classes = (IsAuthenticatedOrReadOnly,)
+
+    def get(self, request, *args, **kwargs):
+        options = settings.CHANGELOG
+        since = self.get_number(request, 'since', 0)
+        limit = min(
+            self.get_number(request, 'limit', options['PAGE_SIZE']) or 1,
+            options['MAX_PAGE_SIZE']
+        )
+        visible = Q(user_id__isnull=True)
+        if request.user.is_authenticated:
+            visible |= Q(user_id=request.user.id)
+        entries = Change.objects.filter(visible, id__gt=since).values_list(
+            'id', 'model', 'object_id', 'action', 'created'
+        )[:limit + 1]
+        settled = timezone.now() - timedelta(
+            seconds=options['SETTLE_SECONDS']
+        )
+        changes = {}
+        token = since
+        has_more = False
+        for number, entry in enumerate(entries):
+            pk, model, object_id, operation, created = entry
+            if created > settled:
+                break
+            if number == limit:
+                has_more = True
+                break
+            changes.pop((model, object_id), None)
+            changes[(model, object_id)] = operation
+            token = pk
+        return Response({
+            'next': token,
+            'has_more': has_more,
+            **self.represent_changes(request, changes),
+        })
+
+    @staticmethod
+    def get_number(request, name, default):
+        try:
+            value = int(request.query_params.get(name, default))
+        except ValueError:
+            value = -1
+        if value < 0:
+            raise ValidationError({name: 'Ожидается неотрицательное число.'})
+        return value
+
+    def represent_changes(self, request, changes):
+        updated = {model: [] for model, _ in Change.MODEL_CHOICES}
+        deleted = {model: [] for model, _ in Change.MODEL_CHOICES}
+        for (model, object_id), operation in changes.items():
+            if operation == Change.UPSERT:
+                updated[model].append(object_id)
+            else:
+                deleted[model].append(object_id)
+        fieldset = recipe_fieldset(request)
+        recipes, _ = recipe_batch(
+            Recipe.objects.all(), updated[Change.RECIPE], fieldset
+        )
+        return {
+            'recipes': {
+                'updated': represent_recipes(request, recipes, fieldset),
+                'deleted': deleted[Change.RECIPE],
+            },
+            'tags': {
+                'updated': list(Tag.objects.filter(
+                    id__in=updated[Change.TAG]
+                ).values('id', 'name', 'color', 'slug')),
+                'deleted': deleted[Change.TAG],
+            },
+            'ingredients': {
+                'updated': list(Ingredient.objects.filter(
+                    id__in=updated[Change.INGREDIENT]
+                ).order_by('id').values('id', 'name', 'measurement_unit')),
+                'deleted': deleted[Change.INGREDIENT],
+            },
+            'favorites': {
+                'added': updated[Change.FAVORITE],
+                'removed': deleted[Change.FAVORITE],
+            },
+            'shopping_cart': {
+                'added': updated[Change.SHOPPING_CART],
+                'removed': deleted[Change.SHOPPING_CART],
+            },
+        }
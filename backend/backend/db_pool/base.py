@@ -0,0 +1,106 @@
+import threading
+import time
+
+import psycopg2
+from django.db.backends.postgresql import base
+from psycopg2 import extensions, pool
+
+_pools = {}
+_pools_lock = threading.Lock()
+_checked_in = {}
+
+
+def close_pools():
+    """
+    Закрывает все пулы процесса.
+    Вызывается в мастер-процессе gunicorn перед fork, чтобы рабочие
+    процессы не унаследовали открытые соединения.
+    """
+    with _pools_lock:
+        for connection_pool in _pools.values():
+            connection_pool.closeall()
+        _pools.clear()
+        _checked_in.clear()
+
+
+class PooledDatabase:
+    """Модуль psycopg2, у которого connect() берет соединение из пула."""
+    def __init__(self, connection_pool, options):
+        self.pool = connection_pool
+        self.options = options
+
+    def __getattr__(self, name):
+        return getattr(psycopg2, name)
+
+    def connect(self, **conn_params):
+        deadline = time.monotonic() + self.options.get('TIMEOUT', 5)
+        while True:
+            try:
+                connection = self.pool.getconn()
+            except pool.PoolError:
+                if time.monotonic() > deadline:
+                    raise psycopg2.OperationalError(
+                        'Нет свободных соединений в пуле.'
+                    )
+                time.sleep(0.01)
+                continue
+            idle_since = _checked_in.pop(id(connection), None)
+            if self.is_alive(connection, idle_since):
+                return connection
+            self.pool.putconn(connection, close=True)
+
+    def is_alive(self, connection, idle_since):
+        if connection.closed:
+            return False
+        if idle_since is None or (
+            time.monotonic() - idle_since
+            < self.options.get('CHECK_IDLE_AFTER', 30)
+        ):
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL с пулом соединений внутри процесса.
+    Закрытие соединения в конце запроса возвращает его в пул,
+    поэтому новый запрос не тратит время на подключение к серверу.
+    Настройки пула задаются ключом POOL в DATABASES.
+    """
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                _pools[self.alias] = pool.ThreadedConnectionPool(
+                    options.get('MIN_SIZE', 1),
+                    options.get('MAX_SIZE', 10),
+                    **conn_params
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        self.Database = PooledDatabase(
+            self.get_pool(conn_params), self.settings_dict.get('POOL', {})
+        )
+        return super().get_new_connection(conn_params)
+
+    def _close(self):
+        connection_pool = _pools.get(self.alias)
+        if connection_pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.connection.closed:
+                connection_pool.putconn(self.connection, close=True)
+                return
+            if (
+                self.connection.get_transaction_status()
+                != extensions.TRANSACTION_STATUS_IDLE
+            ):
+                self.connection.rollback()
+            _checked_in[id(self.connection)] = time.monotonic()
+            connection_pool.putconn(self.connection)
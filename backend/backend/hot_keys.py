@@ -0,0 +1,200 @@
+"""
+Популярные ключи (рецепты, запросы списка рецептов) по всем процессам.
+Каждый процесс считает обращения алгоритмом Space-Saving: хранит не
+больше CAPACITY ключей каждого вида, новый ключ вытесняет самый редкий
+и наследует его счетчик, поэтому часто запрашиваемые ключи не теряются.
+Счетчики уменьшаются вдвое каждые HALF_LIFE секунд.
+
+Не чаще раза в FLUSH_INTERVAL секунд процесс сохраняет счетчики в свой
+файл в каталоге HOT_KEYS['DIRECTORY']. top() суммирует файлы всех
+процессов, в том числе завершившихся, если файл обновлялся в последние
+WINDOW секунд: после перезапуска доступны ключи предыдущего запуска.
+"""
+import atexit
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+RECIPES = 'recipes'
+RECIPE_LISTS = 'recipe_lists'
+
+_paused = ContextVar('hot_keys_paused', default=False)
+
+
+class SpaceSaving:
+    """Приблизительные счетчики самых частых ключей (top-K)."""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        # Куча (счетчик, ключ) с устаревшими записями: запись верна,
+        # если счетчик совпадает с self.counts.
+        self.heap = []
+
+    def add(self, key, weight=1):
+        if key in self.counts:
+            self.counts[key] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = weight
+        else:
+            self.counts[key] = self.pop_min() + weight
+        heapq.heappush(self.heap, (self.counts[key], key))
+        if len(self.heap) > 4 * self.capacity:
+            self.rebuild()
+
+    def pop_min(self):
+        """Удаляет самый редкий ключ и возвращает его счетчик."""
+        while True:
+            count, key = heapq.heappop(self.heap)
+            if self.counts.get(key) == count:
+                del self.counts[key]
+                return count
+
+    def rebuild(self):
+        self.heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def decay(self, factor):
+        self.counts = {
+            key: count * factor for key, count in self.counts.items()
+        }
+        self.rebuild()
+
+
+class HotKeys:
+    """Счетчики процесса и поток, сохраняющий их в файл."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()
+        self.sketches = {}
+        self.changed = False
+        self.path = None
+        self.writer = None
+        self.decayed = time.monotonic()
+
+    def record(self, kind, key):
+        if not settings.HOT_KEYS['ENABLED'] or _paused.get():
+            return
+        with self.lock:
+            sketch = self.sketches.get(kind)
+            if sketch is None:
+                sketch = self.sketches[kind] = SpaceSaving(
+                    settings.HOT_KEYS['CAPACITY']
+                )
+            sketch.add(str(key))
+            self.changed = True
+        self.start()
+
+    def start(self):
+        if self.writer is not None:
+            return
+        with self.flushing:
+            if self.writer is None:
+                self.writer = threading.Thread(
+                    target=self.run, name='hot-keys-writer', daemon=True
+                )
+                self.writer.start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.HOT_KEYS['FLUSH_INTERVAL'])
+            if time.monotonic() - self.decayed >= (
+                settings.HOT_KEYS['HALF_LIFE']
+            ):
+                self.decay()
+            if self.changed:
+                self.flush()
+
+    def decay(self):
+        with self.lock:
+            for sketch in self.sketches.values():
+                sketch.decay(0.5)
+            self.decayed = time.monotonic()
+            self.changed = True
+
+    def snapshot(self):
+        with self.lock:
+            self.changed = False
+            return {
+                kind: sketch.counts.copy()
+                for kind, sketch in self.sketches.items()
+            }
+
+    def flush(self):
+        """Сохраняет счетчики процесса в его файл."""
+        with self.flushing:
+            if self.path is None:
+                directory = settings.HOT_KEYS['DIRECTORY']
+                os.makedirs(directory, exist_ok=True)
+                # Номера процессов повторяются после перезапуска
+                # контейнера, поэтому имя файла уникально.
+                self.path = os.path.join(
+                    directory, f'{os.getpid()}-{uuid.uuid4().hex}.json'
+                )
+            temporary = f'{self.path}.tmp'
+            with open(temporary, 'w') as file:
+                json.dump(self.snapshot(), file)
+            os.replace(temporary, self.path)
+
+
+hot_keys = HotKeys()
+os.register_at_fork(after_in_child=hot_keys.reset)
+
+
+@atexit.register
+def flush_at_exit():
+    if hot_keys.changed:
+        hot_keys.flush()
+
+
+def record(kind, key):
+    """Отмечает обращение к ключу."""
+    hot_keys.record(kind, key)
+
+
+@contextmanager
+def paused():
+    """Обращения внутри блока не учитываются: запросы самого backend."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def top(kind, limit):
+    """
+    Самые частые ключи вида kind по файлам всех процессов. Файлы,
+    которые не обновлялись дольше WINDOW секунд, удаляются.
+    """
+    directory = settings.HOT_KEYS['DIRECTORY']
+    oldest = time.time() - settings.HOT_KEYS['WINDOW']
+    total = Counter()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < oldest:
+                os.unlink(path)
+                continue
+            with open(path) as file:
+                counts = json.load(file).get(kind, {})
+        except (OSError, ValueError):
+            continue
+        total.update(counts)
+    return [key for key, _ in total.most_common(limit)]
@@ -0,0 +1,436 @@
+"""
+Метрики производительности запросов в формате Prometheus (/metrics).
+Каждый процесс накапливает значения в памяти и не чаще раза
+в FLUSH_INTERVAL секунд сохраняет их в файл <pid>.json в каталоге
+METRICS['DIRECTORY']. Ответ /metrics суммирует файлы всех процессов;
+файлы завершившихся процессов переносятся в archive.json, поэтому
+счетчики не уменьшаются после перезапуска процессов gunicorn.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+ARCHIVE = 'archive.json'
+LOCK = '.lock'
+
+# Имя -> (описание, границы интервалов).
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Длительность обработки запроса.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'http_response_size_bytes': (
+        'Размер тела ответа.',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+    ),
+    'db_queries_per_request': (
+        'Количество запросов к базе данных за запрос.',
+        (0, 1, 2, 5, 10, 20, 50, 100),
+    ),
+}
+COUNTERS = {
+    'db_query_seconds_total': 'Время выполнения запросов к базе данных.',
+    'render_seconds_total': 'Время формирования тела ответа.',
+    'cache_requests_total': 'Обращения к кэшу: попадания и промахи.',
+    'requests_shed_total': 'Запросы, отклоненные при перегрузке.',
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def series_key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+class Registry:
+    """
+    Значения метрик текущего процесса. Поток сохраняет их в файл
+    раз в FLUSH_INTERVAL секунд, если значения изменились.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.changed = False
+        self.pid = None
+        self.writer = None
+
+    def inc(self, name, labels, value=1):
+        key = series_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.changed = True
+        self.start()
+
+    def observe(self, name, labels, value):
+        """
+        Значение гистограммы: количества по интервалам (без накопления),
+        сумма и общее количество.
+        """
+        bounds = HISTOGRAMS[name][1]
+        key = series_key(name, labels)
+        with self.lock:
+            values = self.histograms.setdefault(key, [0] * (len(bounds) + 3))
+            index = next(
+                (number for number, bound in enumerate(bounds)
+                 if value <= bound),
+                len(bounds)
+            )
+            values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+            self.changed = True
+        self.start()
+
+    def snapshot(self):
+        with self.lock:
+            self.changed = False
+            return {
+                'counters': dict(self.counters),
+                'histograms': {
+                    key: list(values)
+                    for key, values in self.histograms.items()
+                },
+            }
+
+    def start(self):
+        if self.writer is not None:
+            return
+        with self.flushing:
+            if self.writer is None:
+                self.writer = threading.Thread(
+                    target=self.run, name='metrics-writer', daemon=True
+                )
+                self.writer.start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.METRICS['FLUSH_INTERVAL'])
+            if self.changed:
+                self.flush()
+
+    def flush(self):
+        """Сохраняет значения процесса в файл <pid>.json."""
+        with self.flushing:
+            directory = settings.METRICS['DIRECTORY']
+            pid = os.getpid()
+            if self.pid != pid:
+                os.makedirs(directory, exist_ok=True)
+                # Файл с тем же pid остался от завершившегося процесса.
+                with locked(directory, fcntl.LOCK_EX):
+                    archive(directory, {pid})
+                self.pid = pid
+            path = os.path.join(directory, f'{pid}.json')
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w') as file:
+                json.dump(self.snapshot(), file)
+            os.replace(temporary, path)
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+
+
+@atexit.register
+def flush_at_exit():
+    if registry.changed:
+        registry.flush()
+
+
+@contextmanager
+def locked(directory, operation):
+    with open(os.path.join(directory, LOCK), 'a') as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def merge(total, values):
+    for key, value in values.get('counters', {}).items():
+        total['counters'][key] = total['counters'].get(key, 0) + value
+    for key, value in values.get('histograms', {}).items():
+        current = total['histograms'].get(key)
+        total['histograms'][key] = (
+            value if current is None
+            else [first + second for first, second in zip(current, value)]
+        )
+    return total
+
+
+def process_files(directory):
+    """Файлы процессов: [(pid, путь), ...]."""
+    files = []
+    for name in os.listdir(directory):
+        pid, extension = os.path.splitext(name)
+        if extension == '.json' and pid.isdigit():
+            files.append((int(pid), os.path.join(directory, name)))
+    return files
+
+
+def archive(directory, stale=()):
+    """
+    Переносит в archive.json значения завершившихся процессов
+    и процессов из stale. Вызывается под исключительной блокировкой.
+    """
+    files = [
+        path for pid, path in process_files(directory)
+        if pid in stale or not is_alive(pid)
+    ]
+    if not files:
+        return
+    path = os.path.join(directory, ARCHIVE)
+    total = merge({'counters': {}, 'histograms': {}}, read(path))
+    for file in files:
+        merge(total, read(file))
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(total, file)
+    os.replace(temporary, path)
+    for file in files:
+        os.remove(file)
+
+
+def collect():
+    """Суммарные значения всех процессов."""
+    directory = settings.METRICS['DIRECTORY']
+    registry.flush()
+    with locked(directory, fcntl.LOCK_EX):
+        archive(directory)
+        total = merge(
+            {'counters': {}, 'histograms': {}},
+            read(os.path.join(directory, ARCHIVE))
+        )
+        for _, path in process_files(directory):
+            merge(total, read(path))
+    return total
+
+
+def clear():
+    """Удаляет значения предыдущего запуска."""
+    directory = settings.METRICS['DIRECTORY']
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith('.json') or name.endswith('.tmp'):
+            os.remove(os.path.join(directory, name))
+
+
+def format_labels(labels, **extra):
+    labels = [*labels, *extra.items()]
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+         .replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(
+        f'{name}="{value}"' for name, value in escaped
+    ) + '}'
+
+
+def format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return repr(value)
+
+
+def exposition(values):
+    """Текстовый формат Prometheus 0.0.4."""
+    series = {}
+    for kind in ('counters', 'histograms'):
+        for key, value in values[kind].items():
+            name, labels = json.loads(key)
+            series.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, value in sorted(series.get(name, ())):
+            cumulative = 0
+            for bound, count in zip((*bounds, '+Inf'), value):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket'
+                    f'{format_labels(labels, le=format_number(bound))} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{name}_sum{format_labels(labels)} '
+                f'{format_number(value[-2])}'
+            )
+            lines.append(f'{name}_count{format_labels(labels)} {value[-1]}')
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, value in sorted(series.get(name, ())):
+            lines.append(
+                f'{name}{format_labels(labels)} {format_number(value)}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Запросы к базе данных и время рендеринга одного HTTP запроса."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0
+        self.render_time = 0
+
+    def add_query(self, seconds):
+        # Запросы асинхронных представлений выполняются в нескольких
+        # потоках одновременно.
+        with self.lock:
+            self.queries += 1
+            self.db_time += seconds
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка execute_wrapper: учитывает запрос в метриках запроса."""
+    tracker = _current.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tracker.add_query(time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    Подключает record_query ко всем соединениям: connection.execute_wrapper
+    действует только внутри блока with, а соединение живет дольше запроса.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_render(seconds):
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.render_time += seconds
+
+
+def record_cache(cache, hits, misses):
+    """Учитывает попадания и промахи обращения к кэшу."""
+    if not settings.METRICS['ENABLED']:
+        return
+    if hits:
+        registry.inc('cache_requests_total', {'cache': cache, 'result': 'hit'},
+                     hits)
+    if misses:
+        registry.inc(
+            'cache_requests_total', {'cache': cache, 'result': 'miss'}, misses
+        )
+
+
+class MetricsMiddleware:
+    """
+    Записывает длительность, размер ответа, количество и время запросов
+    к базе данных и время рендеринга по имени маршрута
+    (например, api:recipe-list). Подключается первым в MIDDLEWARE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tracker = RequestMetrics()
+        token = _current.set(tracker)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, tracker, start)
+        return response
+
+    async def __acall__(self, request):
+        tracker = RequestMetrics()
+        token = _current.set(tracker)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, tracker, start)
+        return response
+
+    @staticmethod
+    def record(request, response, tracker, start):
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        registry.observe('http_request_duration_seconds', {
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+        }, duration)
+        if not response.streaming:
+            registry.observe(
+                'http_response_size_bytes', {'route': route},
+                len(response.content)
+            )
+        registry.observe(
+            'db_queries_per_request', {'route': route}, tracker.queries
+        )
+        registry.inc('db_query_seconds_total', {'route': route},
+                     tracker.db_time)
+        registry.inc('render_seconds_total', {'route': route},
+                     tracker.render_time)
+
+
+def metrics_view(request):
+    """Метрики всех процессов. Если задан METRICS_TOKEN, нужен Bearer."""
+    token = settings.METRICS['TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(
+        exposition(collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
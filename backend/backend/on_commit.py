@@ -0,0 +1,57 @@
+"""
+Пачки изменений, обрабатываемые после завершения транзакции.
+Изменения одной транзакции объединяются и передаются обработчику
+одним вызовом. Изменения, сделанные во вложенном блоке atomic с точкой
+сохранения, собираются отдельной пачкой: при откате точки сохранения
+Django отменяет ее обработчик, и откаченные изменения не обрабатываются.
+Вне транзакции изменения обрабатываются сразу.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+class _Callback:
+    """Обработчик on_commit, передающий пачку в flush один раз."""
+    def __init__(self, batch, pending):
+        self.batch = batch
+        self.pending = pending
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        self.batch.flush(self.pending)
+
+
+class CommitBatch:
+    """
+    Пачка изменений текущей транзакции.
+    factory создает пустую пачку, merge(pending, items) добавляет
+    в нее изменения, flush(pending) вызывается после транзакции.
+    Пачки хранятся в обработчиках on_commit соединения, поэтому
+    у каждого потока они свои.
+    """
+    def __init__(self, flush, factory=set, merge=set.update,
+                 using=DEFAULT_DB_ALIAS):
+        self.flush = flush
+        self.factory = factory
+        self.merge = merge
+        self.using = using
+
+    def add(self, items):
+        connection = connections[self.using]
+        if connection.in_atomic_block:
+            savepoints = set(connection.savepoint_ids)
+            # Изменения добавляются в пачку, обработчик которой
+            # отменяется вместе с ними: он зарегистрирован во всех
+            # текущих точках сохранения.
+            for entry_savepoints, callback, _ in connection.run_on_commit:
+                if (
+                    isinstance(callback, _Callback)
+                    and callback.batch is self
+                    and not callback.done
+                    and savepoints <= entry_savepoints
+                ):
+                    self.merge(callback.pending, items)
+                    return
+        pending = self.factory()
+        self.merge(pending, items)
+        transaction.on_commit(_Callback(self, pending), using=self.using)
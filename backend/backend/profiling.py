@@ -0,0 +1,290 @@
+"""
+Профилирование отдельных запросов.
+Запрос профилируется, если передан заголовок PROFILING['HEADER']
+с токеном (python manage.py profiling_token <username>, только для
+персонала) или запрос выбран случайно (1 из SAMPLE_RATE). Пока
+обрабатывается профилируемый запрос, отдельный поток раз в INTERVAL
+секунд снимает стек обработчика; стеки сохраняются в формате collapsed
+stacks (flamegraph.pl, speedscope) вместе с трассировкой SQL.
+Если задан SLOW_THRESHOLD, трассировка SQL ведется для всех запросов
+и сохраняется для запросов дольше порога. Без заголовка, выборки
+и порога middleware только проверяет наличие заголовка.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from backend.queries import fingerprint, origin
+
+SALT = 'backend.profiling'
+
+_trace = ContextVar('profiling_trace', default=None)
+
+
+def make_token(user):
+    return signing.TimestampSigner(salt=SALT).sign(str(user.pk))
+
+
+def check_token(value):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            value, max_age=settings.PROFILING['TOKEN_MAX_AGE']
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def collapse(frame):
+    """Стек в формате collapsed stacks: модуль:функция через ;."""
+    names = []
+    while frame is not None:
+        names.append(
+            f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}'
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Снимает стек потока обработчика раз в interval секунд."""
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Trace:
+    """
+    SQL запросы и стеки одного HTTP запроса.
+    reason: header, sample или None, если запрос сохраняется
+    только при превышении SLOW_THRESHOLD.
+    """
+    def __init__(self, reason):
+        self.reason = reason
+        self.queries = []
+        self.sampler = None
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def start(self):
+        # Соединения, открытые до загрузки модуля.
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(None, connection)
+        if self.reason is not None:
+            self.sampler = StackSampler(
+                threading.get_ident(), settings.PROFILING['INTERVAL']
+            )
+            self.sampler.start()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.started
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def add_query(self, sql, params, many, duration):
+        # list.append безопасен для потоков асинхронных представлений.
+        self.queries.append({
+            'sql': sql,
+            'params': repr(params),
+            'many': many,
+            'duration': duration,
+            'origin': origin(sys._getframe()),
+        })
+
+    def repeated(self):
+        """
+        Запросы одного вида (queries.fingerprint, как в QueryDetector) —
+        признак N+1 — и точные повторы с одинаковыми SQL и параметрами.
+        """
+        shapes = defaultdict(list)
+        for query in self.queries:
+            shapes[fingerprint(query['sql'])].append(query)
+        repeated = []
+        for shape, queries in shapes.items():
+            if len(queries) < 2:
+                continue
+            params = Counter(
+                (query['sql'], query['params']) for query in queries
+            )
+            repeated.append({
+                'fingerprint': shape,
+                'count': len(queries),
+                'duration': sum(query['duration'] for query in queries),
+                'duplicates': sum(
+                    count for count in params.values() if count > 1
+                ),
+                'origins': Counter(
+                    query['origin'] for query in queries
+                ).most_common(3),
+            })
+        return sorted(repeated, key=lambda item: -item['count'])
+
+    def report(self, request, response):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': match.view_name if match else None,
+            'status': response.status_code,
+            'reason': self.reason or 'slow',
+            'duration': self.duration,
+            'query_count': len(self.queries),
+            'query_duration': sum(
+                query['duration'] for query in self.queries
+            ),
+            'repeated': self.repeated(),
+            'queries': self.queries,
+        }
+
+
+def trace_query(execute, sql, params, many, context):
+    """Обертка execute_wrapper: записывает запрос в трассировку."""
+    trace = _trace.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.add_query(sql, params, many, time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    if trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_query)
+
+
+def rotate(directory, keep):
+    """Оставляет keep последних профилей."""
+    profiles = defaultdict(list)
+    for name in os.listdir(directory):
+        stem, extension = os.path.splitext(name)
+        if extension in ('.json', '.folded'):
+            profiles[stem].append(os.path.join(directory, name))
+    for stem in sorted(profiles)[:-keep or None]:
+        for path in profiles[stem]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def dump(report, stacks):
+    """
+    Сохраняет профиль: <имя>.json с трассировкой SQL и <имя>.folded
+    со стеками. Имена начинаются со времени, поэтому сортируются
+    по порядку сохранения.
+    """
+    options = settings.PROFILING
+    directory = options['DIRECTORY']
+    os.makedirs(directory, exist_ok=True)
+    route = (report['route'] or 'unmatched').replace(':', '_')
+    name = (
+        f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}-'
+        f'{route}-{int(report["duration"] * 1000)}ms'
+    )
+    with open(os.path.join(directory, f'{name}.json'), 'w') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    if stacks:
+        with open(os.path.join(directory, f'{name}.folded'), 'w') as file:
+            for stack, count in stacks.most_common():
+                file.write(f'{stack} {count}\n')
+    rotate(directory, options['MAX_FILES'])
+    return name
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запросы по заголовку или выборке и сохраняет медленные.
+    На запрос с заголовком имя профиля возвращается в X-Profile-Id.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def reason(request):
+        options = settings.PROFILING
+        token = request.headers.get(options['HEADER'])
+        if token is not None and check_token(token):
+            return 'header'
+        rate = options['SAMPLE_RATE']
+        if rate and random.randrange(rate) == 0:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = self.reason(request)
+        if reason is None and not settings.PROFILING['SLOW_THRESHOLD']:
+            return self.get_response(request)
+        trace = Trace(reason)
+        token = _trace.set(trace)
+        trace.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            trace.stop()
+            _trace.reset(token)
+        return self.finish(request, response, trace)
+
+    async def __acall__(self, request):
+        reason = self.reason(request)
+        if reason is None and not settings.PROFILING['SLOW_THRESHOLD']:
+            return await self.get_response(request)
+        # Стек снимается с потока цикла событий, в нем могут оказаться
+        # кадры других запросов.
+        trace = Trace(reason)
+        token = _trace.set(trace)
+        trace.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            trace.stop()
+            _trace.reset(token)
+        return self.finish(request, response, trace)
+
+    @staticmethod
+    def finish(request, response, trace):
+        threshold = settings.PROFILING['SLOW_THRESHOLD']
+        if trace.reason is None and trace.duration < threshold:
+            return response
+        name = dump(
+            trace.report(request, response),
+            trace.sampler.stacks if trace.sampler else None
+        )
+        if trace.reason == 'header':
+            response['X-Profile-Id'] = name
+        return response
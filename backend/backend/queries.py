@@ -0,0 +1,228 @@
+"""
+Поиск повторяющихся запросов к базе данных (N+1).
+Запросы группируются по виду: SQL без значений параметров и литералов,
+списки IN (...) любой длины считаются одинаковыми. Если запрос одного
+вида выполнен больше threshold раз, в отчет попадают поля
+сериализаторов или кадры кода проекта, из которых он выполнялся.
+
+    with QueryDetector(threshold=2, budget=7, strict=True):
+        client.get('/api/recipes/')
+
+    @QueryDetector(budget=3, strict=True)
+    def test_tags(self):
+        ...
+
+В режиме разработки QueryDetectorMiddleware проверяет каждый запрос
+(QUERY_DETECTOR в настройках).
+"""
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.fields import Field
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+# Источников каждого вида запроса в отчете.
+ORIGINS_LIMIT = 3
+# Файлы, которые не считаются источником запроса к базе данных.
+SKIPPED_FILES = tuple(
+    os.path.join('backend', name)
+    for name in ('metrics.py', 'profiling.py', 'queries.py')
+)
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE),
+     'IN (...)'),
+    (re.compile(r'(\(\?(?:, \?)*\))(?:, \1)+'), r'\1, ...'),
+    (re.compile(r'\s+'), ' '),
+)
+
+_detectors = ContextVar('query_detectors', default=())
+
+
+class RepeatedQueries(AssertionError):
+    """Превышено количество повторов или бюджет запросов."""
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Вид запроса: SQL без значений."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def origin(frame):
+    """Ближайший к frame кадр кода проекта."""
+    base = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base)
+            and 'site-packages' not in filename
+            and not filename.endswith(SKIPPED_FILES)
+        ):
+            return (
+                f'{os.path.relpath(filename, base)}:{frame.f_lineno} '
+                f'{frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return None
+
+
+def serializer_field(frame):
+    """Поле сериализатора, при выводе которого выполняется запрос."""
+    while frame is not None:
+        if frame.f_code is Serializer.to_representation.__code__:
+            field = frame.f_locals.get('field')
+            if isinstance(field, Field):
+                serializer = frame.f_locals['self']
+                return f'{type(serializer).__name__}.{field.field_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryDetector(ContextDecorator):
+    """
+    Считает запросы к базе данных по видам внутри блока with
+    или вызова декорированной функции.
+    threshold: сколько раз запрос одного вида может повторяться;
+    budget: сколько запросов можно выполнить всего;
+    strict: при нарушении выбрасывать RepeatedQueries.
+    """
+    def __init__(self, threshold=None, budget=None, strict=False):
+        self.threshold = (
+            settings.QUERY_DETECTOR['THRESHOLD']
+            if threshold is None else threshold
+        )
+        self.budget = budget
+        self.strict = strict
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.counts = Counter()
+        self.origins = defaultdict(Counter)
+
+    def __enter__(self):
+        self.reset()
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(None, connection)
+        self.token = _detectors.set((*_detectors.get(), self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _detectors.reset(self.token)
+        if exc_type is None and self.strict and not self.ok:
+            raise RepeatedQueries(self.report())
+        return False
+
+    def record(self, sql, frame):
+        shape = fingerprint(sql)
+        with self.lock:
+            self.total += 1
+            self.counts[shape] += 1
+            count = self.counts[shape]
+        # Источник ищется только для запросов, которые уже повторяются.
+        if count > self.threshold:
+            source = serializer_field(frame) or origin(frame)
+            with self.lock:
+                self.origins[shape][source] += 1
+
+    @property
+    def repeated(self):
+        """[(вид запроса, количество), ...] сверх threshold."""
+        return [
+            (shape, count) for shape, count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    @property
+    def ok(self):
+        return not self.repeated and (
+            self.budget is None or self.total <= self.budget
+        )
+
+    def report(self):
+        lines = [f'Запросов к базе данных: {self.total}.']
+        if self.budget is not None and self.total > self.budget:
+            lines[0] += f' Бюджет: {self.budget}.'
+        for shape, count in self.repeated:
+            lines.append(f'{count} раз: {shape}')
+            for source, times in self.origins[shape].most_common(
+                ORIGINS_LIMIT
+            ):
+                lines.append(f'    {source or "?"} ({times})')
+        return '\n'.join(lines)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка execute_wrapper: передает запрос активным проверкам."""
+    for detector in _detectors.get():
+        detector.record(sql, sys._getframe())
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryDetectorMiddleware:
+    """
+    Проверяет каждый запрос в режиме разработки: повторяющиеся запросы
+    записываются в журнал, в режиме STRICT запрос завершается ошибкой.
+    Количество запросов к базе данных возвращается в X-Query-Count.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_DETECTOR['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        detector = QueryDetector(strict=settings.QUERY_DETECTOR['STRICT'])
+        with detector:
+            response = self.get_response(request)
+        return self.finish(request, response, detector)
+
+    async def __acall__(self, request):
+        detector = QueryDetector(strict=settings.QUERY_DETECTOR['STRICT'])
+        with detector:
+            response = await self.get_response(request)
+        return self.finish(request, response, detector)
+
+    @staticmethod
+    def finish(request, response, detector):
+        if detector.repeated:
+            logger.warning(
+                'Повторяющиеся запросы %s %s\n%s',
+                request.method, request.path, detector.report()
+            )
+        response['X-Query-Count'] = str(detector.total)
+        return response
@@ -0,0 +1,137 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+# Чтение из реплик разрешено только внутри безопасных HTTP запросов.
+# Фоновые задачи, команды и запросы на изменение читают из основной базы.
+_use_replicas = ContextVar('use_replicas', default=False)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def replica_lag(connection):
+    """
+    Отставание реплики PostgreSQL в секундах. Реплика, применившая
+    все полученные изменения, не отстает, даже если последняя
+    транзакция на основной базе была давно.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT CASE WHEN NOT pg_is_in_recovery() '
+            'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+            'THEN 0 ELSE COALESCE('
+            'EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0'
+            ') END'
+        )
+        return cursor.fetchone()[0]
+
+
+def is_healthy(alias):
+    """
+    Проверяет доступность и отставание реплики.
+    Результат проверки хранится HEALTH_CHECK_INTERVAL секунд.
+    """
+    options = settings.REPLICA_ROUTING
+    now = time.monotonic()
+    with _health_lock:
+        checked, healthy = _health.get(alias, (None, True))
+        if (
+            checked is not None
+            and now - checked < options['HEALTH_CHECK_INTERVAL']
+        ):
+            return healthy
+        _health[alias] = (now, healthy)
+    try:
+        healthy = replica_lag(connections[alias]) <= options['MAX_LAG']
+    except DatabaseError:
+        healthy = False
+        connections[alias].close()
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    replicas = [
+        (alias, weight)
+        for alias, weight in settings.DATABASE_REPLICAS.items()
+        if weight > 0 and is_healthy(alias)
+    ]
+    if not replicas:
+        return DEFAULT_DB_ALIAS
+    aliases, weights = zip(*replicas)
+    return random.choices(aliases, weights)[0]
+
+
+class ReplicaRouter:
+    """
+    Направляет чтение в реплики, а запись и транзакции в основную базу.
+    """
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS
+            or not _use_replicas.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """
+    Включает чтение из реплик для безопасных запросов.
+    После запроса на изменение пользователь PIN_SECONDS секунд читает
+    из основной базы. Срок хранится в cookie и дублируется заголовком
+    ответа для клиентов без cookie, которые передают его обратно.
+    """
+    def process_request(self, request):
+        options = settings.REPLICA_ROUTING
+        pinned_until = (
+            request.headers.get(options['PIN_HEADER'])
+            or request.COOKIES.get(options['PIN_COOKIE'])
+        )
+        try:
+            pinned = float(pinned_until or 0) > time.time()
+        except ValueError:
+            pinned = False
+        _use_replicas.set(
+            request.method in ('GET', 'HEAD', 'OPTIONS') and not pinned
+        )
+
+    def process_response(self, request, response):
+        _use_replicas.set(False)
+        if (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400
+        ):
+            options = settings.REPLICA_ROUTING
+            pinned_until = str(int(time.time() + options['PIN_SECONDS']) + 1)
+            response.set_cookie(
+                options['PIN_COOKIE'], pinned_until,
+                max_age=options['PIN_SECONDS'], httponly=True,
+                samesite='Lax'
+            )
+            response[options['PIN_HEADER']] = pinned_until
+        return response
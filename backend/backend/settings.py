@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -19,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework.authtoken',
     'django_extensions',
     'rest_framework',
@@ -28,11 +30,18 @@ INSTALLED_APPS = [
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
     'followers.apps.FollowersConfig',
+    'jobs.apps.JobsConfig',
+    'changelog.apps.ChangelogConfig',
     'colorfield',
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
+    'backend.shedding.LoadSheddingMiddleware',
+    'backend.profiling.ProfilingMiddleware',
+    'backend.queries.QueryDetectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'backend.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,18 +70,82 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Асинхронные представления для чтения рецептов, тегов и ингредиентов.
+# Включаются при запуске через ASGI (backend.asgi).
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+# Количество потоков для одновременных запросов к базе данных
+# из асинхронных представлений.
+ASYNC_DB_CONCURRENCY = int(os.getenv('ASYNC_DB_CONCURRENCY', 4))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Размер пула соединений внутри процесса. При 0 пул не используется,
+# а соединения остаются открытыми DB_CONN_MAX_AGE секунд.
+# Для ASGI рекомендуется DB_CONN_MAX_AGE=0 или пул соединений.
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'backend.db_pool' if DB_POOL_MAX_SIZE
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL_MAX_SIZE else int(os.getenv('DB_CONN_MAX_AGE', 60))
+        ),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            'TIMEOUT': 5,
+        },
+    }
+}
+
+# Реплики для чтения: DB_REPLICAS=host[:port][/name][*weight],...
+DATABASE_REPLICAS = {}
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    address, _, weight = replica.strip().partition('*')
+    address, _, name = address.partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS[alias] = int(weight or 1)
+
+DATABASE_ROUTERS = ['backend.replicas.ReplicaRouter']
+
+REPLICA_ROUTING = {
+    # Сколько секунд после изменения данных пользователь читает
+    # из основной базы данных, чтобы видеть свои изменения.
+    'PIN_SECONDS': int(os.getenv('DB_REPLICA_PIN_SECONDS', 5)),
+    'PIN_COOKIE': 'primary_pin',
+    'PIN_HEADER': 'X-Primary-Pin',
+    'HEALTH_CHECK_INTERVAL': 10,
+    # Реплика с большим отставанием (секунд) не используется.
+    'MAX_LAG': 30,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -117,6 +190,161 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Уменьшенные копии изображений рецептов: имя -> (ширина, высота, обрезка).
+RECIPE_IMAGE_SIZES = {
+    'thumbnail': (480, 320, True),
+    'medium': (1280, 1280, False),
+}
+# AVIF создается, только если установлен плагин pillow-avif-plugin.
+RECIPE_IMAGE_FORMATS = ('webp', 'avif', 'jpeg')
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_VARIANTS_DIR = 'recipes/images/variants/'
+# Вариант, который отдается вместо оригинала в списках рецептов.
+RECIPE_IMAGE_LIST_VARIANT = ('thumbnail', 'webp')
+# Ограничения на загрузку изображений (base64 и загрузка частями).
+RECIPE_IMAGE_MAX_SIZE = 15 * 1024 * 1024
+IMAGE_UPLOAD_CHUNK_SIZE = 64 * 1024
+# Пересборка документов рецептов (Recipe.document): до SYNC_LIMIT
+# рецептов пересобирается сразу после транзакции, остальные в фоне
+# пачками по BATCH_SIZE.
+RECIPE_DOCUMENTS = {
+    'SYNC_LIMIT': 100,
+    'BATCH_SIZE': 500,
+}
+# Наибольшее количество рецептов в запросе ?ids=1,2,3.
+RECIPE_BATCH_MAX_SIZE = 100
+# Предварительно сформированные ответы для анонимных клиентов
+# (api/prerender.py), которые nginx отдает из ROOT без обращения
+# к backend. BASE_URL — адрес сайта, как его видит backend: из него
+# формируются ссылки в ответах. FEED_PAGES — количество первых страниц
+# списка рецептов, HTML — страницы рецептов для поисковых роботов.
+PRERENDER = {
+    'ENABLED': os.getenv('PRERENDER', 'False') == 'True',
+    'ROOT': os.getenv('PRERENDER_ROOT', BASE_DIR / 'prerendered'),
+    'BASE_URL': os.getenv(
+        'PRERENDER_BASE_URL', 'http://foodgram.otomari.ru'
+    ),
+    'FEED_PAGES': 3,
+    'HTML': os.getenv('PRERENDER_HTML', 'True') == 'True',
+    'PROCESSES': int(os.getenv('PRERENDER_PROCESSES', os.cpu_count())),
+}
+# Популярные рецепты и запросы списка рецептов (backend/hot_keys.py):
+# каждый процесс хранит счетчики CAPACITY ключей каждого вида, уменьшает
+# их вдвое каждые HALF_LIFE секунд и сохраняет в DIRECTORY раз
+# в FLUSH_INTERVAL секунд. Файлы старше WINDOW секунд удаляются.
+HOT_KEYS = {
+    'ENABLED': os.getenv('HOT_KEYS', 'True') == 'True',
+    'DIRECTORY': os.getenv(
+        'HOT_KEYS_DIR',
+        os.path.join(tempfile.gettempdir(), 'foodgram_hot_keys')
+    ),
+    'CAPACITY': 1000,
+    'HALF_LIFE': 60 * 60,
+    'FLUSH_INTERVAL': 10,
+    'WINDOW': 60 * 60 * 24,
+}
+# Кэш строк рецептов и ответов анонимным клиентам на запросы списка
+# рецептов (api/recipe_cache.py). Изменения сбрасывают кэш только
+# в общем для процессов хранилище, поэтому с LocMemCache кэш по умолчанию
+# выключен. WARM_RECIPES и WARM_LISTS — сколько популярных рецептов
+# и запросов заполняет manage.py warm_cache.
+RECIPE_CACHE = {
+    'ENABLED': os.getenv('RECIPE_CACHE', str(
+        not CACHES['default']['BACKEND'].endswith('LocMemCache')
+    )) == 'True',
+    'TIMEOUT': 60 * 10,
+    'WARM_RECIPES': 500,
+    'WARM_LISTS': 100,
+}
+# Фасеты списка рецептов (?facets=): границы интервалов времени
+# приготовления в минутах и количество авторов в ответе.
+RECIPE_FACETS = {
+    'COOKING_TIME_BUCKETS': (15, 30, 60, 120),
+    'TOP_AUTHORS': 10,
+}
+# Синхронизация клиентов по журналу изменений (/api/sync/):
+# записей журнала на странице и задержка в секундах, после которой
+# новые записи попадают в ответ (номера записей параллельных транзакций
+# могут становиться видимыми не по порядку).
+CHANGELOG = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 2000,
+    'SETTLE_SECONDS': 2,
+}
+# Поток событий о рецептах авторов из подписок (/api/events/, ASGI):
+# размер очереди подключения, интервал heartbeat, пауза перед
+# повторным подключением LISTEN и срок действия токена подключения
+# (/api/events/token/), в секундах.
+RECIPE_EVENTS = {
+    'CHANNEL': 'recipe_events',
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT_INTERVAL': 15,
+    'RECONNECT_DELAY': 5,
+    'TOKEN_MAX_AGE': 60,
+}
+# Выгрузка в формате NDJSON (/api/export/, manage.py export_ndjson):
+# количество строк, читаемых из курсора и записываемых за раз.
+EXPORTS = {
+    'CHUNK_SIZE': int(os.getenv('EXPORT_CHUNK_SIZE', 2000)),
+}
+# Метрики производительности (/metrics): каталог, в котором процессы
+# gunicorn сохраняют значения не реже раза в FLUSH_INTERVAL секунд,
+# и токен (Authorization: Bearer), без которого метрики недоступны.
+METRICS = {
+    'ENABLED': os.getenv('METRICS_ENABLED', 'True') == 'True',
+    'DIRECTORY': os.getenv(
+        'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram_metrics')
+    ),
+    'FLUSH_INTERVAL': 1,
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
+# Профилирование запросов: заголовок с токеном (manage.py profiling_token),
+# выборка 1 из SAMPLE_RATE запросов (0 — выключена), порог в секундах,
+# после которого трассировка запроса сохраняется (0 — выключен),
+# интервал снятия стека и количество хранимых профилей.
+PROFILING = {
+    'HEADER': 'X-Profile',
+    'TOKEN_MAX_AGE': 3600,
+    'SAMPLE_RATE': int(os.getenv('PROFILING_SAMPLE_RATE', 0)),
+    'SLOW_THRESHOLD': float(os.getenv('PROFILING_SLOW_THRESHOLD', 0)),
+    'INTERVAL': 0.005,
+    'DIRECTORY': os.getenv(
+        'PROFILING_DIR',
+        os.path.join(tempfile.gettempdir(), 'foodgram_profiles')
+    ),
+    'MAX_FILES': 200,
+}
+# Сброс нагрузки: нагрузка процесса 1 означает MAX_IN_FLIGHT запросов
+# в обработке, среднюю длительность чтения TARGET_LATENCY секунд или
+# ожидание в очереди прокси MAX_QUEUE_DELAY секунд. При нагрузке не меньше
+# порога приоритета запрос получает 503 с Retry-After. По умолчанию
+# MAX_IN_FLIGHT равен числу потоков процесса gthread (gunicorn.conf.py):
+# больше запросов процесс одновременно не обрабатывает.
+LOAD_SHEDDING = {
+    'ENABLED': os.getenv('LOAD_SHEDDING', 'True') == 'True',
+    'MAX_IN_FLIGHT': int(os.getenv(
+        'LOAD_SHEDDING_MAX_IN_FLIGHT',
+        os.getenv('GUNICORN_THREADS', 4)
+        if os.getenv('GUNICORN_WORKER_CLASS', 'gthread') == 'gthread'
+        else 16
+    )),
+    'TARGET_LATENCY': float(os.getenv('LOAD_SHEDDING_TARGET_LATENCY', 1)),
+    'MAX_QUEUE_DELAY': float(os.getenv('LOAD_SHEDDING_MAX_QUEUE_DELAY', 1)),
+    'DECAY': 10,
+    'THRESHOLDS': {'low': 0.75, 'normal': 1, 'high': 1.5},
+    'EXPENSIVE': (r'/download_shopping_cart/$', r'^/api/export/'),
+    'EXEMPT': (r'^/metrics$',),
+    'RETRY_AFTER': 5,
+}
+# Поиск повторяющихся запросов (N+1) в режиме разработки: запросы одного
+# вида, выполненные за HTTP запрос больше THRESHOLD раз, записываются
+# в журнал, в режиме STRICT запрос завершается ошибкой.
+QUERY_DETECTOR = {
+    'ENABLED': os.getenv('QUERY_DETECTOR', str(DEBUG)) == 'True',
+    'THRESHOLD': 5,
+    'STRICT': os.getenv('QUERY_DETECTOR_STRICT', 'False') == 'True',
+}
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 # Default primary key field type
@@ -132,6 +360,23 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttles.TokenBucketThrottle',
+    ],
+    # Частоты для throttle_scope представлений.
+    'DEFAULT_THROTTLE_RATES': {
+        'shopping_cart': os.getenv('THROTTLE_SHOPPING_CART', '10/min'),
+        'uploads': os.getenv('THROTTLE_UPLOADS', '120/min'),
+    },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 4,
     'DEFAULT_FILTER_BACKENDS': [
@@ -152,3 +397,20 @@ DJOSER = {
         'user_create': 'api.serializers.CustomCreateUserSerializer',
     },
 }
+
+FOLLOW_SUGGESTIONS = {
+    'LIMIT': 50,
+    'FANOUT_LIMIT': 200,
+    'CACHE_TIMEOUT': 60 * 15,
+    'GRAPH_CACHE_TIMEOUT': 60 * 60 * 24,
+}
+
+JOBS = {
+    # Выполнять задачи сразу при постановке в очередь (без обработчика).
+    'EAGER': os.getenv('JOBS_EAGER', 'False') == 'True',
+    'CONCURRENCY': int(os.getenv('JOBS_CONCURRENCY', 4)),
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 10,
+    'VISIBILITY_TIMEOUT': 300,
+    'POLL_INTERVAL': 1,
+}
@@ -0,0 +1,183 @@
+"""
+Сброс нагрузки: пока процесс перегружен, запросы с низким приоритетом
+сразу получают 503 с заголовком Retry-After, а не занимают потоки
+и соединения с базой данных до исчерпания процессов gunicorn.
+
+Нагрузка процесса — наибольшее из отношений:
+* запросов в обработке вместе с проверяемым (занятых потоков процесса
+  gthread) к MAX_IN_FLIGHT;
+* средней длительности последних запросов на чтение к TARGET_LATENCY
+  (запись медленна сама по себе из-за хеширования паролей и загрузки
+  изображений; без новых запросов среднее забывается за DECAY секунд);
+* ожидания в очереди до обработки к MAX_QUEUE_DELAY, если прокси
+  передает время получения запроса в X-Request-Start (t=<секунды>).
+
+Запрос отклоняется, если нагрузка не меньше порога его приоритета
+(THRESHOLDS): сначала анонимное чтение и дорогие адреса (EXPENSIVE),
+затем чтение с токеном, изменения с токеном — последними.
+"""
+import math
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from backend.metrics import registry
+
+LOW = 'low'
+NORMAL = 'normal'
+HIGH = 'high'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Заголовок Authorization в формате TokenAuthentication: ключ токена
+# rest_framework.authtoken из 40 символов.
+TOKEN_HEADER = re.compile(r'Token \S{40}')
+# Доля нового запроса в средней длительности.
+SMOOTHING = 0.2
+
+
+class LoadMonitor:
+    """Запросы в обработке и средняя длительность в процессе."""
+    def __init__(self, decay):
+        self.decay = decay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.latency = 0.0
+        self.updated = time.monotonic()
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def leave(self, duration=None):
+        with self.lock:
+            self.in_flight -= 1
+            if duration is None:
+                return
+            self.latency = (
+                self.current_latency() * (1 - SMOOTHING)
+                + duration * SMOOTHING
+            )
+            self.updated = time.monotonic()
+
+    def current_latency(self):
+        return self.latency * math.exp(
+            (self.updated - time.monotonic()) / self.decay
+        )
+
+
+def queue_delay(request):
+    """Секунды от получения запроса прокси до начала обработки."""
+    value = request.headers.get('X-Request-Start', '').removeprefix('t=')
+    try:
+        started = float(value)
+    except ValueError:
+        return 0
+    return max(0, time.time() - started)
+
+
+class LoadSheddingMiddleware:
+    """
+    Отклоняет запросы с низким приоритетом при перегрузке процесса
+    (LOAD_SHEDDING в настройках). Подключается после MetricsMiddleware,
+    чтобы отклоненные запросы попадали в метрики.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = settings.LOAD_SHEDDING
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.monitor = LoadMonitor(options['DECAY'])
+        self.expensive = [re.compile(path) for path in options['EXPENSIVE']]
+        self.exempt = [re.compile(path) for path in options['EXEMPT']]
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_expensive(self, request):
+        return any(
+            pattern.search(request.path_info) for pattern in self.expensive
+        )
+
+    def priority(self, request):
+        """
+        Приоритет по адресу, методу и наличию токена: подлинность
+        токена проверяется позже, при обработке запроса, поэтому здесь
+        проверяется только формат заголовка. Запрос с заголовком
+        другого вида считается анонимным.
+        """
+        if any(pattern.search(request.path_info) for pattern in self.exempt):
+            return None
+        if self.is_expensive(request):
+            return LOW
+        authorized = TOKEN_HEADER.fullmatch(
+            request.headers.get('Authorization', '')
+        ) is not None
+        if request.method in SAFE_METHODS:
+            return NORMAL if authorized else LOW
+        return HIGH if authorized else NORMAL
+
+    def is_timed(self, request):
+        """Учитывается ли длительность запроса в средней."""
+        return request.method in SAFE_METHODS and not self.is_expensive(
+            request
+        )
+
+    def pressure(self, request):
+        options = settings.LOAD_SHEDDING
+        return max(
+            (self.monitor.in_flight + 1) / options['MAX_IN_FLIGHT'],
+            self.monitor.current_latency() / options['TARGET_LATENCY'],
+            queue_delay(request) / options['MAX_QUEUE_DELAY'],
+        )
+
+    def reject(self, request):
+        priority = self.priority(request)
+        if priority is None:
+            return None
+        options = settings.LOAD_SHEDDING
+        if self.pressure(request) < options['THRESHOLDS'][priority]:
+            return None
+        if settings.METRICS['ENABLED']:
+            registry.inc('requests_shed_total', {'priority': priority})
+        response = JsonResponse(
+            {'detail': 'Сервер перегружен, повторите запрос позже.'},
+            status=503, json_dumps_params={'ensure_ascii': False}
+        )
+        response['Retry-After'] = str(options['RETRY_AFTER'])
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.reject(request)
+        if response is not None:
+            return response
+        self.monitor.enter()
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.monitor.leave(
+                time.perf_counter() - start if self.is_timed(request)
+                else None
+            )
+
+    async def __acall__(self, request):
+        response = self.reject(request)
+        if response is not None:
+            return response
+        self.monitor.enter()
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.monitor.leave(
+                time.perf_counter() - start if self.is_timed(request)
+                else None
+            )
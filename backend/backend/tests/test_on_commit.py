@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from backend.on_commit import CommitBatch
+
+
+class CommitBatchTests(TransactionTestCase):
+    def setUp(self):
+        self.flushed = []
+        self.batch = CommitBatch(lambda pending: self.flushed.append(pending))
+
+    def test_autocommit_flushes_immediately(self):
+        self.batch.add({1})
+        self.batch.add({2})
+        self.assertEqual(self.flushed, [{1}, {2}])
+
+    def test_transaction_is_flushed_once_after_commit(self):
+        with transaction.atomic():
+            self.batch.add({1, 2})
+            self.batch.add({2, 3})
+            self.assertEqual(self.flushed, [])
+        self.assertEqual(self.flushed, [{1, 2, 3}])
+
+    def test_rollback_discards_batch(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            self.batch.add({1})
+            1 / 0
+        self.assertEqual(self.flushed, [])
+        self.batch.add({2})
+        self.assertEqual(self.flushed, [{2}])
+
+    def test_released_savepoint_is_flushed(self):
+        with transaction.atomic():
+            self.batch.add({1})
+            with transaction.atomic():
+                self.batch.add({2})
+            self.batch.add({3})
+        self.assertEqual(
+            set().union(*self.flushed), {1, 2, 3}
+        )
+
+    def test_rolled_back_savepoint_is_discarded(self):
+        with transaction.atomic():
+            self.batch.add({1})
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                self.batch.add({2})
+                1 / 0
+            self.batch.add({3})
+        self.assertEqual(self.flushed, [{1, 3}])
+
+    def test_batch_started_in_rolled_back_savepoint(self):
+        with transaction.atomic():
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                self.batch.add({1})
+                1 / 0
+            self.batch.add({2})
+        self.assertEqual(self.flushed, [{2}])
+
+    def test_custom_merge(self):
+        def merge(pending, items):
+            for key, value in items.items():
+                pending.pop(key, None)
+                pending[key] = value
+
+        batch = CommitBatch(self.flushed.append, factory=dict, merge=merge)
+        with transaction.atomic():
+            batch.add({1: 'a', 2: 'a'})
+            batch.add({1: 'b'})
+        self.assertEqual(list(self.flushed[0].items()), [(2, 'a'), (1, 'b')])
+
+
+class CapturedCommitBatchTests(TestCase):
+    def test_flushed_batch_is_not_reused(self):
+        flushed = []
+        batch = CommitBatch(flushed.append)
+        # captureOnCommitCallbacks оставляет выполненные обработчики
+        # в run_on_commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.add({1})
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.add({2})
+        self.assertEqual(flushed, [{1}, {2}])
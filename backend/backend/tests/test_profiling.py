@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from backend.profiling import Trace
+
+
+class RepeatedQueriesTests(SimpleTestCase):
+    def test_groups_by_fingerprint(self):
+        trace = Trace(None)
+        for sql, params in (
+            ('SELECT * FROM recipe WHERE id IN (%s, %s)', (1, 2)),
+            ('SELECT * FROM recipe WHERE id IN (%s, %s, %s)', (1, 2, 3)),
+            ('SELECT * FROM recipe WHERE id IN (%s, %s)', (1, 2)),
+            ('SELECT * FROM tag', ()),
+        ):
+            trace.add_query(sql, params, False, 0.001)
+        repeated, = trace.repeated()
+        self.assertEqual(
+            repeated['fingerprint'], 'SELECT * FROM recipe WHERE id IN (...)'
+        )
+        self.assertEqual(repeated['count'], 3)
+        self.assertEqual(repeated['duplicates'], 2)
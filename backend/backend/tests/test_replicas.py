@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+
+from backend import replicas
+
+REPLICAS = {'replica_1': 1}
+
+
+class ReplicaLagTests(TestCase):
+    def test_primary_has_no_lag(self):
+        self.assertEqual(replicas.replica_lag(connection), 0)
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        replicas._health.clear()
+        self.addCleanup(replicas._health.clear)
+        token = replicas._use_replicas.set(True)
+        self.addCleanup(replicas._use_replicas.reset, token)
+        self.connections = {
+            DEFAULT_DB_ALIAS: mock.Mock(in_atomic_block=False),
+            'replica_1': mock.Mock(),
+        }
+        patcher = mock.patch.object(
+            replicas, 'connections', self.connections
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = replicas.ReplicaRouter()
+
+    def lag(self, value):
+        return mock.patch.object(
+            replicas, 'replica_lag',
+            side_effect=value if isinstance(value, Exception) else None,
+            return_value=value,
+        )
+
+    def test_read_from_healthy_replica(self):
+        with self.lag(0):
+            self.assertEqual(self.router.db_for_read(None), 'replica_1')
+
+    def test_lagging_replica_is_skipped(self):
+        with self.lag(31):
+            self.assertEqual(
+                self.router.db_for_read(None), DEFAULT_DB_ALIAS
+            )
+
+    def test_unavailable_replica_is_skipped(self):
+        with self.lag(DatabaseError()):
+            self.assertEqual(
+                self.router.db_for_read(None), DEFAULT_DB_ALIAS
+            )
+        self.connections['replica_1'].close.assert_called_once()
+
+    def test_read_in_transaction_uses_primary(self):
+        self.connections[DEFAULT_DB_ALIAS].in_atomic_block = True
+        with self.lag(0):
+            self.assertEqual(
+                self.router.db_for_read(None), DEFAULT_DB_ALIAS
+            )
+
+    def test_health_is_cached(self):
+        with self.lag(0) as replica_lag:
+            self.router.db_for_read(None)
+            self.router.db_for_read(None)
+        self.assertEqual(replica_lag.call_count, 1)
+
+    def test_read_outside_request_uses_primary(self):
+        replicas._use_replicas.set(False)
+        with self.lag(0):
+            self.assertEqual(
+                self.router.db_for_read(None), DEFAULT_DB_ALIAS
+            )
+
+    def test_writes_and_migrations_use_primary(self):
+        self.assertEqual(self.router.db_for_write(None), DEFAULT_DB_ALIAS)
+        self.assertIs(self.router.allow_migrate('replica_1', 'recipes'),
+                      False)
+
+
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = replicas.ReplicaMiddleware(
+            lambda request: HttpResponse()
+        )
+        self.addCleanup(replicas._use_replicas.set, False)
+
+    def test_safe_request_reads_from_replicas(self):
+        self.middleware.process_request(self.factory.get('/'))
+        self.assertIs(replicas._use_replicas.get(), True)
+
+    def test_write_pins_primary(self):
+        request = self.factory.post('/')
+        self.middleware.process_request(request)
+        self.assertIs(replicas._use_replicas.get(), False)
+        response = self.middleware.process_response(request, HttpResponse())
+        pin = response['X-Primary-Pin']
+        self.assertEqual(response.cookies['primary_pin'].value, pin)
+        self.middleware.process_request(
+            self.factory.get('/', HTTP_X_PRIMARY_PIN=pin)
+        )
+        self.assertIs(replicas._use_replicas.get(), False)
@@ -0,0 +1,101 @@
+import runpy
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from backend.shedding import HIGH, LOW, NORMAL, LoadSheddingMiddleware
+
+KEY = 'a' * 40
+
+
+class PriorityTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = LoadSheddingMiddleware(
+            lambda request: HttpResponse()
+        )
+
+    def priority(self, method, authorization=None, path='/api/recipes/'):
+        headers = {} if authorization is None else {
+            'HTTP_AUTHORIZATION': authorization
+        }
+        return self.middleware.priority(
+            self.factory.generic(method, path, **headers)
+        )
+
+    def test_token_raises_priority(self):
+        self.assertEqual(self.priority('GET', f'Token {KEY}'), NORMAL)
+        self.assertEqual(self.priority('POST', f'Token {KEY}'), HIGH)
+
+    def test_malformed_authorization_is_anonymous(self):
+        for authorization in (
+            None, '', 'Token', f'Bearer {KEY}', f'Token {KEY}x',
+            f'Token {KEY[:-1]}', f'Token {KEY[:20]} {KEY[:19]}',
+        ):
+            with self.subTest(authorization=authorization):
+                self.assertEqual(self.priority('GET', authorization), LOW)
+                self.assertEqual(self.priority('POST', authorization), NORMAL)
+
+    def test_expensive_and_exempt_paths(self):
+        self.assertEqual(
+            self.priority(
+                'GET', f'Token {KEY}', '/api/recipes/download_shopping_cart/'
+            ),
+            LOW
+        )
+        self.assertIsNone(self.priority('GET', path='/metrics'))
+
+
+@override_settings(METRICS={**settings.METRICS, 'ENABLED': False})
+class InFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.release = threading.Event()
+        self.middleware = LoadSheddingMiddleware(self.view)
+
+    def view(self, request):
+        if request.path_info == '/busy/':
+            self.release.wait(5)
+        return HttpResponse()
+
+    def occupy(self, count):
+        """
+        Занимает count потоков процесса запросами с токеном на запись:
+        они отклоняются последними.
+        """
+        expected = self.middleware.monitor.in_flight + count
+        for _ in range(count):
+            thread = threading.Thread(
+                target=self.middleware, args=(self.factory.post(
+                    '/busy/', HTTP_AUTHORIZATION=f'Token {KEY}'
+                ),)
+            )
+            thread.start()
+            self.addCleanup(thread.join)
+        self.addCleanup(self.release.set)
+        deadline = time.monotonic() + 5
+        while self.middleware.monitor.in_flight < expected:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def status(self, method, authorization=None):
+        headers = {} if authorization is None else {
+            'HTTP_AUTHORIZATION': authorization
+        }
+        return self.middleware(
+            self.factory.generic(method, '/api/recipes/', **headers)
+        ).status_code
+
+    def test_sheds_anonymous_reads_when_threads_are_busy(self):
+        threads = runpy.run_path(
+            settings.BASE_DIR / 'gunicorn.conf.py'
+        )['threads']
+        self.occupy(1)
+        self.assertEqual(self.status('GET'), 200)
+        self.occupy(threads - 2)
+        # Проверяемый запрос занимает последний свободный поток.
+        self.assertEqual(self.status('GET'), 503)
+        self.assertEqual(self.status('POST', f'Token {KEY}'), 200)
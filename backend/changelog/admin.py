@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from changelog.models import Change
+
+
+@admin.register(Change)
+class ChangeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'model', 'object_id', 'user_id', 'action',
+                    'created')
+    list_filter = ('model', 'action')
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ChangelogConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'changelog'
+    verbose_name = 'Журнал изменений'
+
+    def ready(self):
+        import changelog.signals  # noqa: F401
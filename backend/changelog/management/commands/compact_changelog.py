@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from changelog.models import Change
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет записи журнала изменений, после которых есть более '
+        'новые записи о том же объекте. Ответы /api/sync/ не меняются.'
+    )
+
+    def handle(self, *args, **options):
+        newer = Change.objects.filter(
+            model=OuterRef('model'), object_id=OuterRef('object_id'),
+            id__gt=OuterRef('id')
+        )
+        public, _ = Change.objects.filter(
+            Exists(newer.filter(user_id__isnull=True)), user_id__isnull=True
+        ).delete()
+        personal, _ = Change.objects.filter(
+            Exists(newer.filter(user_id=OuterRef('user_id'))),
+            user_id__isnull=False
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала: {public + personal}.'
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-19 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('recipe', 'Рецепт'), ('tag', 'Тег'), ('ingredient', 'Ингредиент'), ('favorite', 'Избранное'), ('shopping_cart', 'Список покупок')], max_length=20, verbose_name='Объект')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор объекта')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name='Пользователь')),
+                ('action', models.CharField(choices=[('upsert', 'Добавление или изменение'), ('delete', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Изменения',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['model', 'object_id', 'user_id'], name='changelog_change_object_idx'), models.Index(fields=['user_id', 'id'], name='changelog_change_user_idx')],
+            },
+        ),
+    ]
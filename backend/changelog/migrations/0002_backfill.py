@@ -0,0 +1,55 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill(apps, schema_editor):
+    """
+    Записывает существующие объекты в журнал, чтобы первая
+    синхронизация (since=0) возвращала все данные.
+    """
+    Change = apps.get_model('changelog', 'Change')
+    public = (
+        ('tag', apps.get_model('recipes', 'Tag')),
+        ('ingredient', apps.get_model('recipes', 'Ingredient')),
+        ('recipe', apps.get_model('recipes', 'Recipe')),
+    )
+    for name, model in public:
+        Change.objects.bulk_create(
+            (
+                Change(model=name, object_id=pk, action='upsert')
+                for pk in model.objects.order_by('id')
+                .values_list('id', flat=True).iterator()
+            ),
+            batch_size=BATCH_SIZE
+        )
+    personal = (
+        ('favorite', apps.get_model('recipes', 'Favorite')),
+        ('shopping_cart', apps.get_model('recipes', 'ShoppingCard')),
+    )
+    for name, model in personal:
+        Change.objects.bulk_create(
+            (
+                Change(model=name, object_id=recipe_id, user_id=user_id,
+                       action='upsert')
+                for user_id, recipe_id in model.objects.order_by('id')
+                .values_list('user_id', 'recipe_id').iterator()
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+
+def clear(apps, schema_editor):
+    apps.get_model('changelog', 'Change').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changelog', '0001_initial'),
+        ('recipes', '0015_recipe_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
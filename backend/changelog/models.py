@@ -0,0 +1,59 @@
+from django.db import models
+
+
+class Change(models.Model):
+    """
+    Запись журнала изменений для синхронизации клиентов.
+    Номер записи (id) растет монотонно и служит токеном синхронизации.
+    Записи без пользователя видны всем, избранное и список покупок —
+    только своему пользователю.
+    """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    MODEL_CHOICES = (
+        (RECIPE, 'Рецепт'),
+        (TAG, 'Тег'),
+        (INGREDIENT, 'Ингредиент'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+    )
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (UPSERT, 'Добавление или изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    model = models.CharField(
+        max_length=20, choices=MODEL_CHOICES, verbose_name='Объект'
+    )
+    object_id = models.BigIntegerField(verbose_name='Идентификатор объекта')
+    user_id = models.BigIntegerField(
+        null=True, blank=True, verbose_name='Пользователь'
+    )
+    action = models.CharField(
+        max_length=10, choices=ACTION_CHOICES, verbose_name='Действие'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Изменения'
+        ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=('model', 'object_id', 'user_id'),
+                name='changelog_change_object_idx'
+            ),
+            models.Index(
+                fields=('user_id', 'id'), name='changelog_change_user_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'#{self.pk} {self.model} {self.object_id} {self.action}'
@@ -0,0 +1,37 @@
+"""
+Запись изменений в журнал. Изменения одной транзакции собираются
+и сохраняются одной вставкой после ее завершения, поэтому номера
+записей выдаются уже подтвержденным изменениям, а откаченные
+транзакции в журнал не попадают.
+"""
+from backend.on_commit import CommitBatch
+from changelog.models import Change
+
+
+def _flush(changes):
+    Change.objects.bulk_create([
+        Change(model=model, object_id=object_id, user_id=user_id,
+               action=action)
+        for (model, object_id, user_id), action in changes.items()
+    ])
+
+
+def _merge(pending, changes):
+    # Объект переносится в конец, чтобы записи шли в порядке
+    # последних изменений.
+    for key, action in changes.items():
+        pending.pop(key, None)
+        pending[key] = action
+
+
+_batch = CommitBatch(_flush, factory=dict, merge=_merge)
+
+
+def record(model, object_ids, action, user_id=None):
+    """
+    Отмечает изменение объектов для записи в журнал после транзакции.
+    Для каждого объекта сохраняется последнее действие в транзакции.
+    """
+    _batch.add({
+        (model, object_id, user_id): action for object_id in object_ids
+    })
@@ -0,0 +1,64 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from changelog.models import Change
+from changelog.recorder import record
+from recipes.documents import documents_rebuilt
+from recipes.images import image_processed
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCard, Tag
+
+MODELS = {
+    Recipe: Change.RECIPE,
+    Tag: Change.TAG,
+    Ingredient: Change.INGREDIENT,
+}
+USER_MODELS = {
+    Favorite: Change.FAVORITE,
+    ShoppingCard: Change.SHOPPING_CART,
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def record_upsert(sender, instance, **kwargs):
+    record(MODELS[sender], [instance.pk], Change.UPSERT)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_delete(sender, instance, **kwargs):
+    record(MODELS[sender], [instance.pk], Change.DELETE)
+
+
+@receiver(documents_rebuilt)
+def record_rebuilt_recipes(sender, recipe_ids, **kwargs):
+    """
+    Отмечает рецепты, у которых изменились теги, ингредиенты или автор.
+    """
+    record(Change.RECIPE, recipe_ids, Change.UPSERT)
+
+
+@receiver(image_processed)
+def record_processed_images(sender, recipe_ids, **kwargs):
+    """Изображение рецепта заменено обработанным."""
+    record(Change.RECIPE, recipe_ids, Change.UPSERT)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCard)
+def record_user_upsert(sender, instance, **kwargs):
+    record(
+        USER_MODELS[sender], [instance.recipe_id], Change.UPSERT,
+        instance.user_id
+    )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCard)
+def record_user_delete(sender, instance, **kwargs):
+    record(
+        USER_MODELS[sender], [instance.recipe_id], Change.DELETE,
+        instance.user_id
+    )
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.test import TestCase
+
+from changelog.models import Change
+from changelog.recorder import record
+
+
+class RecordTests(TestCase):
+    def changes(self):
+        return list(Change.objects.values_list(
+            'model', 'object_id', 'user_id', 'action'
+        ))
+
+    def test_changes_are_saved_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            record(Change.RECIPE, [1, 2], Change.UPSERT)
+            record(Change.FAVORITE, [1], Change.UPSERT, user_id=5)
+            self.assertEqual(self.changes(), [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.changes(), [
+            (Change.RECIPE, 1, None, Change.UPSERT),
+            (Change.RECIPE, 2, None, Change.UPSERT),
+            (Change.FAVORITE, 1, 5, Change.UPSERT),
+        ])
+
+    def test_last_action_is_saved_in_change_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record(Change.RECIPE, [1, 2], Change.UPSERT)
+            record(Change.RECIPE, [1], Change.DELETE)
+        self.assertEqual(self.changes(), [
+            (Change.RECIPE, 2, None, Change.UPSERT),
+            (Change.RECIPE, 1, None, Change.DELETE),
+        ])
+
+    def test_rolled_back_changes_are_not_saved(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record(Change.RECIPE, [1], Change.UPSERT)
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                record(Change.RECIPE, [2], Change.UPSERT)
+                1 / 0
+        self.assertEqual(self.changes(), [
+            (Change.RECIPE, 1, None, Change.UPSERT),
+        ])
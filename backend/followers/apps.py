@@ -5,3 +5,6 @@ class FollowersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'followers'
     verbose_name = 'Управление подписками'
+
+    def ready(self):
+        import followers.signals  # noqa: F401
@@ -21,6 +21,11 @@ class Follow(models.Model):
                 fields=('user', 'following'),
                 name='unique_follow'
             ),)
+        indexes = (
+            models.Index(
+                fields=('user', 'id'), name='followers_follow_user_idx'
+            ),
+        )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ('user',)
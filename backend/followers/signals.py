@@ -0,0 +1,26 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from followers.models import Follow
+from followers.suggestions import invalidate_user
+from recipes.events import publish
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_follow_graph(sender, instance, **kwargs):
+    """Обновляет граф подписок при подписке и отписке пользователя."""
+    invalidate_user(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def publish_follow_event(sender, instance, signal, **kwargs):
+    """Обновляет авторов в открытых потоках событий пользователя."""
+    transaction.on_commit(partial(publish, {
+        'type': 'follow',
+        'user': instance.user_id,
+        'author': instance.following_id,
+        'following': signal is post_save,
+    }))
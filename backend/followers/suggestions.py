@@ -0,0 +1,81 @@
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from backend.metrics import record_cache
+from followers.models import Follow
+
+FOLLOWING_CACHE_KEY = 'follow_graph:following:{}'
+SUGGESTIONS_CACHE_KEY = 'follow_graph:suggestions:{}'
+
+
+def _sample(ids, limit):
+    """Ограничивает число соседей узла с большим количеством подписок."""
+    if len(ids) > limit:
+        return random.sample(ids, limit)
+    return ids
+
+
+def get_following(user_ids):
+    """
+    Возвращает списки авторов, на которых подписаны пользователи.
+    Списки смежности хранятся в кэше, недостающие загружаются одним запросом.
+    """
+    keys = {FOLLOWING_CACHE_KEY.format(user_id): user_id
+            for user_id in user_ids}
+    cached = cache.get_many(keys)
+    following = {keys[key]: value for key, value in cached.items()}
+    missing = [user_id for user_id in user_ids if user_id not in following]
+    record_cache('follow_graph', len(following), len(missing))
+    if missing:
+        loaded = {user_id: [] for user_id in missing}
+        for user_id, following_id in Follow.objects.filter(
+                user_id__in=missing
+        ).order_by().values_list('user_id', 'following_id'):
+            loaded[user_id].append(following_id)
+        cache.set_many(
+            {FOLLOWING_CACHE_KEY.format(user_id): value
+             for user_id, value in loaded.items()},
+            settings.FOLLOW_SUGGESTIONS['GRAPH_CACHE_TIMEOUT']
+        )
+        following.update(loaded)
+    return following
+
+
+def get_suggestions(user_id):
+    """
+    Возвращает id авторов, популярных среди тех, на кого подписан
+    пользователь, отсортированных по убыванию количества таких подписок.
+    """
+    cache_key = SUGGESTIONS_CACHE_KEY.format(user_id)
+    suggestions = cache.get(cache_key)
+    record_cache('suggestions', suggestions is not None, suggestions is None)
+    if suggestions is not None:
+        return suggestions
+    config = settings.FOLLOW_SUGGESTIONS
+    own_following = get_following([user_id])[user_id]
+    excluded = set(own_following)
+    excluded.add(user_id)
+    neighbours = _sample(own_following, config['FANOUT_LIMIT'])
+    scores = Counter()
+    for following_ids in get_following(neighbours).values():
+        for following_id in _sample(following_ids, config['FANOUT_LIMIT']):
+            if following_id not in excluded:
+                scores[following_id] += 1
+    suggestions = [
+        author_id for author_id, _ in sorted(
+            scores.items(), key=lambda item: (-item[1], item[0])
+        )[:config['LIMIT']]
+    ]
+    cache.set(cache_key, suggestions, config['CACHE_TIMEOUT'])
+    return suggestions
+
+
+def invalidate_user(user_id):
+    """Сбрасывает список подписок и рекомендации пользователя."""
+    cache.delete_many([
+        FOLLOWING_CACHE_KEY.format(user_id),
+        SUGGESTIONS_CACHE_KEY.format(user_id),
+    ])
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from followers.models import Follow
+from followers.suggestions import get_suggestions
+
+User = get_user_model()
+
+
+class SuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.me, cls.b, cls.c, cls.d, cls.e, cls.f = (
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name,
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for name in ('me', 'b', 'c', 'd', 'e', 'f')
+        )
+        for user, following in (
+            (cls.me, cls.b), (cls.me, cls.c),
+            (cls.b, cls.me), (cls.b, cls.c), (cls.b, cls.d),
+            (cls.b, cls.f), (cls.c, cls.d), (cls.c, cls.e),
+        ):
+            Follow.objects.create(user=user, following=following)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_own_follows_and_self_are_excluded(self):
+        suggestions = get_suggestions(self.me.id)
+        self.assertNotIn(self.me.id, suggestions)
+        self.assertNotIn(self.b.id, suggestions)
+        self.assertNotIn(self.c.id, suggestions)
+
+    def test_ordered_by_score_then_id(self):
+        self.assertEqual(
+            get_suggestions(self.me.id), [self.d.id, self.e.id, self.f.id]
+        )
+
+    def test_cache_is_dropped_on_follow_and_unfollow(self):
+        get_suggestions(self.me.id)
+        follow = Follow.objects.create(user=self.me, following=self.d)
+        self.assertEqual(get_suggestions(self.me.id), [self.e.id, self.f.id])
+        follow.delete()
+        self.assertEqual(
+            get_suggestions(self.me.id), [self.d.id, self.e.id, self.f.id]
+        )
+
+    def test_cached_result_is_reused(self):
+        get_suggestions(self.me.id)
+        with self.assertNumQueries(0):
+            get_suggestions(self.me.id)
+
+    @override_settings(FOLLOW_SUGGESTIONS={
+        **settings.FOLLOW_SUGGESTIONS, 'FANOUT_LIMIT': 1
+    })
+    def test_fanout_is_sampled(self):
+        # Выборка из последних по id: автор c и его подписка e.
+        with mock.patch(
+            'followers.suggestions.random.sample',
+            lambda ids, limit: sorted(ids)[-limit:]
+        ):
+            self.assertEqual(get_suggestions(self.me.id), [self.e.id])
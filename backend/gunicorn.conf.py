@@ -0,0 +1,78 @@
+# Настройки gunicorn для запуска в production.
+# Значения по умолчанию можно переопределить переменными окружения.
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# backend.wsgi:application для синхронного режима,
+# backend.asgi:application вместе с uvicorn.workers.UvicornWorker для ASGI.
+wsgi_app = os.getenv('GUNICORN_APP', 'backend.wsgi:application')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Процессы масштабируются по количеству ядер, потоки внутри процесса
+# позволяют не простаивать, пока запрос ждет ответа базы данных.
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+threads = int(os.getenv(
+    'GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1
+))
+
+# Приложение загружается один раз в мастер-процессе до fork.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Процессы перезапускаются после указанного числа запросов (со случайным
+# разбросом, чтобы не перезапускаться одновременно) для защиты от утечек.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+
+def on_starting(server):
+    """
+    Метрики предыдущего запуска удаляются при старте мастер-процесса,
+    кэш популярных рецептов заполняется до того, как сервер начнет
+    принимать запросы (WARM_CACHE).
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    from backend.metrics import clear
+    clear()
+    if os.getenv('WARM_CACHE', 'True') == 'True':
+        warm_cache(server)
+
+
+def warm_cache(server):
+    """Ошибка прогрева кэша не мешает запуску сервера."""
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connections
+
+    from backend.db_pool.base import close_pools
+    try:
+        call_command('warm_cache')
+    except Exception:
+        server.log.exception('Не удалось заполнить кэш рецептов.')
+    finally:
+        connections.close_all()
+        close_pools()
+
+
+def pre_fork(server, worker):
+    """
+    Соединения с базой данных, открытые в мастер-процессе при preload,
+    закрываются до fork, чтобы процессы не использовали общий сокет.
+    """
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+
+    from backend.db_pool.base import close_pools
+    connections.close_all()
+    close_pools()
@@ -0,0 +1,71 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from jobs.queue import claim, run
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчик фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.JOBS['CONCURRENCY'],
+            help='Количество потоков, выполняющих задачи.'
+        )
+        parser.add_argument(
+            '--visibility-timeout', type=int,
+            default=settings.JOBS['VISIBILITY_TIMEOUT'],
+            help='Через сколько секунд незавершенная задача '
+                 'снова становится доступной.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.JOBS['POLL_INTERVAL'],
+            help='Пауза между проверками пустой очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершить работу, когда очередь опустеет.'
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: self.stop.set())
+        signal.signal(signal.SIGINT, lambda *args: self.stop.set())
+        workers = [
+            threading.Thread(target=self.work, args=(options,), daemon=True)
+            for _ in range(options['concurrency'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(
+            f'Обработчик задач запущен, потоков: {len(workers)}.'
+        )
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
+        self.stdout.write('Обработчик задач остановлен.')
+
+    def work(self, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    job = claim(options['visibility_timeout'])
+                except DatabaseError as error:
+                    self.stderr.write(f'Ошибка получения задачи: {error}')
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                if job is None:
+                    if options['burst']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                run(job)
+        finally:
+            connections.close_all()
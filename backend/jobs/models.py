@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+def default_max_attempts():
+    return settings.JOBS['MAX_ATTEMPTS']
+
+
+class Job(models.Model):
+    """Модель отложенной задачи."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=200, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0, verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=default_max_attempts, verbose_name='Максимум попыток'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now, verbose_name='Выполнить после'
+    )
+    locked_until = models.DateTimeField(
+        null=True, blank=True, verbose_name='Заблокирована до'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата создания'
+    )
+    started = models.DateTimeField(
+        null=True, blank=True, verbose_name='Дата запуска'
+    )
+    finished = models.DateTimeField(
+        null=True, blank=True, verbose_name='Дата завершения'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('run_after',)
+        indexes = (
+            models.Index(
+                fields=('status', 'run_after'),
+                condition=models.Q(status__in=('pending', 'running')),
+                name='jobs_job_queue_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,159 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def job(name):
+    """Регистрирует функцию как фоновую задачу с указанным именем."""
+    def decorator(func):
+        _registry[name] = func
+        func.job_name = name
+        return func
+    return decorator
+
+
+def enqueue(name, delay=0, **payload):
+    """
+    Ставит задачу в очередь и сразу возвращает управление.
+    При JOBS['EAGER'] задача выполняется немедленно в текущем процессе.
+    """
+    if settings.JOBS['EAGER']:
+        _registry[name](**payload)
+        return None
+    return Job.objects.create(
+        name=name, payload=payload,
+        run_after=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def claim(visibility_timeout):
+    """
+    Забирает очередную задачу: ожидающую либо зависшую задачу,
+    у которой истек срок блокировки. Зависшая задача, исчерпавшая
+    попытки (например, процесс завершался при каждом выполнении),
+    отмечается как FAILED. Возвращает None, если очередь пуста.
+    """
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            candidate = (
+                Job.objects
+                .select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=Job.PENDING, run_after__lte=now)
+                    | Q(status=Job.RUNNING, locked_until__lt=now)
+                )
+                .order_by('run_after')
+                .values('pk', 'status', 'attempts', 'max_attempts')
+                .first()
+            )
+            if candidate is None:
+                return None
+            jobs = Job.objects.filter(
+                pk=candidate['pk'], attempts=candidate['attempts']
+            )
+            if (
+                candidate['status'] == Job.RUNNING
+                and candidate['attempts'] >= candidate['max_attempts']
+            ):
+                jobs.update(
+                    status=Job.FAILED, locked_until=None, finished=now,
+                    last_error='Срок блокировки истек, попытки исчерпаны.'
+                )
+                continue
+            claimed = jobs.update(
+                status=Job.RUNNING,
+                attempts=F('attempts') + 1,
+                started=now,
+                locked_until=now + timedelta(seconds=visibility_timeout),
+            )
+        if claimed:
+            return Job.objects.get(pk=candidate['pk'])
+
+
+def run(job_obj):
+    """
+    Выполняет задачу и планирует повтор с нарастающей задержкой.
+    Результат не сохраняется, если после истечения срока блокировки
+    задачу забрал другой обработчик. Возвращает True, если сохранен.
+    """
+    try:
+        _registry[job_obj.name](**job_obj.payload)
+    except Exception:
+        logger.exception('Задача %s завершилась с ошибкой', job_obj)
+        job_obj.last_error = traceback.format_exc()
+        job_obj.locked_until = None
+        if job_obj.attempts < job_obj.max_attempts:
+            delay = settings.JOBS['RETRY_BACKOFF'] * 2 ** (
+                job_obj.attempts - 1
+            )
+            job_obj.status = Job.PENDING
+            job_obj.run_after = timezone.now() + timedelta(
+                seconds=delay * random.uniform(1, 1.5)
+            )
+        else:
+            job_obj.status = Job.FAILED
+            job_obj.finished = timezone.now()
+    else:
+        job_obj.status = Job.DONE
+        job_obj.locked_until = None
+        job_obj.finished = timezone.now()
+    saved = Job.objects.filter(
+        pk=job_obj.pk, attempts=job_obj.attempts
+    ).update(
+        status=job_obj.status, run_after=job_obj.run_after,
+        locked_until=job_obj.locked_until, finished=job_obj.finished,
+        last_error=job_obj.last_error
+    )
+    if not saved:
+        logger.warning(
+            'Результат задачи %s не сохранен: задачу забрал другой '
+            'обработчик', job_obj
+        )
+    return bool(saved)
+
+
+def queue_stats(window=timedelta(hours=1)):
+    """
+    Глубина очереди и задержки выполнения задач для мониторинга.
+    Задержка ожидания считается от постановки в очередь до запуска.
+    """
+    now = timezone.now()
+    depth = dict(
+        Job.objects.values_list('status').annotate(count=Count('pk'))
+        .order_by()
+    )
+    oldest = Job.objects.filter(
+        status=Job.PENDING, run_after__lte=now
+    ).aggregate(oldest=Min('run_after'))['oldest']
+    latency = Job.objects.filter(
+        status=Job.DONE, finished__gte=now - window
+    ).aggregate(
+        wait=Avg(F('started') - F('created')),
+        run=Avg(F('finished') - F('started')),
+    )
+    return {
+        'depth': {status: depth.get(status, 0)
+                  for status, _ in Job.STATUS_CHOICES},
+        'oldest_pending_seconds': (
+            (now - oldest).total_seconds() if oldest else 0
+        ),
+        'avg_wait_seconds': (
+            latency['wait'].total_seconds() if latency['wait'] else 0
+        ),
+        'avg_run_seconds': (
+            latency['run'].total_seconds() if latency['run'] else 0
+        ),
+    }
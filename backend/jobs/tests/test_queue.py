@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim, enqueue, job, run
+
+calls = []
+
+
+@job('tests.succeed')
+def succeed(**payload):
+    calls.append(payload)
+
+
+@job('tests.fail')
+def fail(**payload):
+    raise RuntimeError('ошибка')
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def expire(self, job_obj):
+        Job.objects.filter(pk=job_obj.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_claim_locks_pending_job(self):
+        created = enqueue('tests.succeed', value=1)
+        claimed = claim(visibility_timeout=60)
+        self.assertEqual(claimed.pk, created.pk)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertGreater(claimed.locked_until, timezone.now())
+        self.assertIsNone(claim(visibility_timeout=60))
+
+    def test_claim_skips_delayed_job(self):
+        enqueue('tests.succeed', delay=60)
+        self.assertIsNone(claim(visibility_timeout=60))
+
+    def test_run_marks_job_done(self):
+        enqueue('tests.succeed', value=1)
+        self.assertTrue(run(claim(visibility_timeout=60)))
+        self.assertEqual(calls, [{'value': 1}])
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        enqueue('tests.fail')
+        run(claim(visibility_timeout=60))
+        retried = Job.objects.get()
+        self.assertEqual(retried.status, Job.PENDING)
+        self.assertEqual(retried.attempts, 1)
+        self.assertGreater(retried.run_after, timezone.now())
+        self.assertIn('RuntimeError', retried.last_error)
+        self.assertIsNone(claim(visibility_timeout=60))
+
+    def test_failed_job_stops_after_max_attempts(self):
+        created = enqueue('tests.fail')
+        Job.objects.filter(pk=created.pk).update(max_attempts=2)
+        for _ in range(2):
+            Job.objects.filter(pk=created.pk).update(run_after=timezone.now())
+            run(claim(visibility_timeout=60))
+        failed = Job.objects.get()
+        self.assertEqual(failed.status, Job.FAILED)
+        self.assertEqual(failed.attempts, 2)
+        self.assertIsNotNone(failed.finished)
+
+    def test_expired_job_is_claimed_again(self):
+        enqueue('tests.succeed')
+        first = claim(visibility_timeout=60)
+        self.assertIsNone(claim(visibility_timeout=60))
+        self.expire(first)
+        second = claim(visibility_timeout=60)
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(second.attempts, 2)
+
+    def test_expired_job_fails_after_max_attempts(self):
+        created = enqueue('tests.succeed')
+        Job.objects.filter(pk=created.pk).update(max_attempts=1)
+        self.expire(claim(visibility_timeout=60))
+        self.assertIsNone(claim(visibility_timeout=60))
+        failed = Job.objects.get()
+        self.assertEqual(failed.status, Job.FAILED)
+        self.assertIsNone(failed.locked_until)
+        self.assertEqual(calls, [])
+
+    def test_stale_worker_does_not_overwrite_reclaimed_job(self):
+        enqueue('tests.fail')
+        stale = claim(visibility_timeout=60)
+        self.expire(stale)
+        current = claim(visibility_timeout=60)
+        self.assertFalse(run(stale))
+        reloaded = Job.objects.get()
+        self.assertEqual(reloaded.status, Job.RUNNING)
+        self.assertEqual(reloaded.attempts, 2)
+        self.assertTrue(run(current))
+        self.assertEqual(Job.objects.get().status, Job.PENDING)
+
+    @override_settings(JOBS={**settings.JOBS, 'EAGER': True})
+    def test_eager_mode_runs_immediately(self):
+        self.assertIsNone(enqueue('tests.succeed', value=2))
+        self.assertEqual(calls, [{'value': 2}])
+        self.assertFalse(Job.objects.exists())
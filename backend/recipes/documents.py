@@ -0,0 +1,100 @@
+"""
+Документы рецептов: теги, автор и ингредиенты в одном столбце
+Recipe.document. Документ не зависит от пользователя, поэтому рецепт
+читается одним запросом, а отметки пользователя добавляются отдельно.
+Элементы хранятся списками, а не словарями, так как jsonb в PostgreSQL
+не сохраняет порядок ключей.
+"""
+from django.conf import settings
+from django.dispatch import Signal
+
+from backend.on_commit import CommitBatch
+from jobs.queue import enqueue
+from recipes.models import Recipe, RecipeIngredients
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+AUTHOR_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit', 'amount')
+
+# Отправляется после сохранения пересобранных документов (recipe_ids).
+documents_rebuilt = Signal()
+
+
+def build_documents(recipe_ids, using=None):
+    """
+    Собирает документы рецептов по данным связанных таблиц базы using
+    (по умолчанию — по маршрутизации чтения).
+    """
+    documents = {
+        pk: {'tags': [], 'author': author, 'ingredients': []}
+        for pk, *author in Recipe.objects.using(using).filter(
+            id__in=recipe_ids
+        ).values_list('id', *(f'author__{field}' for field in AUTHOR_FIELDS))
+    }
+    tags = (
+        Recipe.tags.through.objects.using(using)
+        .filter(recipe_id__in=documents)
+        .order_by('tag_id')
+        .values_list('recipe_id', *(f'tag__{field}' for field in TAG_FIELDS))
+    )
+    for recipe_id, *tag in tags:
+        documents[recipe_id]['tags'].append(tag)
+    ingredients = (
+        RecipeIngredients.objects.using(using)
+        .filter(recipe_id__in=documents)
+        .values_list('recipe_id', 'ingredient__id', 'ingredient__name',
+                     'ingredient__measurement_unit', 'amount')
+    )
+    for recipe_id, *ingredient in ingredients:
+        documents[recipe_id]['ingredients'].append(ingredient)
+    return documents
+
+
+def represent_document(document):
+    """Теги, автор и ингредиенты в формате сериализаторов API."""
+    return {
+        'tags': [dict(zip(TAG_FIELDS, tag)) for tag in document['tags']],
+        'author': dict(zip(AUTHOR_FIELDS, document['author'])),
+        'ingredients': [
+            dict(zip(INGREDIENT_FIELDS, ingredient))
+            for ingredient in document['ingredients']
+        ],
+    }
+
+
+def rebuild_documents(recipe_ids):
+    """Пересобирает и сохраняет документы рецептов пачками."""
+    recipe_ids = list(recipe_ids)
+    batch_size = settings.RECIPE_DOCUMENTS['BATCH_SIZE']
+    for start in range(0, len(recipe_ids), batch_size):
+        documents = build_documents(recipe_ids[start:start + batch_size])
+        Recipe.objects.bulk_update(
+            [Recipe(id=pk, document=document)
+             for pk, document in documents.items()],
+            ('document',)
+        )
+        documents_rebuilt.send(sender=Recipe, recipe_ids=list(documents))
+
+
+def _flush(recipe_ids):
+    options = settings.RECIPE_DOCUMENTS
+    recipe_ids = sorted(recipe_ids)
+    if len(recipe_ids) <= options['SYNC_LIMIT']:
+        rebuild_documents(recipe_ids)
+        return
+    for start in range(0, len(recipe_ids), options['BATCH_SIZE']):
+        enqueue(
+            'recipes.rebuild_documents',
+            recipe_ids=recipe_ids[start:start + options['BATCH_SIZE']]
+        )
+
+
+_batch = CommitBatch(_flush)
+
+
+def schedule_rebuild(recipe_ids):
+    """
+    Отмечает рецепты для пересборки документов после транзакции.
+    Все изменения одной транзакции пересобираются одной пачкой.
+    """
+    _batch.add(recipe_ids)
@@ -0,0 +1,167 @@
+"""
+События о рецептах для потока /api/events/.
+Сигналы моделей публикуют события после транзакции. В PostgreSQL
+события передаются через NOTIFY, поэтому доходят до подписчиков во всех
+процессах; с другими базами данных — только внутри процесса.
+Каждый ASGI процесс держит одно соединение LISTEN и раздает события
+подключенным клиентам через очереди ограниченного размера.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import psycopg2
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW = {'type': 'overflow'}
+
+
+def publish(event):
+    """Передает событие подписчикам всех процессов."""
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != 'postgresql':
+        hub.publish_local(event)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, %s)',
+            [settings.RECIPE_EVENTS['CHANNEL'], json.dumps(event)]
+        )
+
+
+class Subscription:
+    """Подключение клиента: авторы, на которых он подписан, и очередь."""
+    def __init__(self, user_id, author_ids):
+        self.user_id = user_id
+        self.author_ids = set(author_ids)
+        self.queue = asyncio.Queue(settings.RECIPE_EVENTS['QUEUE_SIZE'])
+
+    def put(self, event):
+        """
+        Добавляет событие в очередь. Если клиент не успевает читать
+        события, очередь очищается и клиент получает событие overflow,
+        после которого соединение закрывается.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+
+class RecipeEventHub:
+    """
+    Раздача событий подписчикам внутри процесса.
+    Все методы, кроме publish_local, вызываются в цикле событий.
+    """
+    def __init__(self):
+        self.loop = None
+        self.by_author = defaultdict(set)
+        self.by_user = defaultdict(set)
+        self.listener = None
+
+    def subscribe(self, user_id, author_ids):
+        self.start()
+        subscription = Subscription(user_id, author_ids)
+        self.by_user[user_id].add(subscription)
+        for author_id in subscription.author_ids:
+            self.by_author[author_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.by_user[subscription.user_id].discard(subscription)
+        if not self.by_user[subscription.user_id]:
+            del self.by_user[subscription.user_id]
+        for author_id in list(subscription.author_ids):
+            self.follow(subscription, author_id, False)
+
+    def follow(self, subscription, author_id, following):
+        if following:
+            subscription.author_ids.add(author_id)
+            self.by_author[author_id].add(subscription)
+            return
+        subscription.author_ids.discard(author_id)
+        self.by_author[author_id].discard(subscription)
+        if not self.by_author[author_id]:
+            del self.by_author[author_id]
+
+    def dispatch(self, event):
+        if event['type'] == 'follow':
+            for subscription in list(self.by_user.get(event['user'], ())):
+                self.follow(subscription, event['author'], event['following'])
+            return
+        for subscription in self.by_author.get(event['author'], ()):
+            subscription.put(event)
+
+    def publish_local(self, event):
+        """Передает событие из любого потока в цикл событий процесса."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, event)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+        self.loop = loop
+        if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql':
+            self.listener = loop.create_task(self.listen())
+
+    async def listen(self):
+        """Получает события других процессов через LISTEN."""
+        while True:
+            try:
+                connection = await self.loop.run_in_executor(
+                    None, self.connect
+                )
+            except Exception:
+                logger.exception('Не удалось подключиться для LISTEN.')
+                await asyncio.sleep(settings.RECIPE_EVENTS['RECONNECT_DELAY'])
+                continue
+            closed = self.loop.create_future()
+            self.loop.add_reader(
+                connection.fileno(), self.read, connection, closed
+            )
+            try:
+                await closed
+            finally:
+                self.loop.remove_reader(connection.fileno())
+                connection.close()
+            await asyncio.sleep(settings.RECIPE_EVENTS['RECONNECT_DELAY'])
+
+    @staticmethod
+    def connect():
+        params = connections[DEFAULT_DB_ALIAS].get_connection_params()
+        params.pop('cursor_factory', None)
+        connection = psycopg2.connect(
+            keepalives=1, keepalives_idle=30, keepalives_interval=10,
+            keepalives_count=3, **params
+        )
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LISTEN "{settings.RECIPE_EVENTS["CHANNEL"]}"'
+            )
+        return connection
+
+    def read(self, connection, closed):
+        try:
+            connection.poll()
+        except Exception:
+            logger.exception('Соединение LISTEN потеряно.')
+            if not closed.done():
+                closed.set_result(None)
+            return
+        while connection.notifies:
+            notify = connection.notifies.pop(0)
+            try:
+                self.dispatch(json.loads(notify.payload))
+            except (ValueError, KeyError):
+                logger.warning('Некорректное событие: %s', notify.payload)
+
+
+hub = RecipeEventHub()
@@ -0,0 +1,152 @@
+import logging
+import os
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Отправляется после сохранения обработанного изображения (recipe_ids).
+image_processed = Signal()
+
+FORMAT_OPTIONS = {
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'method': 6},
+    'avif': {'format': 'AVIF'},
+}
+
+
+def available_formats():
+    """Форматы вариантов, для которых в Pillow есть кодировщик."""
+    Image.init()
+    return [
+        fmt for fmt in settings.RECIPE_IMAGE_FORMATS
+        if FORMAT_OPTIONS[fmt]['format'] in Image.SAVE
+    ]
+
+
+def _encode(image, fmt, **extra):
+    """Кодирует изображение без метаданных (EXIF, ICC, XMP)."""
+    options = dict(FORMAT_OPTIONS.get(fmt, {'format': fmt.upper()}))
+    options.update(extra)
+    if options['format'] == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, quality=settings.RECIPE_IMAGE_QUALITY, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def recipe_files(image_name, variants):
+    """Имена всех файлов изображения рецепта, включая уменьшенные копии."""
+    names = [image_name] if image_name else []
+    for formats in variants.values():
+        names.extend(formats.values())
+    return names
+
+
+def is_referenced(name):
+    """Проверяет, ссылается ли на файл хотя бы один рецепт."""
+    query = Q(image=name)
+    for size_name in settings.RECIPE_IMAGE_SIZES:
+        for fmt in settings.RECIPE_IMAGE_FORMATS:
+            query |= Q(**{f'image_variants__{size_name}__{fmt}': name})
+    return Recipe.objects.filter(query).exists()
+
+
+def _delete_unreferenced(names):
+    storage = Recipe._meta.get_field('image').storage
+    for name in names:
+        if not is_referenced(name):
+            storage.delete(name)
+
+
+def delete_unreferenced(names):
+    """
+    Удаляет после транзакции файлы, на которые больше не ссылается
+    ни один рецепт. Одинаковые изображения хранятся один раз, поэтому
+    файл может использоваться сразу несколькими рецептами, а при откате
+    транзакции файлы остаются на месте.
+    """
+    transaction.on_commit(partial(_delete_unreferenced, set(names)))
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    return ImageOps.contain(image, (width, height), Image.LANCZOS)
+
+
+def process_recipe_image(recipe):
+    """
+    Обработка загруженного изображения рецепта.
+    Декодирует оригинал один раз, перезаписывает его без метаданных
+    и сохраняет уменьшенные копии во всех доступных форматах.
+    Поля рецепта обновляются без post_save, поэтому об изменении
+    сообщает сигнал image_processed.
+    """
+    storage = recipe.image.storage
+    name = recipe.image.name
+    try:
+        with storage.open(name) as file:
+            image = Image.open(file)
+            original_format = 'JPEG' if image.format == 'MPO' else image.format
+            image.load()
+    except (OSError, Image.DecompressionBombError) as error:
+        logger.warning('Не удалось обработать изображение %s: %s',
+                       name, error)
+        return
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info or 'A' in image.mode
+            else 'RGB'
+        )
+
+    raw_name = name
+    name = storage.save(
+        recipe.image.field.upload_to + os.path.basename(name),
+        _encode(image, original_format.lower())
+    )
+
+    stem = os.path.splitext(os.path.basename(name))[0]
+    variants = {}
+    for size_name, (width, height, crop) in (
+            settings.RECIPE_IMAGE_SIZES.items()
+    ):
+        resized = _resize(image, width, height, crop)
+        variants[size_name] = {
+            fmt: storage.save(
+                f'{settings.RECIPE_IMAGE_VARIANTS_DIR}'
+                f'{stem}_{size_name}.{fmt}',
+                _encode(resized, fmt)
+            )
+            for fmt in available_formats()
+        }
+
+    old_files = recipe_files(raw_name, recipe.image_variants)
+    recipe.image.name = name
+    recipe.image_variants = variants
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image=name, image_variants=variants
+    )
+    image_processed.send(sender=Recipe, recipe_ids=[recipe.pk])
+    delete_unreferenced(old_files)
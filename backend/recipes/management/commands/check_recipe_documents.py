@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.documents import (build_documents, rebuild_documents,
+                               represent_document)
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает документы рецептов (Recipe.document) с данными '
+        'связанных таблиц и при необходимости пересобирает их.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество рецептов, проверяемых за один проход.'
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересобрать отличающиеся и отсутствующие документы.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+        checked = 0
+        mismatched = []
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            expected = build_documents(batch)
+            for recipe_id, document in Recipe.objects.filter(
+                id__in=batch
+            ).values_list('id', 'document'):
+                checked += 1
+                if not document or recipe_id not in expected or (
+                    represent_document(document)
+                    != represent_document(expected[recipe_id])
+                ):
+                    mismatched.append(recipe_id)
+        for recipe_id in mismatched[:20]:
+            self.stdout.write(f'Документ рецепта {recipe_id} отличается.')
+        if mismatched and options['fix']:
+            rebuild_documents(mismatched)
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересобрано документов: {len(mismatched)}.'
+            ))
+        elif mismatched:
+            raise CommandError(
+                f'Отличается документов: {len(mismatched)} из {checked}.'
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Проверено документов: {checked}, отличий нет.'
+            ))
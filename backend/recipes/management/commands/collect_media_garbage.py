@@ -0,0 +1,115 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import recipe_files
+from recipes.models import ImageUpload, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы изображений рецептов и загрузок, '
+        'на которые не ссылается ни одна запись в базе данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество файлов, удаляемых за один проход.'
+        )
+        parser.add_argument(
+            '--grace-period', type=int, default=60 * 60,
+            help='Не удалять файлы моложе указанного числа секунд.'
+        )
+        parser.add_argument(
+            '--upload-ttl', type=int, default=60 * 60 * 24,
+            help='Удалять незавершенные загрузки старше указанного '
+                 'числа секунд.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, какие файлы будут удалены.'
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        if not self.dry_run:
+            expired = ImageUpload.objects.filter(
+                created__lt=timezone.now() - timedelta(
+                    seconds=options['upload_ttl']
+                )
+            )
+            self.stdout.write(
+                f'Удалено устаревших загрузок: {expired.delete()[0]}.'
+            )
+        referenced = self.referenced_names()
+        deadline = time.time() - options['grace_period']
+        batch = []
+        total = 0
+        for directory in (
+                Recipe._meta.get_field('image').upload_to,
+                ImageUpload._meta.get_field('file').upload_to,
+        ):
+            for path, name in self.scan(directory):
+                if name in referenced:
+                    continue
+                try:
+                    if os.stat(path).st_mtime > deadline:
+                        continue
+                except FileNotFoundError:
+                    continue
+                batch.append(path)
+                if len(batch) >= self.batch_size:
+                    total += self.delete_batch(batch)
+                    batch = []
+        total += self.delete_batch(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено неиспользуемых файлов: {total}.'
+        ))
+
+    def referenced_names(self):
+        referenced = set()
+        recipes = Recipe.objects.values_list(
+            'image', 'image_variants'
+        ).iterator(chunk_size=2000)
+        for image, variants in recipes:
+            referenced.update(recipe_files(image, variants))
+        referenced.update(
+            ImageUpload.objects.values_list(
+                'file', flat=True
+            ).iterator(chunk_size=2000)
+        )
+        return referenced
+
+    def scan(self, directory):
+        root = settings.MEDIA_ROOT
+        stack = [os.path.join(root, directory)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, os.path.relpath(
+                            entry.path, root
+                        ).replace(os.sep, '/')
+
+    def delete_batch(self, batch):
+        for path in batch:
+            if self.dry_run:
+                self.stdout.write(path)
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(batch)
@@ -0,0 +1,117 @@
+import json
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from followers.models import Follow
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCard, Tag)
+from recipes.query_plans import check_plans
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет планы (EXPLAIN) основных запросов API: чтение таблиц '
+        'целиком (Seq Scan) и сортировка (Sort) там, где ее должен '
+        'заменять индекс, считаются ошибкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help=(
+                'Заполнить базу данных указанным количеством рецептов '
+                '(с пользователями, ингредиентами, избранным и подписками) '
+                'перед проверкой. Данные удаляются после проверки.'
+            )
+        )
+        parser.add_argument(
+            '--real-costs', action='store_true',
+            help=(
+                'Не запрещать планировщику Seq Scan и Sort. Имеет смысл '
+                'на базе данных с объемом данных как в эксплуатации.'
+            )
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Вывести план каждого запроса.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+                results = check_plans(cursor, options['real_costs'])
+            transaction.set_rollback(True)
+        failures = []
+        for name, found, used, plan in results:
+            if found:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: {", ".join(found)}'
+                ))
+            else:
+                self.stdout.write(
+                    f'{name}: {", ".join(used) or "без индексов"}'
+                )
+            if options['plans']:
+                self.stdout.write(json.dumps(plan, indent=2))
+        if failures:
+            raise CommandError(
+                f'Запросов без подходящего индекса: {len(failures)} '
+                f'({", ".join(failures)}).'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Все запросы используют индексы.'
+        ))
+
+    def seed(self, count):
+        """Синтетические данные: count рецептов и связанные строки."""
+        authors = User.objects.bulk_create(
+            User(username=f'explain-{number}',
+                 email=f'explain-{number}@example.com')
+            for number in range(max(count // 10, 2))
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'explain-{number}', slug=f'explain-{number}',
+                color='#000000')
+            for number in range(5)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(max(count // 2, 10))
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=random.choice(authors), name=f'explain-{number}',
+                   text='', cooking_time=1)
+            for number in range(count)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=random.choice(tags))
+            for recipe in recipes
+        )
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, 5)
+        )
+        for user in authors:
+            favorites = random.sample(recipes, min(len(recipes), 20))
+            Favorite.objects.bulk_create(
+                Favorite(user=user, recipe=recipe) for recipe in favorites
+            )
+            ShoppingCard.objects.bulk_create(
+                ShoppingCard(user=user, recipe=recipe)
+                for recipe in favorites[:5]
+            )
+            Follow.objects.bulk_create(
+                Follow(user=user, following=author)
+                for author in random.sample(authors, min(len(authors), 10))
+                if author != user
+            )
@@ -0,0 +1,68 @@
+# Generated by Django 5.0 on 2026-10-19 08:35
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Объединяет повторы ингредиента в рецепте перед созданием
+    ограничения unique_recipe_ingredient: количество суммируется
+    в первую строку. Документы затронутых рецептов сбрасываются
+    и собираются заново при выводе.
+    """
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    duplicates = (
+        RecipeIngredients.objects.order_by()
+        .values('recipe_id', 'ingredient_id')
+        .annotate(count=Count('id'), first=Min('id'), total=Sum('amount'))
+        .filter(count__gt=1)
+    )
+    recipe_ids = set()
+    for row in duplicates:
+        RecipeIngredients.objects.filter(pk=row['first']).update(
+            amount=row['total']
+        )
+        RecipeIngredients.objects.filter(
+            recipe_id=row['recipe_id'], ingredient_id=row['ingredient_id']
+        ).exclude(pk=row['first']).delete()
+        recipe_ids.add(row['recipe_id'])
+    Recipe.objects.filter(id__in=recipe_ids).update(document={})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name'], name='recipes_ingredient_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='recipes_ingredient_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date'], name='recipes_recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipes_recipe_author_idx'),
+        ),
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredients',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
@@ -1,6 +1,12 @@
+import uuid
+
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models.functions import Upper
+
+from recipes.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -16,6 +22,14 @@ class Ingredient(models.Model):
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
         ordering = ('name',)
+        indexes = (
+            models.Index(fields=('name',), name='recipes_ingredient_name_idx'),
+            # Поиск по началу названия: UPPER(name) LIKE 'ТЕКСТ%'.
+            models.Index(
+                OpClass(Upper('name'), name='text_pattern_ops'),
+                name='recipes_ingredient_prefix_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
@@ -67,19 +81,41 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/images/',
+        storage=ContentAddressedStorage(),
         null=True,
         blank=False,
         verbose_name='Изображение'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения'
+    )
     text = models.TextField(verbose_name='Описание рецепта', blank=False)
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления', blank=False
     )
+    document = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Теги, автор и ингредиенты рецепта'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date',), name='recipes_recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipes_recipe_author_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.name} от автора: {self.author.username}'
@@ -105,6 +141,11 @@ class RecipeIngredients(models.Model):
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
         ordering = ('ingredient',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient'
+            ),)
 
     def __str__(self):
         return f'{self.ingredient.name} в рецепте: {self.recipe.name}'
@@ -156,3 +197,37 @@ class ShoppingCard(models.Model):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
         ordering = ('recipe',)
+
+
+class ImageUpload(models.Model):
+    """Модель загрузки изображения рецепта частями."""
+    token = models.UUIDField(
+        default=uuid.uuid4, unique=True, editable=False,
+        verbose_name='Токен загрузки'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='image_uploads'
+    )
+    file = models.FileField(upload_to='uploads/', verbose_name='Файл')
+    size = models.PositiveBigIntegerField(verbose_name='Размер файла')
+    offset = models.PositiveBigIntegerField(
+        default=0, verbose_name='Загружено байт'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата создания'
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.token}: {self.offset} из {self.size} байт'
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
@@ -0,0 +1,156 @@
+"""
+Планы (EXPLAIN) основных запросов API в PostgreSQL. Чтение таблицы
+целиком (Seq Scan) и сортировка (Sort) там, где порядок должен давать
+индекс, считаются ошибкой. Планы проверяет тест
+recipes.tests.test_query_plans, на базе с реальными данными —
+команда explain_hot_paths.
+"""
+import json
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from api.filters import RecipeFilter
+from api.paginators import UserCursorPaginator
+from changelog.models import Change
+from followers.models import Follow
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCard, Tag)
+
+User = get_user_model()
+
+PAGE_SIZE = 6
+SCAN = 'Seq Scan'
+SORT = 'Sort'
+
+
+def recipe_page(user, **params):
+    """Страница списка рецептов с фильтрами RecipeFilter."""
+    request = SimpleNamespace(user=user)
+    return RecipeFilter(
+        params, queryset=Recipe.objects.all(), request=request
+    ).qs.values('id', 'name', 'author_id', 'pub_date')[:PAGE_SIZE]
+
+
+def hot_paths(user, recipe_ids, author_ids, tag_slug):
+    """
+    Запросы в том виде, в котором их выполняют представления:
+    (название, queryset, запрещенные узлы плана).
+    """
+    return (
+        ('Список рецептов', recipe_page(user), (SCAN, SORT)),
+        ('Рецепты автора', recipe_page(user, author=user.id), (SCAN, SORT)),
+        ('Избранное', recipe_page(user, is_favorited=True), (SCAN, SORT)),
+        ('Рецепты в списке покупок',
+         recipe_page(user, is_in_shopping_cart=True), (SCAN, SORT)),
+        ('Рецепты по тегу', recipe_page(user, tags=[tag_slug]), (SCAN,)),
+        ('Поиск ингредиентов',
+         Ingredient.objects.filter(name__istartswith='а'), (SCAN,)),
+        ('Ингредиенты рецептов',
+         RecipeIngredients.objects.filter(recipe_id__in=recipe_ids)
+         .values_list('recipe_id', 'ingredient__name', 'amount'), (SCAN,)),
+        ('Отметки избранного',
+         Favorite.objects.filter(user=user, recipe_id__in=recipe_ids)
+         .order_by().values_list('recipe_id', flat=True), (SCAN,)),
+        ('Отметки списка покупок',
+         ShoppingCard.objects.filter(user=user, recipe_id__in=recipe_ids)
+         .order_by().values_list('recipe_id', flat=True), (SCAN,)),
+        ('Отметки подписок',
+         Follow.objects.filter(user=user, following_id__in=author_ids)
+         .order_by().values_list('following_id', flat=True), (SCAN,)),
+        ('Пользователи',
+         User.objects.order_by(*UserCursorPaginator.ordering)
+         .filter(date_joined__lt=timezone.now())
+         .values_list('id', flat=True)[:PAGE_SIZE], (SCAN, SORT)),
+        ('Подписки',
+         Follow.objects.filter(user=user).order_by('id')
+         .values_list('following_id', flat=True)[:PAGE_SIZE],
+         (SCAN, SORT)),
+        ('Рецепты авторов подписок',
+         Recipe.objects.filter(author_id__in=author_ids)
+         .annotate(position=Window(
+             RowNumber(), partition_by=F('author_id'),
+             order_by=Recipe._meta.ordering
+         )).filter(position__lte=3).values_list('id', flat=True),
+         (SCAN,)),
+        ('Количество рецептов авторов',
+         Recipe.objects.filter(author_id__in=author_ids).order_by()
+         .values('author_id').annotate(count=Count('id')), (SCAN,)),
+        ('Скачивание списка покупок',
+         RecipeIngredients.objects
+         .filter(recipe__shoping_cart_recipes__user=user)
+         .values('ingredient_id', 'ingredient__name')
+         .annotate(total=Sum('amount')).order_by('ingredient__name'),
+         (SCAN,)),
+        ('Журнал изменений',
+         Change.objects.filter(
+             Q(user_id__isnull=True) | Q(user_id=user.id), id__gt=0
+         ).values_list('id', 'model', 'object_id')[:100],
+         (SCAN, SORT)),
+    )
+
+
+def explain(cursor, queryset):
+    sql, params = queryset.query.sql_with_params()
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def describe(node):
+    name = node['Node Type']
+    if 'Index Name' in node:
+        name += f' {node["Index Name"]}'
+    elif 'Relation Name' in node:
+        name += f' {node["Relation Name"]}'
+    return name
+
+
+def check_plans(cursor, real_costs=False):
+    """
+    Планы hot_paths для первого пользователя базы данных:
+    [(название, запрещенные узлы плана, использованные индексы, план)].
+    """
+    user = User.objects.order_by('id').first() or User(id=0)
+    recipe_ids = list(
+        Recipe.objects.values_list('id', flat=True)[:PAGE_SIZE]
+    ) or [0]
+    author_ids = list(
+        Follow.objects.filter(user=user)
+        .values_list('following_id', flat=True)[:PAGE_SIZE]
+    ) or [0]
+    tag_slug = Tag.objects.values_list('slug', flat=True).first() or ''
+    results = []
+    for name, queryset, forbidden in hot_paths(
+        user, recipe_ids, author_ids, tag_slug
+    ):
+        if not real_costs:
+            # На небольшой базе планировщик выбирает Seq Scan
+            # и Sort дешевле индекса; после запрета они остаются
+            # в плане, только если подходящего индекса нет.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            enable_sort = 'off' if SORT in forbidden else 'on'
+            cursor.execute(f'SET LOCAL enable_sort = {enable_sort}')
+        plan = explain(cursor, queryset)['Plan']
+        nodes = list(plan_nodes(plan))
+        results.append((
+            name,
+            [describe(node) for node in nodes
+             if node['Node Type'] in forbidden],
+            sorted({
+                node['Index Name'] for node in nodes if 'Index Name' in node
+            }),
+            plan,
+        ))
+    return results
@@ -0,0 +1,129 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from recipes.documents import AUTHOR_FIELDS, schedule_rebuild
+from recipes.events import publish
+from recipes.images import delete_unreferenced, recipe_files
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+
+
+@receiver(pre_save, sender=Recipe)
+def mark_new_image(sender, instance, **kwargs):
+    """
+    Отмечает рецепты, для которых загружено новое изображение,
+    и запоминает файлы предыдущего изображения.
+    """
+    instance._image_changed = (
+        bool(instance.image) and not instance.image._committed
+    )
+    instance._previous_files = []
+    if instance._image_changed:
+        instance.image_variants = {}
+    if instance._image_changed and instance.pk:
+        previous = Recipe.objects.filter(pk=instance.pk).values(
+            'image', 'image_variants'
+        ).first()
+        if previous:
+            instance._previous_files = recipe_files(
+                previous['image'], previous['image_variants']
+            )
+
+
+@receiver(post_save, sender=Recipe)
+def process_new_image(sender, instance, **kwargs):
+    """
+    Ставит в очередь обработку нового изображения рецепта
+    и удаление файлов предыдущего, если они больше не используются.
+    """
+    if getattr(instance, '_image_changed', False):
+        transaction.on_commit(partial(
+            enqueue, 'recipes.process_image',
+            recipe_id=instance.pk,
+            previous_files=instance._previous_files
+        ))
+
+
+@receiver(post_save, sender=Recipe)
+def publish_recipe_event(sender, instance, created, **kwargs):
+    """Сообщает подписчикам автора о новом или измененном рецепте."""
+    transaction.on_commit(partial(publish, {
+        'type': 'recipe_created' if created else 'recipe_updated',
+        'id': instance.pk,
+        'author': instance.author_id,
+        'name': instance.name,
+    }))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_files(sender, instance, **kwargs):
+    """Удаляет файлы изображения удаленного рецепта."""
+    delete_unreferenced(
+        recipe_files(instance.image.name, instance.image_variants)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def rebuild_recipe_document(sender, instance, created, update_fields,
+                            **kwargs):
+    """Пересобирает документ нового рецепта или при смене автора."""
+    if created or update_fields is None or 'author' in update_fields:
+        schedule_rebuild([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=RecipeIngredients)
+def rebuild_m2m_documents(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Пересобирает документы при изменении тегов и ингредиентов рецепта."""
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_rebuild([instance.pk])
+    elif reverse and action in ('post_add', 'post_remove'):
+        schedule_rebuild(pk_set)
+    elif reverse and action == 'pre_clear':
+        schedule_rebuild(
+            instance.recipes.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def rebuild_related_document(sender, instance, **kwargs):
+    """Пересобирает документ при изменении ингредиента рецепта."""
+    schedule_rebuild([instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Tag)
+def rebuild_tag_documents(sender, instance, **kwargs):
+    """
+    Пересобирает документы рецептов удаляемого тега.
+    Связи тегов с рецептами удаляются без сигналов post_delete.
+    """
+    schedule_rebuild(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def rebuild_renamed_documents(sender, instance, created, **kwargs):
+    """Пересобирает документы рецептов с измененным тегом/ингредиентом."""
+    if not created:
+        schedule_rebuild(
+            instance.recipes.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def rebuild_author_documents(sender, instance, created, update_fields,
+                             **kwargs):
+    """Пересобирает документы рецептов автора при изменении его данных."""
+    if created or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    schedule_rebuild(instance.recipes.values_list('id', flat=True))
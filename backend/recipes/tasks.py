@@ -0,0 +1,19 @@
+from jobs.queue import job
+from recipes.documents import rebuild_documents
+from recipes.images import delete_unreferenced, process_recipe_image
+from recipes.models import Recipe
+
+
+@job('recipes.process_image')
+def process_image(recipe_id, previous_files=()):
+    """Обработка нового изображения рецепта в фоновом режиме."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is not None and not recipe.image_variants:
+        process_recipe_image(recipe)
+    delete_unreferenced(previous_files)
+
+
+@job('recipes.rebuild_documents')
+def rebuild_documents_task(recipe_ids):
+    """Пересборка документов рецептов в фоновом режиме."""
+    rebuild_documents(recipe_ids)
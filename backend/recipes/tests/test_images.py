@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from recipes.images import delete_unreferenced
+from recipes.models import Recipe
+
+storage = Recipe._meta.get_field('image').storage
+
+
+class ImageStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_reused_file_is_touched(self):
+        name = storage.save('recipes/images/a.png', ContentFile(b'image'))
+        os.utime(storage.path(name), (0, 0))
+        self.assertEqual(
+            storage.save('recipes/images/b.png', ContentFile(b'image')), name
+        )
+        self.assertGreater(os.path.getmtime(storage.path(name)), 0)
+
+    def test_missing_file_is_saved_again(self):
+        name = storage.save('recipes/images/a.png', ContentFile(b'image'))
+        storage.delete(name)
+        storage.save('recipes/images/a.png', ContentFile(b'image'))
+        self.assertTrue(storage.exists(name))
+
+    def test_files_are_deleted_after_commit(self):
+        name = storage.save('recipes/images/a.png', ContentFile(b'image'))
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_unreferenced([name])
+            self.assertTrue(storage.exists(name))
+        self.assertFalse(storage.exists(name))
+
+    def test_files_are_kept_after_rollback(self):
+        name = storage.save('recipes/images/a.png', ContentFile(b'image'))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                delete_unreferenced([name])
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertTrue(storage.exists(name))
@@ -0,0 +1,53 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from followers.models import Follow
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCard, Tag)
+from recipes.query_plans import check_plans
+
+User = get_user_model()
+
+
+@skipUnless(
+    connection.vendor == 'postgresql', 'Планы проверяются в PostgreSQL.'
+)
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user, author = (
+            User.objects.create_user(
+                email=f'{username}@example.com', username=username,
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for username in ('reader', 'author')
+        )
+        tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание', cooking_time=10,
+            image='recipes/images/image.png'
+        )
+        recipe.tags.add(tag)
+        RecipeIngredients.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=5
+        )
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingCard.objects.create(user=user, recipe=recipe)
+        Follow.objects.create(user=user, following=author)
+
+    def test_hot_paths_use_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            results = check_plans(cursor)
+        self.assertTrue(results)
+        for name, found, used, _ in results:
+            with self.subTest(name):
+                self.assertEqual(found, [])
@@ -0,0 +1,100 @@
+"""
+Сравнение затрат процессора на формирование ответа.
+
+Для списка пользователей сравнивается путь ModelSerializer
+и JSONRenderer с быстрым (api.fast_serializers и ORJSONRenderer).
+Выводит процессорное время на один ответ и количество запросов к базе.
+
+Запуск:
+    python manage.py runscript benchmark_serializers \
+        --script-args "--limit 50 --repeat 50"
+"""
+import argparse
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.fast_serializers import represent_users, user_columns, user_fieldset
+from api.renderers import ORJSONRenderer
+from api.serializers import CustomUserSerializer
+from followers.models import Follow
+
+User = get_user_model()
+
+
+def make_request(user, query=''):
+    request = APIRequestFactory().get('/api/' + query)
+    force_authenticate(request, user)
+    request = Request(request)
+    request.user = user
+    return request
+
+
+def measure(func, repeat):
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        body = func()
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return body, {
+        'cpu_ms': round((time.process_time() - started) * 1000 / repeat, 3),
+        'queries': len(queries),
+    }
+
+
+def cases(user, limit):
+    request = make_request(user)
+    users = User.objects.all()[:limit]
+    user_fields = user_fieldset(request)
+    return {
+        'users': (
+            lambda: JSONRenderer().render(CustomUserSerializer(
+                users, many=True, context={'request': request}
+            ).data),
+            lambda: ORJSONRenderer().render(represent_users(
+                request, list(users.values(*user_columns(user_fields))),
+                user_fields
+            )),
+        ),
+    }
+
+
+def benchmark(user, limit=50, repeat=50):
+    report = {}
+    for name, (serializer, fast) in cases(user, limit).items():
+        body, before = measure(serializer, repeat)
+        fast_body, after = measure(fast, repeat)
+        report[name] = {
+            'serializer': before,
+            'fast': after,
+            'speedup': round(
+                before['cpu_ms'] / max(after['cpu_ms'], 1e-6), 1
+            ),
+            'identical': body == fast_body,
+        }
+    return report
+
+
+def run(*args):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument(
+        '--user', type=int, help='id пользователя, от имени которого '
+                                 'выполняются запросы'
+    )
+    options = parser.parse_args(' '.join(args).split())
+    user = (
+        User.objects.get(pk=options.user) if options.user
+        else Follow.objects.order_by('user_id').first().user
+    )
+    print(json.dumps(
+        benchmark(user, options.limit, options.repeat), indent=2
+    ))
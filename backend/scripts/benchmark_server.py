@@ -0,0 +1,104 @@
+"""
+Нагрузочное сравнение синхронного (WSGI) и асинхронного (ASGI) запуска.
+
+Одновременно отправляет быстрые запросы (теги, рецепт) и медленные
+(список покупок, большая страница рецептов) и выводит пропускную
+способность и задержки по каждому типу запросов.
+
+Запуск против уже работающего сервера:
+    python scripts/benchmark_server.py http://127.0.0.1:8000 \
+        --token <токен> --concurrency 32 --duration 30
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FAST = ('/api/tags/', '/api/recipes/{recipe_id}/')
+SLOW = ('/api/recipes/download_shopping_cart/', '/api/recipes/?limit=100')
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def worker(base_url, paths, headers, deadline, results, lock):
+    session = requests.Session()
+    session.headers.update(headers)
+    position = 0
+    while time.monotonic() < deadline:
+        kind, path = paths[position % len(paths)]
+        position += 1
+        started = time.perf_counter()
+        try:
+            ok = session.get(base_url + path, timeout=30).status_code < 500
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            results.setdefault(kind, []).append((elapsed, ok))
+
+
+def benchmark(base_url, token=None, concurrency=32, duration=30,
+              slow_ratio=0.2, recipe_id=1):
+    headers = {'Authorization': f'Token {token}'} if token else {}
+    slow_every = max(1, round(1 / slow_ratio)) if slow_ratio else 0
+    paths = []
+    for index in range(20):
+        if slow_every and index % slow_every == 0:
+            paths.append(('slow', SLOW[index % len(SLOW)]))
+        else:
+            paths.append(('fast', FAST[index % len(FAST)]))
+    paths = [(kind, path.format(recipe_id=recipe_id))
+             for kind, path in paths]
+    results = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index in range(concurrency):
+            executor.submit(
+                worker, base_url.rstrip('/'),
+                paths[index % len(paths):] + paths[:index % len(paths)],
+                headers, deadline, results, lock
+            )
+    report = {}
+    for kind, samples in sorted(results.items()):
+        latencies = [elapsed * 1000 for elapsed, _ in samples]
+        report[kind] = {
+            'requests': len(samples),
+            'errors': sum(1 for _, ok in samples if not ok),
+            'rps': round(len(samples) / duration, 1),
+            'mean_ms': round(statistics.fmean(latencies), 1),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+        }
+    return report
+
+
+def run(*args):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('base_url')
+    parser.add_argument('--token')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=int, default=30)
+    parser.add_argument('--slow-ratio', type=float, default=0.2)
+    parser.add_argument('--recipe-id', type=int, default=1)
+    options = parser.parse_args(args)
+    print(json.dumps(benchmark(
+        options.base_url, options.token, options.concurrency,
+        options.duration, options.slow_ratio, options.recipe_id
+    ), indent=2))
+
+
+if __name__ == '__main__':
+    import sys
+    run(*sys.argv[1:])
@@ -0,0 +1,350 @@
+"""
+Нагрузочное тестирование по коллекции Postman (postman-collection/).
+
+Запросы коллекции выполняются по порядку как сценарий: регистрация,
+получение токенов, профили, теги, ингредиенты, создание и изменение
+рецептов, подписки, список покупок и его скачивание, избранное
+и удаление. Проверки ошибок (запросы, тесты которых ожидают статус
+4xx) пропускаются, если не передан --include-errors.
+Каждое повторение сценария регистрирует новых пользователей,
+идентификаторы тегов, ингредиентов и рецептов и токены берутся
+из ответов так же, как в тестах коллекции.
+
+Против работающего сервера:
+    python manage.py runscript load_test --script-args \
+        "--base-url http://127.0.0.1:8000 --concurrency 8 --duration 60"
+
+Внутри процесса через django.test.Client (данные записываются в базу
+данных из настроек):
+    python manage.py runscript load_test --script-args \
+        "--concurrency 4 --iterations 3"
+
+Выводит JSON с количеством запросов, ошибками, пропускной способностью
+и задержками p50/p95/p99 по каждому шагу сценария.
+"""
+import argparse
+import json
+import re
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.db import connections
+from django.test import Client
+
+from scripts.benchmark_server import percentile
+
+COLLECTION = (
+    Path(__file__).resolve().parents[2]
+    / 'postman-collection' / 'diploma.postman_collection.json'
+)
+EXPECTED_STATUS = re.compile(r'Статус-код ответа должен быть (\d{3})')
+SET_VARIABLE = re.compile(
+    r'pm\.collectionVariables\.set\(\s*["\'](\w+)["\']\s*,\s*(.+)\)\s*;?\s*$',
+    re.MULTILINE
+)
+GET_PATH = re.compile(
+    r'const (\w+) = _\.get\(responseData, ["\']([\w.]+)["\']\)'
+)
+ACCESSOR = re.compile(r'\[(\d+)\]|\.(\w+)')
+SLICE = re.compile(r'\.slice\((\d+),\s*(\d+)\)$')
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+class Step:
+    """
+    Запрос коллекции: шаблоны адреса, тела и заголовка Authorization,
+    ожидаемый статус и переменные, которые берутся из ответа.
+    """
+    def __init__(self, name, method, url, body, auth, status, extract):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.body = body
+        self.auth = auth
+        self.status = status
+        self.extract = extract
+
+
+def parse_auth(auth):
+    """Шаблон заголовка Authorization или None."""
+    if auth is None or auth['type'] != 'apikey':
+        return None
+    return {item['key']: item['value'] for item in auth['apikey']}['value']
+
+
+def parse_accessors(expression):
+    """responseData[0].name.slice(0,1) -> ((0, 'name'), (0, 1))."""
+    window = SLICE.search(expression)
+    if window:
+        expression = expression[:window.start()]
+        window = (int(window[1]), int(window[2]))
+    path = tuple(
+        int(index) if index else key
+        for index, key in ACCESSOR.findall(
+            expression.removeprefix('responseData')
+        )
+    )
+    return path, window
+
+
+def parse_extract(script):
+    """Переменные, которые тест сохраняет из ответа: имя -> путь."""
+    constants = dict(GET_PATH.findall(script))
+    extract = {}
+    for name, expression in SET_VARIABLE.findall(script):
+        expression = expression.strip()
+        if expression in constants:
+            extract[name] = (tuple(constants[expression].split('.')), None)
+        elif expression.startswith('responseData'):
+            extract[name] = parse_accessors(expression)
+    return extract
+
+
+def load_steps(path=COLLECTION, include_errors=False):
+    """Шаги сценария в порядке коллекции и ее переменные."""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    steps = []
+
+    def walk(items, prefix, auth):
+        for item in items:
+            name = f'{prefix}{item["name"].strip()}'
+            if 'item' in item:
+                walk(item['item'], f'{name}/', item.get('auth', auth))
+                continue
+            request = item['request']
+            script = '\n'.join(
+                line for event in item.get('event', ())
+                if event['listen'] == 'test'
+                for line in event['script']['exec']
+            )
+            status = EXPECTED_STATUS.search(script)
+            status = int(status[1]) if status else None
+            if not include_errors and status and status >= 400:
+                continue
+            url = request['url']
+            steps.append(Step(
+                name, request['method'],
+                url['raw'] if isinstance(url, dict) else url,
+                request.get('body', {}).get('raw', ''),
+                parse_auth(request.get('auth', auth)),
+                status, parse_extract(script),
+            ))
+
+    walk(collection['item'], '', collection.get('auth'))
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    return steps, variables
+
+
+def user_variables(variables, tag):
+    """
+    Переменные повторения сценария: имена и адреса электронной почты
+    пользователей получают уникальный префикс.
+    """
+    variables = dict(variables, baseUrl='')
+    for key, value in variables.items():
+        if (
+            key.lower().endswith(('email', 'username'))
+            and not key.startswith('tooLong')
+            and value.startswith('"')
+        ):
+            variables[key] = f'"{tag}-{value[1:]}'
+    return variables
+
+
+def substitute(template, variables):
+    return VARIABLE.sub(lambda match: str(variables[match[1]]), template)
+
+
+class HttpTarget:
+    """Запросы к работающему серверу."""
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, body, headers):
+        response = self.session.request(
+            method, self.base_url + path, data=body.encode(),
+            headers=headers, timeout=30
+        )
+        return response.status_code, response.content
+
+    def close(self):
+        self.session.close()
+
+
+class ClientTarget:
+    """Запросы через django.test.Client в текущем процессе."""
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method, path, body, headers):
+        content_type = headers.pop('Content-Type', 'application/json')
+        response = self.client.generic(
+            method, path, body.encode(), content_type, headers=headers
+        )
+        if response.streaming:
+            return response.status_code, b''.join(response.streaming_content)
+        return response.status_code, response.content
+
+    def close(self):
+        connections.close_all()
+
+
+def extract(step, content, variables):
+    data = json.loads(content)
+    for name, (path, window) in step.extract.items():
+        value = data
+        for key in path:
+            value = value[key]
+        if window:
+            value = value[window[0]:window[1]]
+        variables[name] = value
+
+
+def run_scenario(steps, target, variables, record):
+    """
+    Выполняет шаги по порядку. Если не удалось получить переменные
+    для следующих шагов, повторение прерывается.
+    """
+    for step in steps:
+        try:
+            path = substitute(step.url, variables)
+            body = substitute(step.body, variables)
+            headers = {}
+            if step.auth:
+                headers['Authorization'] = substitute(step.auth, variables)
+        except KeyError:
+            record(step.name, 0, False)
+            return False
+        if body:
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            status, content = target.request(
+                step.method, path, body, headers
+            )
+        except requests.RequestException:
+            status, content = None, b''
+        elapsed = time.perf_counter() - started
+        ok = status == step.status if step.status else (
+            status is not None and status < 400
+        )
+        record(step.name, elapsed, ok)
+        if step.extract:
+            if not ok:
+                return False
+            try:
+                extract(step, content, variables)
+            except (ValueError, LookupError, TypeError):
+                return False
+    return True
+
+
+def load_test(steps, variables, make_target, concurrency=4, duration=30,
+              iterations=None):
+    """
+    Запускает concurrency пользователей, каждый повторяет сценарий
+    iterations раз или до истечения duration секунд.
+    """
+    run_id = uuid.uuid4().hex[:6]
+    results = {step.name: [] for step in steps}
+    scenarios = {'completed': 0, 'aborted': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def record(name, elapsed, ok):
+        with lock:
+            results[name].append((elapsed, ok))
+
+    def worker(number):
+        target = make_target()
+        iteration = 0
+        try:
+            while time.monotonic() < deadline and (
+                iterations is None or iteration < iterations
+            ):
+                completed = run_scenario(
+                    steps, target,
+                    user_variables(
+                        variables, f'lt{run_id}-{number}-{iteration}'
+                    ),
+                    record
+                )
+                iteration += 1
+                with lock:
+                    scenarios['completed' if completed else 'aborted'] += 1
+        finally:
+            target.close()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [
+            executor.submit(worker, number) for number in range(concurrency)
+        ]:
+            future.result()
+    elapsed = time.monotonic() - started
+    report = {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 1),
+        'scenarios': scenarios,
+        'steps': {},
+    }
+    for name, samples in results.items():
+        if not samples:
+            continue
+        latencies = [seconds * 1000 for seconds, _ in samples]
+        errors = sum(1 for _, ok in samples if not ok)
+        report['steps'][name] = {
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': round(errors / len(samples), 4),
+            'rps': round(len(samples) / elapsed, 2),
+            'mean_ms': round(statistics.fmean(latencies), 1),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+        }
+    return report
+
+
+def run(*args):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--base-url',
+        help='Адрес сервера; без него запросы выполняются в процессе.'
+    )
+    parser.add_argument('--collection', default=COLLECTION)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=int, default=30)
+    parser.add_argument(
+        '--iterations', type=int,
+        help='Повторений сценария на пользователя.'
+    )
+    parser.add_argument(
+        '--only', help='Регулярное выражение для имен шагов.'
+    )
+    parser.add_argument('--include-errors', action='store_true')
+    options = parser.parse_args(' '.join(args).split())
+    steps, variables = load_steps(
+        options.collection, options.include_errors
+    )
+    if options.only:
+        steps = [step for step in steps if re.search(options.only, step.name)]
+    if options.base_url:
+        def make_target():
+            return HttpTarget(options.base_url)
+    else:
+        make_target = ClientTarget
+    print(json.dumps(load_test(
+        steps, variables, make_target, options.concurrency,
+        options.duration, options.iterations
+    ), indent=2, ensure_ascii=False))
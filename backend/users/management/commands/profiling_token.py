@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.profiling import make_token
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выдает токен для заголовка профилирования запросов. '
+        'Токен выдается только персоналу и действует TOKEN_MAX_AGE секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('Пользователь не найден.')
+        if not user.is_staff:
+            raise CommandError('Профилирование доступно только персоналу.')
+        self.stdout.write(make_token(user))
@@ -22,3 +22,9 @@ class CustomUser(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('-date_joined',)
+        indexes = (
+            models.Index(
+                fields=('-date_joined', '-id'),
+                name='users_customuser_joined_idx'
+            ),
+        )